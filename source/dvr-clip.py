@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+'''
+Speed Camera Utility to extract a video clip from the DVR segments
+recorded when DVR_ON = True in config.py. See strmdvr.py
+
+The clip time can be a speed table idx eg 20221118-1530452 or a
+log_timestamp eg "2022-11-18 15:30:45". Only the small segment index
+files are read to find the matching frames so long recordings are not
+scanned. The clip is saved to DVR_DIR/clips with a matching .idx file.
+'''
+from __future__ import print_function
+prog_ver = '13_02'
+import os
+import sys
+import time
+import logging
+import argparse
+import cv2
+
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s %(levelname)-8s %(funcName)-10s %(message)s',
+                    datefmt='%Y-%m-%d %H:%M:%S')
+
+try:
+    from config import DVR_DIR
+except ImportError:
+    DVR_DIR = "media/dvr"
+from strmdvr import DVR_VIDEO_EXT, DVR_INDEX_EXT, find_frames
+
+
+def parse_clip_time(clip_time):
+    '''Return epoch seconds for a speed table idx or log_timestamp'''
+    clip_time = clip_time.strip().strip('"')
+    try:
+        if "-" in clip_time and " " not in clip_time:
+            # idx format YYYYMMDD-HHMMSS plus tenths of a second digit.
+            # speed-multicam.py may add -plugin_name if two cameras collide
+            date_part, time_part = clip_time.split("-")[:2]
+            tenths = 0.0
+            if len(time_part) > 6:
+                tenths = int(time_part[6:]) / 10.0
+            return time.mktime(time.strptime(date_part + time_part[:6], "%Y%m%d%H%M%S")) + tenths
+        return time.mktime(time.strptime(clip_time, "%Y-%m-%d %H:%M:%S"))
+    except ValueError:
+        logging.error("Could Not Parse Time %s", clip_time)
+        logging.error("Use idx eg 20221118-1530452 or timestamp eg \"2022-11-18 15:30:45\"")
+        sys.exit(1)
+
+
+def extract_clip(dvr_dir, start_time, end_time, clip_path):
+    '''Copy frames between start_time and end_time to clip_path. Returns frame count'''
+    found = find_frames(dvr_dir, start_time, end_time)
+    if not found:
+        logging.error("No DVR Frames Found Between %s and %s",
+                      time.ctime(start_time), time.ctime(end_time))
+        return 0
+    writer = None
+    count = 0
+    with open(os.path.splitext(clip_path)[0] + DVR_INDEX_EXT, "w") as index:
+        for base_path, entries in found:
+            video = cv2.VideoCapture(base_path + DVR_VIDEO_EXT)
+            fps = video.get(cv2.CAP_PROP_FPS) or 30
+            # MJPG frames are all key frames so this seek is frame accurate
+            video.set(cv2.CAP_PROP_POS_FRAMES, entries[0][0])
+            for frame_no, wall_time, seq in entries:
+                grabbed, image = video.read()
+                if not grabbed:
+                    logging.warning("%s Ended Before Index. Segment may be incomplete", base_path)
+                    break
+                if writer is None:
+                    height, width = image.shape[:2]
+                    writer = cv2.VideoWriter(clip_path, cv2.VideoWriter_fourcc(*"MJPG"),
+                                             fps, (width, height))
+                writer.write(image)
+                index.write("%i,%.3f,%i\n" % (count, wall_time, seq))
+                count += 1
+            video.release()
+            logging.info("Copied %i frames from %s%s", len(entries), base_path, DVR_VIDEO_EXT)
+    if writer is not None:
+        writer.release()
+    return count
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Extract a clip from speed camera DVR segments")
+    ap.add_argument('clip_time',
+                    help='speed table idx eg 20221118-1530452 or "2022-11-18 15:30:45"')
+    ap.add_argument('-b', type=float, default=5.0, dest='before',
+                    help='seconds before clip_time. Default 5')
+    ap.add_argument('-a', type=float, default=2.0, dest='after',
+                    help='seconds after clip_time. Default 2')
+    ap.add_argument('-d', default=DVR_DIR, dest='dvr_dir',
+                    help='DVR segment folder. Default %s' % DVR_DIR)
+    ap.add_argument('-o', default=None, dest='clip_path',
+                    help='output clip file. Default DVR_DIR/clips/clip-<clip_time>.avi')
+    args = ap.parse_args()
+
+    event_time = parse_clip_time(args.clip_time)
+    clip_path = args.clip_path
+    if clip_path is None:
+        clip_dir = os.path.join(args.dvr_dir, "clips")
+        if not os.path.isdir(clip_dir):
+            os.makedirs(clip_dir)
+        clip_name = "clip-" + time.strftime("%Y%m%d-%H%M%S", time.localtime(event_time))
+        clip_path = os.path.join(clip_dir, clip_name + DVR_VIDEO_EXT)
+    print("Loading ver %s Extract %.1f sec before to %.1f sec after %s"
+          % (prog_ver, args.before, args.after, time.ctime(event_time)))
+    frames = extract_clip(args.dvr_dir, event_time - args.before,
+                          event_time + args.after, clip_path)
+    if frames:
+        print("Saved %i frames to %s" % (frames, clip_path))
+    else:
+        sys.exit(1)
@@ -0,0 +1,545 @@
+# Motion detection stage for speed-cam.py
+# get_motion_contours() used to allocate a new cvtColor, absdiff, blur and
+# threshold image for every frame and return a new greyscale image to diff
+# against the next frame. MotionPipeline is sized once from the MO_CROP_*
+# motion area and owns reusable buffers that the OpenCV calls write into
+# using dst= arguments. The previous greyscale frame is double buffered so
+# no per frame image arrays are created except the contour list.
+#
+# Single channel stream frames eg GSTCAM_GRAY_ON or ffmpegcam are copied
+# into the grey buffer without cvtColor.
+#
+# MO_ENGINE selects how the motion mask is made
+#     "diff"     two frame difference (original speed-cam behaviour)
+#     "average"  difference from a cv2.accumulateWeighted running average
+#     "mog2"     cv2 BackgroundSubtractorMOG2
+#     "knn"      cv2 BackgroundSubtractorKNN
+# Frame difference only sees the leading and trailing edges of a vehicle so
+# slow or long plain coloured vehicles can be missed or split. The background
+# model engines see the whole vehicle at a higher cpu cost.
+#
+# scale=2 or 4 (MO_DETECT_SCALE) runs detection on a crop reduced in 2x
+# steps by cv2.pyrDown or cv2.resize INTER_AREA (2x steps use the fast
+# OpenCV path) so high resolution streams keep their frame rate.
+# Contours are mapped back to full crop coordinates. refine=True redoes
+# the frame difference at full resolution only around the tracked
+# object box so speed is not quantized to scale px.
+#
+# auto_threshold=True (MO_AUTO_THRESHOLD_ON) follows the scene noise level
+# so sensor noise at night does not flood the threshold image with contours.
+# Every NOISE_CHECK_FRAMES frames the median of a histogram of every
+# NOISE_SUBSAMPLE th pixel of the blurred difference image is smoothed into
+# the noise level and the threshold is set to noise level x noise_factor
+# within threshold_min and threshold_max. Vehicles cover less than half of
+# the motion area so the median is the background noise. stats() has the
+# current values for the speed-cam.py fps log and speed-multicam.py
+#
+# detect_blobs() is an alternative to detect() contours (MO_BLOB_STATS_ON).
+# cv2.connectedComponentsWithStats labels the motion mask in one pass and
+# Blobs filters areas, edges and aspect ratios with numpy, so per frame cost
+# does not grow with hundreds of noise contours from rain, snow or foliage.
+#
+# speed-cam.py only uses the MotionDetector interface. ContourDetector is
+# the implementation for all the engines above and returns the filtered
+# motion boxes that a motion_track.py Tracker follows. Other detectors can
+# be compared with the same trackers and recorded clips using speed_bench.py
+
+import logging
+import cv2
+import numpy as np
+
+MASK_THRESHOLD = 127  # blurred 0/255 background subtractor mask to binary
+AVG_MOTION_RATE = 0.05  # fraction of learn_rate for "average" pixels under motion
+NOISE_CHECK_FRAMES = 5  # frames between auto threshold noise estimates
+NOISE_SUBSAMPLE = 4     # noise histogram of every 4th pixel of every 4th row
+NOISE_SMOOTHING = 0.2   # weight of each new noise estimate
+THRESHOLD_LOG_STEP = 3  # log auto threshold changes of at least this much
+
+
+class MotionPipeline(object):
+    '''
+    Frame difference motion detection for a fixed size crop area.
+    Call prime() with the first crop image then detect() for each
+    following crop image to get its motion contours. scale must be
+    1, 2, 4 or 8. threshold_min and threshold_max default to threshold
+    and 3 x threshold.
+    '''
+    engine = "diff"
+    refine_supported = True
+    auto_threshold_supported = True
+
+    def __init__(self, width, height, blur_size=10, threshold=20,
+                 scale=1, pyr_down=False, refine=False, auto_threshold=False,
+                 threshold_min=None, threshold_max=None, noise_factor=2.5):
+        self.full_blur_size = (blur_size, blur_size)
+        # blur the same scene area at the reduced size
+        self.blur_size = (max(1, blur_size // scale), max(1, blur_size // scale))
+        self.threshold = threshold
+        self.auto_threshold = auto_threshold
+        self.threshold_min = threshold if threshold_min is None else threshold_min
+        self.threshold_max = threshold * 3 if threshold_max is None else threshold_max
+        self.noise_factor = noise_factor
+        if self.auto_threshold and not self.auto_threshold_supported:
+            logging.warning("Auto Threshold is Only for Motion Engine diff or average. Ignored for %s",
+                            self.engine)
+            self.auto_threshold = False
+        if self.auto_threshold and self.threshold_min > self.threshold_max:
+            raise ValueError("Motion Threshold Min %s is More Than Max %s"
+                             % (self.threshold_min, self.threshold_max))
+        self.noise = None  # smoothed median of the difference image
+        self.threshold_changes = 0
+        self.logged_threshold = threshold
+        self.scale = scale
+        self.pyr_down = pyr_down
+        self.levels = {1: 0, 2: 1, 4: 2, 8: 3}.get(scale)
+        if self.levels is None:
+            raise ValueError("Motion Detect Scale %s Must be 1, 2, 4 or 8" % scale)
+        self.refine_on = refine and scale > 1
+        if self.refine_on and not self.refine_supported:
+            logging.warning("Full Resolution Refine is Only for Motion Engine diff. Ignored for %s",
+                            self.engine)
+            self.refine_on = False
+        self.reallocs = 0
+        self.allocate(width, height)
+
+    def allocate(self, width, height):
+        '''Create the reusable buffers for a width x height crop area'''
+        self.shape = (height, width)
+        for _ in range(self.levels):
+            width, height = max(1, width // 2), max(1, height // 2)
+        self.detect_shape = (height, width)
+        self.small = {}  # reduced crop buffers per image ndim
+        self.full = [None, None]  # full resolution crops kept for refine()
+        self.full_cur = 0
+        # gray[cur] is the newest frame and gray[1 - cur] the previous one
+        self.gray = [np.zeros(self.detect_shape, np.uint8), np.zeros(self.detect_shape, np.uint8)]
+        self.cur = 0
+        self.diff = np.zeros(self.detect_shape, np.uint8)
+        self.difference = np.zeros(self.detect_shape, np.uint8)  # blurred diff
+        self.thresh = np.zeros(self.detect_shape, np.uint8)
+        self.labels = np.zeros(self.detect_shape, np.int32)  # detect_blobs() label image
+        self.frames = 0
+
+    def check_shape(self, image_crop):
+        '''Reallocate if the stream delivers a different crop size'''
+        if image_crop.shape[:2] != self.shape:
+            logging.warning("Motion Area Changed from %ix%i to %ix%i. Reallocating Buffers",
+                            self.shape[1], self.shape[0],
+                            image_crop.shape[1], image_crop.shape[0])
+            self.allocate(image_crop.shape[1], image_crop.shape[0])
+            self.reallocs += 1
+            return False
+        return True
+
+    def to_gray(self, image_crop, dst):
+        '''Write a greyscale copy of image_crop into dst'''
+        if image_crop.ndim == 2:
+            # already grey. Copy since stream frame buffers are recycled
+            np.copyto(dst, image_crop)
+        else:
+            cv2.cvtColor(image_crop, cv2.COLOR_BGR2GRAY, dst=dst)
+
+    def shrink(self, image_crop):
+        '''Return image_crop reduced by scale into a reused buffer'''
+        if self.scale == 1:
+            return image_crop
+        bufs = self.small.get(image_crop.ndim)
+        if bufs is None:
+            # one buffer per 2x level
+            bufs = []
+            height, width = self.shape
+            for _ in range(self.levels):
+                width, height = max(1, width // 2), max(1, height // 2)
+                bufs.append(np.zeros((height, width) + image_crop.shape[2:], np.uint8))
+            self.small[image_crop.ndim] = bufs
+        src = image_crop
+        for buf in bufs:
+            size = (buf.shape[1], buf.shape[0])
+            if self.pyr_down:
+                cv2.pyrDown(src, dst=buf, dstsize=size)
+            else:
+                cv2.resize(src, size, dst=buf, interpolation=cv2.INTER_AREA)
+            src = buf
+        return src
+
+    def keep_full(self, image_crop):
+        # copy since stream frame buffers are recycled
+        self.full_cur = 1 - self.full_cur
+        full = self.full[self.full_cur]
+        if full is None or full.shape != image_crop.shape:
+            self.full[self.full_cur] = image_crop.copy()
+        else:
+            np.copyto(full, image_crop)
+
+    def prime(self, image_crop):
+        '''Set the previous frame that the next detect() diffs against'''
+        self.check_shape(image_crop)
+        if self.refine_on:
+            self.keep_full(image_crop)
+        self.to_gray(self.shrink(image_crop), self.gray[self.cur])
+
+    def update(self, image_crop):
+        '''Make the motion mask for image_crop. False if there is nothing to compare with'''
+        if not self.check_shape(image_crop):
+            # nothing valid to diff against yet
+            self.prime(image_crop)
+            return False
+        if self.refine_on:
+            self.keep_full(image_crop)
+        self.motion_mask(self.shrink(image_crop))
+        self.frames += 1
+        if self.auto_threshold and self.frames % NOISE_CHECK_FRAMES == 0:
+            self.track_noise()
+        return True
+
+    def track_noise(self):
+        '''Estimate the difference image noise level and set the threshold from it'''
+        sample = self.difference[::NOISE_SUBSAMPLE, ::NOISE_SUBSAMPLE]
+        hist = np.bincount(sample.ravel(), minlength=256)
+        median = int(np.searchsorted(np.cumsum(hist), (sample.size + 1) // 2))
+        if self.noise is None:
+            self.noise = float(median)
+        else:
+            self.noise += NOISE_SMOOTHING * (median - self.noise)
+        threshold = int(round(self.noise * self.noise_factor))
+        threshold = max(self.threshold_min, min(self.threshold_max, threshold))
+        if threshold == self.threshold:
+            return
+        self.threshold = threshold
+        self.threshold_changes += 1
+        if abs(threshold - self.logged_threshold) >= THRESHOLD_LOG_STEP:
+            logging.info("Motion Threshold %i for Noise Level %.1f (Min %i Max %i)",
+                         threshold, self.noise, self.threshold_min, self.threshold_max)
+            self.logged_threshold = threshold
+
+    def stats(self):
+        '''Return a dict of motion stage metrics'''
+        return {'mo_frames': self.frames,
+                'mo_threshold': self.threshold,
+                'mo_noise': self.noise if self.noise is not None else 0.0,
+                'mo_threshold_changes': self.threshold_changes,
+                'mo_reallocs': self.reallocs}
+
+    def detect(self, image_crop):
+        '''Return motion contours between the previous crop image and image_crop'''
+        if not self.update(image_crop):
+            return []
+        contours = find_contours(self.thresh)
+        if self.scale > 1:
+            # map back to full crop coordinates
+            contours = [c * self.scale for c in contours]
+        return contours
+
+    def detect_blobs(self, image_crop):
+        '''Return Blobs of motion between the previous crop image and image_crop'''
+        if not self.update(image_crop):
+            return Blobs(np.zeros((0, 5), np.int32), np.zeros((0, 2)), self.shape[1])
+        if hasattr(cv2, "CCL_GRANA"):
+            # block based labelling is several times faster than the default here
+            count, labels, stats, centroids = cv2.connectedComponentsWithStatsWithAlgorithm(
+                self.thresh, 8, cv2.CV_32S, cv2.CCL_GRANA, labels=self.labels)
+        else:
+            count, labels, stats, centroids = cv2.connectedComponentsWithStats(
+                self.thresh, labels=self.labels, connectivity=8, ltype=cv2.CV_32S)
+        # row 0 is the background
+        stats = stats[1:]
+        centroids = centroids[1:]
+        if self.scale > 1:
+            stats = stats * self.scale
+            stats[:, cv2.CC_STAT_AREA] *= self.scale
+            centroids = centroids * self.scale
+        return Blobs(stats, centroids, self.shape[1])
+
+    def refine(self, box):
+        '''
+        Return box (x, y, w, h) from detect() contours refined with a full
+        resolution frame difference of the area around it. Returns box
+        unchanged if refine is off or nothing is found.
+        '''
+        prev = self.full[1 - self.full_cur]
+        if not self.refine_on or prev is None:
+            return box
+        x, y, w, h = box
+        pad = self.scale + self.full_blur_size[0]
+        x1, y1 = max(0, x - pad), max(0, y - pad)
+        x2, y2 = min(self.shape[1], x + w + pad), min(self.shape[0], y + h + pad)
+        diff = cv2.absdiff(prev[y1:y2, x1:x2], self.full[self.full_cur][y1:y2, x1:x2])
+        if diff.ndim == 3:
+            diff = cv2.cvtColor(diff, cv2.COLOR_BGR2GRAY)
+        diff = cv2.blur(diff, self.full_blur_size)
+        retval, mask = cv2.threshold(diff, self.threshold, 255, cv2.THRESH_BINARY)
+        found = cv2.boundingRect(mask)
+        if found[2] == 0 or found[3] == 0:
+            return box
+        return (x1 + found[0], y1 + found[1], found[2], found[3])
+
+    def motion_mask(self, image_crop):
+        # difference with the previous frame into self.thresh
+        prev = self.gray[self.cur]
+        self.cur = 1 - self.cur
+        cur = self.gray[self.cur]
+        self.to_gray(image_crop, cur)
+        # Get differences between the two greyed images
+        cv2.absdiff(prev, cur, dst=self.diff)
+        # Blur difference image to enhance motion vectors
+        cv2.blur(self.diff, self.blur_size, dst=self.difference)
+        # Get threshold of blurred difference image
+        cv2.threshold(self.difference, self.threshold, 255, cv2.THRESH_BINARY, dst=self.thresh)
+
+
+class AverageMotion(MotionPipeline):
+    '''
+    Difference from a running average background. learn_rate is the
+    weight of each new frame. Higher adapts to lighting faster. Pixels
+    under the motion mask learn at AVG_MOTION_RATE of learn_rate so
+    vehicles do not leave trails but a parked vehicle still fades out.
+    '''
+    engine = "average"
+    refine_supported = False
+
+    def __init__(self, width, height, blur_size=10, threshold=20, learn_rate=0.1, **kwargs):
+        self.learn_rate = learn_rate
+        MotionPipeline.__init__(self, width, height, blur_size, threshold, **kwargs)
+
+    def allocate(self, width, height):
+        MotionPipeline.allocate(self, width, height)
+        self.background = np.zeros(self.detect_shape, np.float32)
+        self.background_gray = np.zeros(self.detect_shape, np.uint8)
+        self.still = np.zeros(self.detect_shape, np.uint8)
+
+    def prime(self, image_crop):
+        MotionPipeline.prime(self, image_crop)
+        self.background[...] = self.gray[self.cur]
+
+    def motion_mask(self, image_crop):
+        gray = self.gray[self.cur]
+        self.to_gray(image_crop, gray)
+        cv2.convertScaleAbs(self.background, dst=self.background_gray)
+        cv2.absdiff(gray, self.background_gray, dst=self.diff)
+        cv2.blur(self.diff, self.blur_size, dst=self.difference)
+        cv2.threshold(self.difference, self.threshold, 255, cv2.THRESH_BINARY, dst=self.thresh)
+        # selective background update
+        cv2.bitwise_not(self.thresh, dst=self.still)
+        cv2.accumulateWeighted(gray, self.background, self.learn_rate, mask=self.still)
+        cv2.accumulateWeighted(gray, self.background, self.learn_rate * AVG_MOTION_RATE,
+                               mask=self.thresh)
+
+
+class SubtractorMotion(MotionPipeline):
+    '''
+    Base for OpenCV background subtractors. learn_rate -1 lets OpenCV
+    use 1/history. The foreground mask is blurred then thresholded at
+    MASK_THRESHOLD so speckles are removed and gaps are filled.
+    '''
+    engine = None
+    refine_supported = False
+    auto_threshold_supported = False  # mask is 0/255 not a difference
+
+    def __init__(self, width, height, blur_size=10, threshold=20, learn_rate=-1, history=200,
+                 **kwargs):
+        self.learn_rate = learn_rate
+        self.history = history
+        MotionPipeline.__init__(self, width, height, blur_size, threshold, **kwargs)
+
+    def allocate(self, width, height):
+        MotionPipeline.allocate(self, width, height)
+        self.subtractor = self.create_subtractor()
+
+    def create_subtractor(self):
+        raise NotImplementedError
+
+    def prime(self, image_crop):
+        MotionPipeline.prime(self, image_crop)
+        # learning rate 1 starts the model from this frame
+        self.subtractor.apply(self.gray[self.cur], fgmask=self.diff, learningRate=1.0)
+
+    def motion_mask(self, image_crop):
+        gray = self.gray[self.cur]
+        self.to_gray(image_crop, gray)
+        self.subtractor.apply(gray, fgmask=self.diff, learningRate=self.learn_rate)
+        cv2.blur(self.diff, self.blur_size, dst=self.difference)
+        cv2.threshold(self.difference, MASK_THRESHOLD, 255, cv2.THRESH_BINARY, dst=self.thresh)
+
+
+class MOG2Motion(SubtractorMotion):
+    engine = "mog2"
+
+    def create_subtractor(self):
+        return cv2.createBackgroundSubtractorMOG2(history=self.history, detectShadows=False)
+
+
+class KNNMotion(SubtractorMotion):
+    engine = "knn"
+
+    def create_subtractor(self):
+        return cv2.createBackgroundSubtractorKNN(history=self.history, detectShadows=False)
+
+
+class Blobs(object):
+    '''
+    Motion blobs in full crop coordinates. stats is the N x 5
+    cv2.connectedComponentsWithStats x, y, w, h, area array and
+    centroids N x 2. width is the crop width for edge filtering.
+    Areas are pixel counts so are a little bigger than cv2.contourArea.
+    '''
+
+    def __init__(self, stats, centroids, width):
+        self.boxes = stats[:, :4]
+        self.areas = stats[:, cv2.CC_STAT_AREA]
+        self.centroids = centroids
+        self.width = width
+
+    def __len__(self):
+        return len(self.areas)
+
+    def select(self, min_area, x_buf=0, max_aspect=0):
+        '''
+        Return a bool array of blobs over min_area that are completely
+        inside the crop area less x_buf on the left and right. max_aspect
+        excludes long thin blobs eg rain streaks. 0 is off.
+        '''
+        x, y, w, h = self.boxes.T
+        keep = (self.areas > min_area) & (x > x_buf) & (x + w < self.width - x_buf)
+        if max_aspect:
+            keep &= (w <= h * max_aspect) & (h <= w * max_aspect)
+        return keep
+
+    def biggest(self, min_area, x_buf=0, max_aspect=0):
+        '''Return the (x, y, w, h) box of the biggest select() blob or None'''
+        keep = self.select(min_area, x_buf, max_aspect)
+        if not keep.any():
+            return None
+        index = np.argmax(np.where(keep, self.areas, -1))
+        return tuple(int(v) for v in self.boxes[index])
+
+    def over_area(self, min_area):
+        '''Return True if any blob including ones at the crop edges is over min_area'''
+        return bool((self.areas > min_area).any())
+
+
+class MotionDetector(object):
+    '''
+    Interface for the speed-cam.py motion detection stage. Call prime()
+    with the first crop image then detect() with each following crop
+    image. detect() returns motion boxes (x, y, w, h) in crop coordinates,
+    biggest first, that are over the minimum area and inside the crop
+    area less the left and right side buffer. After detect(), raw_count
+    is the number of motion areas before filtering and motion is True if
+    any of them is over the minimum area, including ones at the crop
+    edges. shape and difference are for the GUI Threshold window.
+    '''
+    name = None
+    raw_count = 0
+    motion = False
+    shape = (0, 0)
+    difference = None
+
+    def prime(self, image_crop):
+        raise NotImplementedError
+
+    def detect(self, image_crop):
+        raise NotImplementedError
+
+    def stats(self):
+        '''Return a dict of metrics eg the current threshold'''
+        return {}
+
+
+class ContourDetector(MotionDetector):
+    '''
+    MotionDetector for a MotionPipeline. Boxes are bounding rectangles of
+    contours, or of Blobs if blobs=True. max_boxes=1 returns only the
+    biggest box, like the original get_biggest_contour(). Boxes are refined
+    at full resolution if the pipeline has refine on.
+    '''
+
+    def __init__(self, pipeline, min_area, x_buf=0, max_boxes=1, blobs=False, max_aspect=0):
+        self.pipeline = pipeline
+        self.min_area = min_area
+        self.x_buf = x_buf
+        self.max_boxes = max_boxes
+        self.blobs = blobs
+        self.max_aspect = max_aspect
+        self.name = pipeline.engine + ("-blobs" if blobs else "")
+
+    @property
+    def shape(self):
+        return self.pipeline.shape
+
+    @property
+    def difference(self):
+        return self.pipeline.difference
+
+    def prime(self, image_crop):
+        self.pipeline.prime(image_crop)
+
+    def stats(self):
+        return self.pipeline.stats()
+
+    def detect(self, image_crop):
+        if self.blobs:
+            # vectorized area, edge and aspect filter of all blobs
+            blobs = self.pipeline.detect_blobs(image_crop)
+            self.raw_count = len(blobs)
+            self.motion = blobs.over_area(self.min_area)
+            keep = blobs.select(self.min_area, self.x_buf, self.max_aspect)
+            order = np.argsort(-blobs.areas[keep], kind="stable")[:self.max_boxes]
+            boxes = [tuple(int(v) for v in box) for box in blobs.boxes[keep][order]]
+        else:
+            contours = self.pipeline.detect(image_crop)
+            self.raw_count = len(contours)
+            self.motion = False
+            right = self.pipeline.shape[1] - self.x_buf
+            found = []
+            for c in contours:
+                found_area = cv2.contourArea(c)
+                if found_area > self.min_area:
+                    self.motion = True
+                    (x, y, w, h) = cv2.boundingRect(c)
+                    # check if object contour is completely within crop area
+                    if x > self.x_buf and x + w < right:
+                        found.append((found_area, (x, y, w, h)))
+            found.sort(key=lambda item: item[0], reverse=True)
+            boxes = [box for found_area, box in found[:self.max_boxes]]
+        if self.pipeline.refine_on:
+            # boxes are from a reduced image. Get exact boxes at full resolution
+            boxes = [self.pipeline.refine(box) for box in boxes]
+        return boxes
+
+
+MOTION_ENGINES = {"diff": MotionPipeline,
+                  "average": AverageMotion,
+                  "mog2": MOG2Motion,
+                  "knn": KNNMotion}
+
+
+def create_motion_pipeline(engine, width, height, blur_size=10, threshold=20,
+                           learn_rate=None, history=200, scale=1, pyr_down=False, refine=False,
+                           auto_threshold=False, threshold_min=None, threshold_max=None,
+                           noise_factor=2.5):
+    '''
+    Return the MotionPipeline for engine name per MOTION_ENGINES.
+    learn_rate None uses the engine default. Raises ValueError
+    for an unknown engine name, bad scale or threshold range.
+    '''
+    engine = engine.lower()
+    if engine not in MOTION_ENGINES:
+        raise ValueError("Unknown Motion Engine %s. Use one of %s"
+                         % (engine, ", ".join(MOTION_ENGINES)))
+    kwargs = {'scale': scale, 'pyr_down': pyr_down, 'refine': refine,
+              'auto_threshold': auto_threshold, 'threshold_min': threshold_min,
+              'threshold_max': threshold_max, 'noise_factor': noise_factor}
+    if engine == "diff":
+        return MotionPipeline(width, height, blur_size, threshold, **kwargs)
+    if learn_rate is not None:
+        kwargs['learn_rate'] = learn_rate
+    if engine != "average":
+        kwargs['history'] = history
+    return MOTION_ENGINES[engine](width, height, blur_size, threshold, **kwargs)
+
+
+def find_contours(thresh_image):
+    '''Return external contours for either opencv 2/4 or opencv 3 return values'''
+    result = cv2.findContours(thresh_image, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    return result[-2]
+
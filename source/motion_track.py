@@ -0,0 +1,267 @@
+# Object trackers for speed-cam.py
+# A Tracker takes the motion boxes of each frame from a motion_detect.py
+# MotionDetector and returns the Tracks that have collected
+# MO_TRACK_EVENT_COUNT speed steps. speed-cam.py and speed_bench.py only use
+# the Tracker interface.
+#
+# SingleTracker is the original speed-cam.py tracker. It follows the
+# biggest motion box only, so when two vehicles are in the motion area at
+# the same time eg passing in opposite lanes, only one is measured and the
+# box can jump between them. With MO_MULTI_TRACK_ON=True, MultiTracker
+# matches every motion box to a Track each frame and each Track collects
+# its own speed steps, so every vehicle gets its own speed, image and
+# database record.
+#
+# Matching is greedy on a numpy cost matrix of box distance from where each
+# Track is predicted to be. Pairs further than MO_MAX_X_DIFF_PX in x or
+# more than a box height apart in y are gated out. At most max_tracks Tracks
+# and max_tracks boxes (biggest first) are matched so the cost per frame is
+# bounded when noise makes hundreds of boxes. A few tracks do not need the
+# Hungarian method.
+#
+# Speed steps use the same MO_MIN_X_DIFF_PX/MO_MAX_X_DIFF_PX rules and left
+# edge x positions as the single object tracker. A Track that reached
+# MO_TRACK_EVENT_COUNT steps is returned once then kept as done so it keeps
+# absorbing the same vehicle until it leaves. This replaces the
+# MO_TRACK_TIMEOUT_SEC wait that would blind the single tracker to a second
+# vehicle.
+
+import logging
+import numpy as np
+
+GATE_Y_FACTOR = 1.0  # max y move between frames as a multiple of track box height
+
+
+class Track(object):
+    '''
+    One tracked object. x, y are the left, top of the last box in
+    crop coordinates. px_speeds are abs px/sec of accepted steps.
+    '''
+
+    def __init__(self, track_id, box, cap_time):
+        self.id = track_id
+        self.box = box
+        self.start_x = box[0]
+        self.start_time = cap_time
+        self.prev_x = box[0]
+        self.prev_time = cap_time
+        self.last_seen = cap_time
+        self.px_speeds = []
+        self.velocity = 0.0  # signed px/sec for prediction
+        self.step_px = 0     # last x move and seconds used for a speed step
+        self.step_sec = 0.0
+        self.done = False
+        self.first_image = None
+
+    @property
+    def steps(self):
+        return len(self.px_speeds)
+
+    @property
+    def direction(self):
+        return "L2R" if self.box[0] - self.start_x > 0 else "R2L"
+
+    def predict_x(self, cap_time):
+        '''Return predicted left edge x at cap_time'''
+        return self.prev_x + self.velocity * (cap_time - self.prev_time)
+
+    def px_speed(self):
+        '''Return median px/sec of the accepted steps'''
+        return float(np.median(self.px_speeds)) if self.px_speeds else 0.0
+
+
+class Tracker(object):
+    '''
+    Interface for speed-cam.py trackers. update() takes the motion boxes
+    (x, y, w, h) of a frame, biggest first, and the frame capture time.
+    It returns the Tracks that reached event_count speed steps on that
+    frame. tracks is the list of current Tracks. For trackers that follow
+    one Track, event is what happened to track on the last update(),
+    else None.
+    '''
+    name = None
+
+    def __init__(self, min_step_px, max_step_px, event_count, event_timeout_sec):
+        self.min_step_px = min_step_px
+        self.max_step_px = max_step_px
+        self.event_count = event_count
+        self.event_timeout_sec = event_timeout_sec
+        self.tracks = []
+        self.next_id = 1
+        self.event = None
+        self.track = None
+
+    def new_track(self, box, cap_time):
+        track = Track(self.next_id, box, cap_time)
+        self.next_id += 1
+        self.tracks.append(track)
+        return track
+
+    def new_tracks(self, cap_time):
+        '''Return Tracks started on the frame captured at cap_time'''
+        return [t for t in self.tracks if t.start_time == cap_time]
+
+    def update(self, boxes, cap_time):
+        raise NotImplementedError
+
+
+class SingleTracker(Tracker):
+    '''
+    The original speed-cam.py tracker for the biggest box. Steps are the
+    x move from the previous frame box. A step over max_step_px is ignored
+    if the Track has up to half of event_count steps, otherwise the Track
+    ends. After a finished Track, boxes are ignored for track_timeout_sec
+    so the same object is not tracked twice. event is "new", "add",
+    "reset" (event_timeout_sec passed), "out" (over max_step_px), "slow"
+    (under min_step_px), "wait" (track_timeout_sec) or None.
+    '''
+    name = "single"
+
+    def __init__(self, min_step_px, max_step_px, event_count,
+                 event_timeout_sec, track_timeout_sec=0.0):
+        Tracker.__init__(self, min_step_px, max_step_px, event_count, event_timeout_sec)
+        self.track_timeout_sec = track_timeout_sec
+        self.wait_until = 0.0  # frame capture time when track timeout ends
+
+    def update(self, boxes, cap_time):
+        self.event = None
+        if cap_time < self.wait_until:
+            self.event = "wait"
+            return []
+        if not boxes:
+            return []
+        box = boxes[0]
+        if not self.tracks:
+            self.track = self.new_track(box, cap_time)
+            self.event = "new"
+            return []
+        track = self.tracks[0]
+        self.track = track
+        if cap_time - track.last_seen >= self.event_timeout_sec:
+            # start a new track on the next box
+            self.tracks = []
+            self.event = "reset"
+            return []
+        track.step_px = abs(box[0] - track.box[0])
+        track.step_sec = cap_time - track.prev_time
+        track.box = box
+        if self.min_step_px <= track.step_px <= self.max_step_px:
+            track.last_seen = cap_time
+            if track.step_sec <= 0:
+                return []  # same frame timestamp eg duplicate frame from stream
+            track.px_speeds.append(track.step_px / track.step_sec)
+            track.prev_x = box[0]
+            track.prev_time = cap_time
+            self.event = "add"
+            if track.steps >= self.event_count:
+                track.done = True
+                self.tracks = []
+                self.wait_until = cap_time + self.track_timeout_sec
+                return [track]
+        elif track.step_px > self.max_step_px:
+            self.event = "out"
+            if track.steps <= self.event_count / 2:
+                track.last_seen = cap_time
+            else:
+                self.tracks = []
+        else:
+            self.event = "slow"
+        return []
+
+
+class MultiTracker(Tracker):
+    '''
+    Match motion boxes to Tracks each frame. update() returns the Tracks
+    that reached event_count steps on that frame.
+    '''
+    name = "multi"
+
+    def __init__(self, min_step_px, max_step_px, event_count,
+                 event_timeout_sec, max_tracks=20):
+        Tracker.__init__(self, min_step_px, max_step_px, event_count, event_timeout_sec)
+        self.max_tracks = max_tracks
+
+    def cost_matrix(self, boxes, cap_time):
+        '''
+        Return the tracks x boxes matrix of predicted x distance plus y
+        distance. Gated pairs are np.inf
+        '''
+        box_x = np.array([b[0] for b in boxes], dtype=np.float32)
+        box_y = np.array([b[1] for b in boxes], dtype=np.float32)
+        pred_x = np.array([t.predict_x(cap_time) for t in self.tracks], dtype=np.float32)
+        track_y = np.array([t.box[1] for t in self.tracks], dtype=np.float32)
+        track_h = np.array([t.box[3] for t in self.tracks], dtype=np.float32)
+        dx = np.abs(box_x[np.newaxis, :] - pred_x[:, np.newaxis])
+        dy = np.abs(box_y[np.newaxis, :] - track_y[:, np.newaxis])
+        cost = dx + dy
+        gated = (dx > self.max_step_px) | (dy > (track_h * GATE_Y_FACTOR)[:, np.newaxis])
+        cost[gated] = np.inf
+        return cost
+
+    def match(self, boxes, cap_time):
+        '''Return a list of (track, box index) pairs, lowest cost first'''
+        if not self.tracks or not boxes:
+            return []
+        cost = self.cost_matrix(boxes, cap_time)
+        pairs = []
+        used_tracks = set()
+        used_boxes = set()
+        for index in np.argsort(cost, axis=None):
+            row, col = np.unravel_index(index, cost.shape)
+            if not np.isfinite(cost[row, col]):
+                break
+            if row in used_tracks or col in used_boxes:
+                continue
+            used_tracks.add(row)
+            used_boxes.add(col)
+            pairs.append((self.tracks[row], col))
+            if len(used_tracks) == len(self.tracks) or len(used_boxes) == len(boxes):
+                break
+        return pairs
+
+    def step(self, track, box, cap_time):
+        '''Add box to track. Return True if it is a new speed step'''
+        step_px = abs(box[0] - track.prev_x)
+        step_sec = cap_time - track.prev_time
+        if step_sec <= 0:
+            return False  # same frame timestamp eg duplicate frame from stream
+        track.box = box
+        if step_px < self.min_step_px or step_px > self.max_step_px:
+            return False
+        track.step_px = step_px
+        track.step_sec = step_sec
+        if not track.done:
+            track.px_speeds.append(step_px / step_sec)
+        track.velocity = (box[0] - track.prev_x) / step_sec
+        track.prev_x = box[0]
+        track.prev_time = cap_time
+        track.last_seen = cap_time
+        return True
+
+    def update(self, boxes, cap_time):
+        '''
+        Match boxes (x, y, w, h) biggest first to Tracks and start new
+        Tracks for the rest. Returns the list of Tracks finished this frame.
+        '''
+        boxes = boxes[:self.max_tracks]
+        # drop tracks with no steps for event_timeout_sec
+        self.tracks = [t for t in self.tracks
+                       if cap_time - t.last_seen < self.event_timeout_sec]
+        finished = []
+        matched = set()
+        for track, col in self.match(boxes, cap_time):
+            matched.add(col)
+            box = boxes[col]
+            if not self.step(track, box, cap_time) or track.done:
+                continue
+            logging.debug("Track %i %i/%i xy(%i,%i) %.0f px/sec", track.id,
+                          track.steps, self.event_count, box[0], box[1], track.px_speed())
+            if track.steps >= self.event_count:
+                track.done = True
+                finished.append(track)
+        for col, box in enumerate(boxes):
+            if col in matched or len(self.tracks) >= self.max_tracks:
+                continue
+            track = self.new_track(box, cap_time)
+            logging.debug("Track %i New xy(%i,%i)", track.id, box[0], box[1])
+        return finished
@@ -50,6 +50,7 @@ import sys
 import time
 import datetime
 import glob
+import importlib
 import shutil
 import logging
 import sqlite3
@@ -112,7 +113,13 @@ default_settings = {
     "MO_X_LR_SIDE_BUFF_PX": 10,
     "MO_TRACK_TIMEOUT_SEC": 0.5,
     "MO_EVENT_TIMEOUT_SEC": 0.3,
+    "MO_MULTI_TRACK_ON": False,
+    "MO_MULTI_MAX_TRACKS": 10,
     "MO_MAX_SPEED_OVER": 0,
+    "MO_IDLE_FPS": 0,
+    "MO_BURST_HOLD_SEC": 5.0,
+    "MO_STRIDE_MAX": 1,
+    "MO_STRIDE_TARGET_PX": 10,
     "MO_CROP_AUTO_ON": False,
     "MO_CROP_X_LEFT": 50,
     "MO_CROP_X_RIGHT": 250,
@@ -121,12 +128,57 @@ default_settings = {
     "CAMERA": "pilibcam",
     "CAM_LOCATION": "Front Window",
     "USBCAM_SRC": 0,
+    "USBCAM_FOURCC": "",
+    "USBCAM_BUFFER_SIZE": 0,
     "RTSPCAM_SRC": "rtsp://user:password@IP:554/path",
+    "VIDFILE_SRC": "media/video/test.mp4",
+    "VIDFILE_REALTIME_ON": False,
+    "GSTCAM_SRC": "rtsp://user:password@IP:554/path",
+    "GSTCAM_SCALE_ON": True,
+    "GSTCAM_GRAY_ON": False,
+    "GSTCAM_LATENCY_MS": 200,
+    "FFMPEGCAM_SRC": "rtsp://user:password@IP:554/path",
+    "FFMPEGCAM_COLOR_FPS": 2.0,
+    "FFMPEGCAM_RTSP_TCP_ON": True,
+    "MJPEGCAM_SRC": "http://user:password@IP/video.mjpg",
+    "MJPEGCAM_REDUCE": 1,
+    "SIMCAM_SPEEDS": [30, 45, 60],
+    "SIMCAM_DIRECTIONS": "both",
+    "SIMCAM_OBJ_SIZE": (60, 30),
+    "SIMCAM_GAP_SEC": 2.0,
+    "SIMCAM_LANES": 1,
+    "SIMCAM_NOISE": 4,
+    "SIMCAM_LIGHT_CHANGE": 0.2,
+    "SIMCAM_REALTIME_ON": False,
+    "SIMCAM_TRUTH_PATH": "media/simcam-truth.csv",
+    "NETCAM_SRC": "localhost:8765",
+    "NETCAM_PORT": 8765,
+    "NETCAM_FULL_FRAME_SEC": 5.0,
+    "NETCAM_JPG_QUALITY": 80,
+    "CAM_START_TIMEOUT_SEC": 5.0,
+    "CAM_STOP_TIMEOUT_SEC": 3.0,
+    "CAM_FRAME_POOL_SIZE": 8,
+    "CAM_STALL_SEC": 3.0,
+    "CAM_RECONNECT_MIN_SEC": 0.5,
+    "CAM_RECONNECT_MAX_SEC": 30,
+    "CAM_SHM_BUS_ON": False,
+    "CAM_SHM_NAME": "speed-cam",
+    "CAM_SHM_SLOTS": 4,
     "IM_SIZE": (320, 240),
     "IM_VFLIP": False,
     "IM_HFLIP": False,
     "IM_ROTATION": 0,
     "IM_FRAMERATE": 30,
+    "DVR_ON": False,
+    "DVR_DIR": "media/dvr",
+    "DVR_SEGMENT_SEC": 60,
+    "DVR_MAX_MB": 2000,
+    "MULTICAM_PLUGINS": [],
+    "MULTICAM_CPUS": [],
+    "MULTICAM_QUEUE_SIZE": 1000,
+    "MULTICAM_STATS_SEC": 60,
+    "MULTICAM_RESTART_SEC": 10,
+    "MULTICAM_WEB_ON": True,
     "IM_DIR_PATH": "media/images",
     "IM_PREFIX": "speed-",
     "IM_FORMAT_EXT": ".jpg",
@@ -162,6 +214,20 @@ default_settings = {
     "CV_WINDOW_BIGGER": 1.0,
     "BLUR_SIZE": 10,
     "THRESHOLD_SENSITIVITY": 20,
+    "MO_AUTO_THRESHOLD_ON": False,
+    "MO_THRESHOLD_MIN": 20,
+    "MO_THRESHOLD_MAX": 60,
+    "MO_NOISE_FACTOR": 2.5,
+    "MO_ENGINE": "diff",
+    "MO_AVG_LEARN_RATE": 0.1,
+    "MO_MOG2_LEARN_RATE": -1,
+    "MO_KNN_LEARN_RATE": -1,
+    "MO_BG_HISTORY": 200,
+    "MO_DETECT_SCALE": 1,
+    "MO_DETECT_PYRDOWN_ON": False,
+    "MO_DETECT_REFINE_ON": True,
+    "MO_BLOB_STATS_ON": False,
+    "MO_BLOB_MAX_ASPECT": 0,
     "DB_DIR": "data",
     "DB_NAME": "speed_cam.db",
     "DB_TABLE": "speed",
@@ -205,6 +271,9 @@ cvGreen = (0, 255, 0)
 cvRed = (0, 0, 255)
 
 QUOTE = '"'  # Used for creating QUOTE delimited log file of speed data
+# Track steps to skip before adjusting the frame stride again. Frames already in
+# the ring and the one frame lag of frame difference contours span the old stride
+STRIDE_SETTLE_STEPS = 2
 FIX_MSG = """
     ---------- Upgrade Instructions -----------
     To Fix Problem Run ./menubox.sh UPGRADE menu pick.
@@ -291,6 +360,9 @@ except ImportError:
         logging.error("Try running menubox.sh then UPGRADE menu pick.")
     logging.error("%s %s Exiting Due to Error", PROG_NAME, PROG_VER)
     sys.exit(1)
+from motion_detect import create_motion_pipeline, ContourDetector
+from motion_track import SingleTracker, MultiTracker
+from speed_calc import auto_crop_area, speed_conv, EventClock
 
 # Import a single variable from the search_config.py file
 # This is done to auto create a media/search directory
@@ -315,6 +387,16 @@ else:
     print("WARN : import Failed. File Not Found %s" % userMotionFilePath)
     USER_MOTION_CODE_ON = False
 
+# speed-multicam.py runs one of these per camera plugin in worker processes.
+# The worker sets SPEED_CAM_PLUGIN and passes MULTICAM_QUEUE for sending
+# speed rows and stats to its shared DB writer. See speed-multicam.py
+MULTICAM_PLUGIN = os.environ.get("SPEED_CAM_PLUGIN", "")
+MULTICAM_QUEUE = globals().get("MULTICAM_QUEUE", None)
+multicam_dropped = 0  # messages dropped because MULTICAM_QUEUE was full
+if MULTICAM_PLUGIN:
+    PLUGIN_ENABLE_ON = True
+    PLUGIN_NAME = MULTICAM_PLUGIN
+
 # Import Settings from specified plugin if PLUGIN_ENABLE_ON=True
 if PLUGIN_ENABLE_ON:  # Check and verify plugin and load variable overlay
     pluginDir = os.path.join(baseDir, "plugins")
@@ -348,6 +430,15 @@ if PLUGIN_ENABLE_ON:  # Check and verify plugin and load variable overlay
         logging.info("How-to-Install-or-Upgrade#quick-install")
         logging.warning("%s %s Exiting Due to Error", PROG_NAME, PROG_VER)
         sys.exit(1)
+    elif MULTICAM_PLUGIN:
+        # import the plugin directly. Other workers share plugins/current.py
+        sys.path.insert(0, pluginDir)
+        try:
+            plugin = importlib.import_module("plugins." + PLUGIN_NAME)
+            globals().update({key: val for key, val in vars(plugin).items()
+                              if not key.startswith("_")})
+        except Exception as err_msg:
+            logging.warning("%s" % err_msg)
     else:
         pluginCurrent = os.path.join(pluginDir, "current.py")
         try:  # Copy image file to recent folder
@@ -373,23 +464,28 @@ if IM_BIGGER < 0.1:
     IM_BIGGER = 0.1
 
 # Calculate conversion from camera pixel width to actual speed.
-CONV_KPH_2_MPH = 0.621371       # conversion from KPH to MPH
-CONV_MM_PER_SEC_2_KPH = 0.0036  # conversion from MM/sec to KPH
-px_to_kph_L2R = float(CAL_OBJ_MM_L2R / CAL_OBJ_PX_L2R * CONV_MM_PER_SEC_2_KPH)
-px_to_kph_R2L = float(CAL_OBJ_MM_R2L / CAL_OBJ_PX_R2L * CONV_MM_PER_SEC_2_KPH)
+px_to_kph_L2R = speed_conv(CAL_OBJ_PX_L2R, CAL_OBJ_MM_L2R)
+px_to_kph_R2L = speed_conv(CAL_OBJ_PX_R2L, CAL_OBJ_MM_R2L)
 if MO_SPEED_MPH_ON:
     speed_units = "mph"
-    speed_conv_L2R = CONV_KPH_2_MPH * px_to_kph_L2R
-    speed_conv_R2L = CONV_KPH_2_MPH * px_to_kph_R2L
 else:
     speed_units = "kph"
-    speed_conv_L2R = px_to_kph_L2R
-    speed_conv_R2L = px_to_kph_R2L
+speed_conv_L2R = speed_conv(CAL_OBJ_PX_L2R, CAL_OBJ_MM_L2R, MO_SPEED_MPH_ON)
+speed_conv_R2L = speed_conv(CAL_OBJ_PX_R2L, CAL_OBJ_MM_R2L, MO_SPEED_MPH_ON)
 
 # path to alignment camera image
 align_filename = os.path.join(IM_RECENT_DIR_PATH, "align_cam.jpg")
 speed_CSV_filepath = os.path.join(baseDir, baseFileName + ".csv")
 AI_CSV_filepath = os.path.join(baseDir, "ai_pos_data.csv")
+calib_prefix = "calib-"
+if MULTICAM_PLUGIN:
+    # speed-multicam.py workers share the media folders and csv files.
+    # Add the plugin name so cameras do not overwrite each other
+    IM_PREFIX = IM_PREFIX + PLUGIN_NAME + "-"
+    calib_prefix = calib_prefix + PLUGIN_NAME + "-"
+    align_filename = os.path.join(IM_RECENT_DIR_PATH, "align_cam-" + PLUGIN_NAME + ".jpg")
+    speed_CSV_filepath = os.path.join(baseDir, baseFileName + "-" + PLUGIN_NAME + ".csv")
+    AI_CSV_filepath = os.path.join(baseDir, "ai_pos_data-" + PLUGIN_NAME + ".csv")
 
 # ------------------------------------------------------------------------------
 def show_config(filename):
@@ -415,6 +511,26 @@ def get_fps(start_time, frame_count):
         duration = float(time.time() - start_time)
         FPS = float(frame_count / duration)
         logging.info("%.2f fps Last %i Frames", FPS, frame_count)
+        stats = vs.stats()
+        logging.info("Stream captured=%i read=%i missed=%i dup_avoided=%i strided=%i",
+                     stats['captured'], stats['read'],
+                     stats['missed'], stats['dup_avoided'], stats['strided'])
+        # motion stage metrics eg the MO_AUTO_THRESHOLD_ON threshold
+        mo_stats = mo_detector.stats()
+        if MO_AUTO_THRESHOLD_ON:
+            logging.info("Motion threshold=%i noise=%.1f changes=%i",
+                         mo_stats['mo_threshold'], mo_stats['mo_noise'],
+                         mo_stats['mo_threshold_changes'])
+        stats.update(mo_stats)
+        if MULTICAM_QUEUE is not None:
+            stats['fps'] = FPS
+            stats['queue_dropped'] = multicam_dropped
+            multicam_send(("stats", PLUGIN_NAME, stats))
+        if hasattr(vs, 'dvr'):
+            stats = vs.dvr.stats()
+            logging.info("DVR recorded=%i dropped=%i segments=%i deleted=%i",
+                         stats['dvr_recorded'], stats['dvr_dropped'],
+                         stats['dvr_segments'], stats['dvr_deleted'])
         frame_count = 0
         start_time = time.time()
     else:
@@ -422,6 +538,48 @@ def get_fps(start_time, frame_count):
     return start_time, frame_count
 
 
+# ------------------------------------------------------------------------------
+def stride_for_step(step_px, step_sec):
+    """
+    Return the frame stride that moves the tracked object about
+    MO_STRIDE_TARGET_PX between processed frames. step_px is the
+    movement measured over the last step_sec seconds of capture time.
+    Returns 1 if the stream does not measure its grab interval since
+    it cannot stride eg backends that do not call decode_due().
+    """
+    grab_interval = getattr(vs, "grab_interval", 0.0)
+    if grab_interval <= 0 or step_sec <= 0:
+        return 1
+    px_per_frame = step_px / step_sec * grab_interval
+    if px_per_frame <= 0:
+        return MO_STRIDE_MAX
+    return max(1, min(MO_STRIDE_MAX, int(round(MO_STRIDE_TARGET_PX / px_per_frame))))
+
+
+def set_frame_stride(stride, reason):
+    """
+    Change how many captured frames the stream decodes one of
+    between processed frames. Returns True if the stride changed.
+    """
+    if stride == vs.stride:
+        return False
+    logging.info("Stride %i -> %i Frames %s", vs.stride, stride, reason)
+    vs.set_stride(stride)
+    return True
+
+
+# ------------------------------------------------------------------------------
+def gray_image(image):
+    """
+    Return a greyscale image. Streams may already deliver single channel
+    frames eg GSTCAM_GRAY_ON. These are copied since stream frame buffers
+    are recycled and the previous greyscale image is kept for the diff.
+    """
+    if image.ndim == 2:
+        return image.copy()
+    return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+
 # ------------------------------------------------------------------------------
 def is_daytime(image, threshold):
     """
@@ -429,7 +587,7 @@ def is_daytime(image, threshold):
     used for determining if it is day or night. Bright enough to save image.
     """
     day = False
-    grayimage = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    grayimage = gray_image(image)
     pix_ave = int(np.mean(grayimage))
     if pix_ave >= threshold:
         day = True
@@ -518,8 +676,8 @@ def show_settings():
         else:
             print("                  (Change Settings in %s)" % configFilePath)
         print(
-            "Logging ......... Log_data_to_CSV=%s  log_filename=%s.csv (CSV format)"
-            % (LOG_DATA_TO_CSV, baseFileName)
+            "Logging ......... Log_data_to_CSV=%s  log_filename=%s (CSV format)"
+            % (LOG_DATA_TO_CSV, os.path.basename(speed_CSV_filepath))
         )
         print(
             "                  LOG_TO_FILE_ON=%s  LOG_FILE_PATH=%s"
@@ -556,6 +714,18 @@ def show_settings():
             "                  MO_TRACK_TIMEOUT_SEC=%.2f sec wait after Track Ends"
             " (avoid retrack of same object)" % (MO_TRACK_TIMEOUT_SEC)
         )
+        print(
+            "                  MO_MULTI_TRACK_ON=%s  MO_MULTI_MAX_TRACKS=%i"
+            % (MO_MULTI_TRACK_ON, MO_MULTI_MAX_TRACKS)
+        )
+        print(
+            "                  MO_IDLE_FPS=%.1f fps while idle (0=off)  MO_BURST_HOLD_SEC=%.1f sec"
+            % (MO_IDLE_FPS, MO_BURST_HOLD_SEC)
+        )
+        print(
+            "                  MO_STRIDE_MAX=%i frames (1=off)  MO_STRIDE_TARGET_PX=%i px per processed frame"
+            % (MO_STRIDE_MAX, MO_STRIDE_TARGET_PX)
+        )
         print(
             "Speed Photo ..... Size=%ix%i px  IM_BIGGER=%.1f"
             "  rotation=%i  VFlip=%s  HFlip=%s "
@@ -590,6 +760,25 @@ def show_settings():
             "  THRESHOLD_SENSITIVITY=%i  CV_CIRCLE_SIZE_PX=%i px"
             % (MO_MIN_AREA_PX, BLUR_SIZE, THRESHOLD_SENSITIVITY, CV_CIRCLE_SIZE_PX)
         )
+        print(
+            "                  MO_AUTO_THRESHOLD_ON=%s  MO_THRESHOLD_MIN=%i  MO_THRESHOLD_MAX=%i"
+            "  MO_NOISE_FACTOR=%.1f"
+            % (MO_AUTO_THRESHOLD_ON, MO_THRESHOLD_MIN, MO_THRESHOLD_MAX, MO_NOISE_FACTOR)
+        )
+        print(
+            "                  MO_ENGINE=%s  MO_AVG_LEARN_RATE=%.3f  MO_MOG2_LEARN_RATE=%.3f"
+            "  MO_KNN_LEARN_RATE=%.3f  MO_BG_HISTORY=%i frames"
+            % (MO_ENGINE, MO_AVG_LEARN_RATE, MO_MOG2_LEARN_RATE,
+               MO_KNN_LEARN_RATE, MO_BG_HISTORY)
+        )
+        print(
+            "                  MO_DETECT_SCALE=1/%i  MO_DETECT_PYRDOWN_ON=%s  MO_DETECT_REFINE_ON=%s"
+            % (MO_DETECT_SCALE, MO_DETECT_PYRDOWN_ON, MO_DETECT_REFINE_ON)
+        )
+        print(
+            "                  MO_BLOB_STATS_ON=%s  MO_BLOB_MAX_ASPECT=%.1f (0=off)"
+            % (MO_BLOB_STATS_ON, MO_BLOB_MAX_ASPECT)
+        )
         print(
             "                  CV_WINDOW_BIGGER=%d GUI_WINDOW_ON=%s"
             " (Display OpenCV Status Windows on GUI Desktop)"
@@ -1010,11 +1199,14 @@ def free_disk_space_check(lastSpaceCheck):
 
 
 # ------------------------------------------------------------------------------
-def get_image_name(path, prefix):
+def get_image_name(path, prefix, event_name=None):
     """
     build image file names by number sequence or
-    date/time Added tenth of second
+    date/time Added tenth of second.
+    event_name is a speed event name from EventClock eg 20221118-1530452
     """
+    if event_name is not None:
+        return "%s/%s%s.jpg" % (path, prefix, event_name)
     rightNow = datetime.datetime.now()
     filename = "%s/%s%04d%02d%02d-%02d%02d%02d%d.jpg" % (
         path,
@@ -1140,28 +1332,103 @@ def db_open(db_file):
 
 
 # ------------------------------------------------------------------------------
-def get_motion_contours(grayimage1):
+def db_insert(speed_data):
+    """
+    Insert speed_data row into the sqlite3 database table or send it
+    to the speed-multicam.py shared DB writer if running as a worker.
+    """
+    if MULTICAM_QUEUE is not None:
+        if multicam_send(("speed", PLUGIN_NAME, speed_data)):
+            logging.info(" SQL - Sent Data Row to speed-multicam DB Writer")
+        return
+    # Note cam_location and status may not be in proper order
+    # Unless speed table is recreated.
+    sql_cmd = """insert into {} values {}""".format(
+        DB_TABLE, speed_data
+    )
+    db_conn = db_check(DB_PATH)
+    if db_conn is None:
+        return
+    # Always roll back and close so a failed insert does not leave
+    # a write transaction open that locks the database for the next one.
+    try:
+        db_conn.execute(sql_cmd)
+        db_conn.commit()
+    except sqlite3.Error as e:
+        db_conn.rollback()
+        logging.error("sqlite3 DB %s", DB_PATH)
+        logging.error(
+            "Failed: To INSERT Speed Data into TABLE %s",
+            DB_TABLE,
+        )
+        logging.error("Err Msg: %s", e)
+    else:
+        logging.info(
+            " SQL - Inserted Data Row into %s", DB_PATH
+        )
+    finally:
+        db_conn.close()
+
+
+# ------------------------------------------------------------------------------
+def multicam_send(msg):
+    """
+    Send a message to speed-multicam.py without blocking the motion loop.
+    Returns False and counts it as dropped if the queue is full.
+    """
+    global multicam_dropped
+    try:
+        MULTICAM_QUEUE.put_nowait(msg)
+    except Exception:  # queue.Full
+        multicam_dropped += 1
+        logging.warning("speed-multicam Queue Full. Dropped %s message", msg[0])
+        return False
+    return True
+
+
+# ------------------------------------------------------------------------------
+def get_motion_boxes():
     """
     Read a Camera stream image frame, crop and
-    get diff of two cropped greyscale images.
-    Use opencv to detect motion contours.
+    get diff with the previous cropped greyscale image.
+    Use mo_detector to find motion boxes. See motion_detect.py
     Added timeout_sec in case camera has a problem.
     Eg. Network problem with RTSP cam
+    Returns image, motion boxes biggest first and the monotonic
+    capture timestamp of the frame for speed calculations.
     """
     image_ok = False
     start_time = time.time()
     timeout_sec = 60  # seconds to wait if camera communications is lost eg network stream.
                   # Note to self.  Look at adding setting to config.py
     minutes_to_wait = 10
-    global differenceimage
 
     while not image_ok:
-        image = vs.read()  # Read image data from video steam thread instance
+        # Wait for a Frame newer than the last one processed so
+        # identical frames are not diffed. None if none within 1 second.
+        frame = vs.read_next(timeout=1.0)
         # crop image to motion tracking area only
         try:
+            image = frame.image
             image_crop = image[MO_CROP_Y_UPPER:MO_CROP_Y_LOWER, MO_CROP_X_LEFT:MO_CROP_X_RIGHT]
             image_ok = True
-        except (ValueError, TypeError):
+        except (ValueError, TypeError, AttributeError):
+            if getattr(vs, "eof", False):
+                # vidfile replay is finished
+                logging.info("%s End of Video File. Exiting Program", CAMERA.upper())
+                vs.stop(CAM_STOP_TIMEOUT_SEC)
+                sys.exit(0)
+            if hasattr(vs, "health"):
+                # Stream thread reconnects by itself so park here until
+                # frames resume. read_next() waits so this does not spin.
+                if time.time() - start_time > timeout_sec:
+                    stats = vs.stats()
+                    logging.warning("%s Stream %s. Waiting for frames. reconnects=%i attempts=%i down=%.0f sec",
+                                    CAMERA.upper(), stats['state'], stats['reconnects'],
+                                    stats['reconnect_attempts'], stats['down_sec'])
+                    start_time = time.time()
+                image_ok = False
+                continue
             if time.time() - start_time > timeout_sec:
                 logging.error("image Stream Image is Not Complete. Cannot Crop. Retry.")
                 logging.error(
@@ -1178,53 +1445,8 @@ def get_motion_contours(grayimage1):
                     sys.exit(1)
             image_ok = False
                 
-    # Convert to gray scale, which is easier
-    grayimage2 = cv2.cvtColor(image_crop, cv2.COLOR_BGR2GRAY)
-    # Get differences between the two greyed images
-    differenceimage = cv2.absdiff(grayimage1, grayimage2)
-    # Blur difference image to enhance motion vectors
-    differenceimage = cv2.blur(differenceimage, (BLUR_SIZE, BLUR_SIZE))
-    # Get threshold of blurred difference image
-    # based on THRESHOLD_SENSITIVITY variable
-    retval, thresholdimage = cv2.threshold(
-        differenceimage, THRESHOLD_SENSITIVITY, 255, cv2.THRESH_BINARY
-    )
-    try:
-        # opencv 3 syntax default
-        contours, hierarchy = cv2.findContours(
-            thresholdimage, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE
-        )
-    except ValueError:
-        # opencv 2 syntax
-        thresholdimage, contours, hierarchy = cv2.findContours(
-            thresholdimage, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE
-        )
-    return image, grayimage2, contours
-
-
-# ------------------------------------------------------------------------------
-def get_biggest_contour(contours):
-    """
-    Process contours and return biggest if found
-    within rect of interest
-    """
-    motion_found = False
-    biggest_contour = []
-    # if contours found, find the one with biggest area
-    if contours:
-        biggest_area = MO_MIN_AREA_PX
-        for c in contours:
-            # get area of contour
-            found_area = cv2.contourArea(c)
-            if found_area > biggest_area:
-                cur_contour = cv2.boundingRect(c)
-                (x, y, w, h) = cur_contour
-                # check if object contour is completely within crop area
-                if x > x_buf and x + w < MO_CROP_X_RIGHT - MO_CROP_X_LEFT - x_buf:
-                    biggest_contour = cur_contour
-                    motion_found = True
-                    biggest_area = found_area
-    return motion_found, biggest_contour
+    # Diff, blur and threshold into the preallocated motion buffers
+    return image, mo_detector.detect(image_crop), frame.timestamp
 
 
 # ------------------------------------------------------------------------------
@@ -1239,6 +1461,319 @@ def speed_image_add_lines(image, color):
     return image
 
 
+# ------------------------------------------------------------------------------
+def speed_sign_image(ave_speed):
+    """
+    Return a new IM_SHOW_SIGN_ON speed sign image showing ave_speed
+    """
+    image_sign_bg = np.zeros((IM_SIGN_RESIZE[0], IM_SIGN_RESIZE[1], 4))
+    image_sign_view = cv2.resize(image_sign_bg, (IM_SIGN_RESIZE))
+    image_sign_text = str(int(round(ave_speed, 0)))
+    cv2.putText(
+        image_sign_view,
+        image_sign_text,
+        IM_SIGN_TEXT_XY,
+        cv2.FONT_HERSHEY_SIMPLEX,
+        IM_SIGN_FONT_SCALE,
+        IM_SIGN_FONT_COLOR,
+        IM_SIGN_FONT_THICK_PX,
+    )
+    return image_sign_view
+
+
+# ------------------------------------------------------------------------------
+def save_speed_event(image, box, ave_speed, travel_direction, cap_time,
+                     mo_im_first=None, mo_im_last=None):
+    """
+    Save the speed image for an object with motion box (x, y, w, h) in
+    crop coordinates plus the AI, first and last images, then insert the
+    database record and csv log entry. cap_time is the capture time of
+    the frame that finished the track. Returns the image filename.
+    """
+    (track_x, track_y, track_w, track_h) = box
+    if travel_direction == "L2R":
+        cal_obj_px = CAL_OBJ_PX_L2R
+        cal_obj_mm = CAL_OBJ_MM_L2R
+    else:
+        cal_obj_px = CAL_OBJ_PX_R2L
+        cal_obj_mm = CAL_OBJ_MM_R2L
+    font = cv2.FONT_HERSHEY_SIMPLEX
+    # Calculate position of text on the images
+    if IM_SHOW_TEXT_BOTTOM_ON:
+        text_y = image_height - 50  # show text at bottom of image
+    else:
+        text_y = 10  # show text at top of image
+    # Record log_time for use later in csv and sqlite. Use the frame
+    # capture time so vidfile and simcam replays faster than real time
+    # do not repeat the idx and image names.
+    log_time = event_clock.event_time(cap_time)
+    log_idx = event_clock.event_name(log_time)
+    # Resize and process previous image
+    # before saving to disk
+    # Create a calibration image file name
+    # There are no subdirectories to deal with
+    if CALIBRATE_ON:
+        speed_path = IM_DIR_PATH
+        filename = get_image_name(speed_path, calib_prefix, log_idx)
+        image = take_calibration_image(ave_speed, filename, image)
+    else:
+        # Check if subdirectories configured
+        # and create new subdirectory if required
+        speed_path = subdir_checks(
+            IM_SUBDIR_MAX_HOURS,
+            IM_SUBDIR_MAX_FILES,
+            IM_DIR_PATH,
+            IM_PREFIX,
+        )
+
+        # Create image file name
+        if IM_SHOW_SPEED_FILENAME_ON:
+            # add ave_speed value to filename after prefix
+            speed_prefix = (
+                IM_PREFIX
+                + str(int(round(ave_speed)))
+                + "-"
+            )
+            filename = get_image_name(
+                speed_path, speed_prefix, log_idx
+            )
+        else:
+            # create image file name path
+            filename = get_image_name(
+                speed_path, IM_PREFIX, log_idx
+            )
+
+    # Add motion rectangle to image if required
+    if IM_SHOW_CROP_AREA_ON:
+        image = speed_image_add_lines(image, cvRed)
+        # show centre of motion if required
+        if CV_SHOW_CIRCLE_ON:
+            cv2.circle(
+                image,
+                (track_x + MO_CROP_X_LEFT, track_y + MO_CROP_Y_UPPER),
+                CV_CIRCLE_SIZE_PX,
+                cvGreen,
+                CV_LINE_WIDTH_PX,
+            )
+        else:
+            cv2.rectangle(
+                image,
+                (
+                int(track_x + MO_CROP_X_LEFT),
+                int(track_y + MO_CROP_Y_UPPER),
+                ),
+                (
+                int(track_x + MO_CROP_X_LEFT + track_w),
+                int(track_y + MO_CROP_Y_UPPER + track_h),
+                ),
+                cvGreen,
+                CV_LINE_WIDTH_PX,
+                )
+    big_image = cv2.resize(image, (image_width, image_height ))
+    # Write text on image before saving
+    # if required.
+    if IM_SHOW_TEXT_ON:
+        image_text = "SPEED %.1f %s - %s" % (
+            ave_speed,
+            speed_units,
+            filename,
+        )
+        text_x = int(
+            (image_width / 2)
+            - (len(image_text) * IM_FONT_SIZE_PX / 3)
+        )
+        if text_x < 2:
+            text_x = 2
+        cv2.putText(
+            big_image,
+            image_text,
+            (text_x, text_y),
+            font,
+            IM_FONT_SCALE,
+            IM_FONT_COLOR,
+            IM_FONT_THICKNESS,
+        )
+
+    # Save resized image. If jpg format, user can customize image quality 1-100 (higher is better)
+    # and/or enble/disable optimization per config.py settings.
+    # otherwise if png, bmp, gif, etc normal image write will occur
+    logging.info(" Saved %ix%i %s", image_width, image_height, filename)
+    if ((IM_FORMAT_EXT.lower() == ".jpg" or IM_FORMAT_EXT.lower() == ".jpeg")
+         and IM_JPG_OPTIMIZE_ON):
+        try:
+            cv2.imwrite(filename, big_image,
+                        [ int(cv2.IMWRITE_JPEG_QUALITY), IM_JPG_QUALITY,
+                          int(cv2.IMWRITE_JPEG_OPTIMIZE), 1
+                        ]
+                       )
+        except:  # sometimes issue with IP camera so default to non optimized imwrite
+            logging.warning('Problem writing optimized. Saving Normal %s', filename)
+            cv2.imwrite(filename, big_image)
+    else:
+        cv2.imwrite(filename, big_image)
+
+    # Save a positive AI motion image for later processing
+    # make sure there is enough light for a clear image.
+    if IM_SAVE_4AI_ON:
+        if is_daytime(mo_im_last, IM_SAVE_4AI_DAY_THRESH):
+            AI_pos_filename = get_image_name(IM_SAVE_4AI_POS_DIR, IM_PREFIX, log_idx)
+            logging.info(" Saved %s", AI_pos_filename)
+            cv2.imwrite(AI_pos_filename, mo_im_last)
+            ai_data = ("%s, %i, %i, %i, %i" %
+                       (QUOTE + AI_pos_filename + QUOTE,
+                       MO_CROP_X_LEFT + track_x,
+                       MO_CROP_Y_UPPER + track_y,
+                       track_w, track_h))
+            log_to_csv(AI_CSV_filepath, ai_data)
+        else:
+            logging.info(' Low Light - AI pos Image Not Saved IM_SAVE_4AI_DAY_THRESH = %i'
+                         % IM_SAVE_4AI_DAY_THRESH)
+
+    if IM_FIRST_AND_LAST_ON:
+        # Save first and last image for later AI processing
+        fn_split = os.path.splitext(filename)
+        filename_first = fn_split[0] + "_1" + fn_split[1]
+        filename_last = fn_split[0] + "_2" + fn_split[1]
+        logging.info("Saving first %s", filename_first)
+        cv2.imwrite(filename_first, mo_im_first)
+        logging.info("Saving last %s", filename_last)
+        cv2.imwrite(filename_last, mo_im_last)
+
+    if USER_MOTION_CODE_ON:
+        # ===========================================
+        # Put your user code in userMotionCode() function
+        # In the File user_motion_code.py
+        # ===========================================
+        try:
+            user_motion_code.userMotionCode(
+                vs, image_width, image_height, filename
+            )
+        except ValueError:
+            logging.error(
+                "Problem running userMotionCode function from File %s",
+                userMotionFilePath,
+            )
+        except TypeError as err:
+            logging.error(
+                "Problem with file user_motion_code.py Possibly out of date"
+            )
+            logging.error("Err Msg: %s", err)
+            logging.error(
+                "Suggest you delete/rename file and perform menubox UPGRADE"
+            )
+
+    log_timestamp = "%s%04d-%02d-%02d %02d:%02d:%02d%s" % (
+        QUOTE,
+        log_time.year,
+        log_time.month,
+        log_time.day,
+        log_time.hour,
+        log_time.minute,
+        log_time.second,
+        QUOTE,
+    )
+    m_area = track_w * track_h
+
+    if PLUGIN_ENABLE_ON:
+        plugin_name = PLUGIN_NAME
+    else:
+        plugin_name = "None"
+
+    # create the speed data list ready for db insert
+    speed_data = (
+        log_idx,
+        log_timestamp,
+        CAMERA.upper(),
+        round(ave_speed, 2),
+        speed_units,
+        filename,
+        image_width,
+        image_height,
+        IM_BIGGER,
+        travel_direction,
+        plugin_name,
+        track_x,
+        track_y,
+        track_w,
+        track_h,
+        m_area,
+        MO_CROP_X_LEFT,
+        MO_CROP_X_RIGHT,
+        MO_CROP_Y_UPPER,
+        MO_CROP_Y_LOWER,
+        MO_MAX_SPEED_OVER,
+        MO_MIN_AREA_PX,
+        MO_TRACK_EVENT_COUNT,
+        cal_obj_px,
+        cal_obj_mm,
+        "",
+        CAM_LOCATION,
+    )
+
+    # Insert speed_data into sqlite3 database table
+    db_insert(speed_data)
+
+    # Format and Save Data to CSV Log File
+    if LOG_DATA_TO_CSV:
+        log_csv_time = (
+            "%s%04d-%02d-%02d %02d:%02d:%02d%s"
+            % (
+                QUOTE,
+                log_time.year,
+                log_time.month,
+                log_time.day,
+                log_time.hour,
+                log_time.minute,
+                log_time.second,
+                QUOTE,
+            )
+        )
+        log_csv_text = (
+            "%s,%.2f,%s%s%s,%s%s%s,"
+            "%i,%i,%i,%i,%i,%s%s%s,%s,%s,%s"
+            % (
+                log_csv_time,
+                ave_speed,
+                QUOTE,
+                speed_units,
+                QUOTE,
+                QUOTE,
+                filename,
+                QUOTE,
+                track_x,
+                track_y,
+                track_w,
+                track_h,
+                track_w * track_h,
+                QUOTE,
+                travel_direction,
+                QUOTE,
+                QUOTE,
+                CAM_LOCATION,
+                QUOTE,
+            )
+        )
+        log_to_csv(speed_CSV_filepath, log_csv_text)
+
+    # Manage a maximum number of files
+    # and delete oldest if required.
+    if IM_MAX_FILES > 0:
+        delete_old_files(
+            IM_MAX_FILES, speed_path, IM_PREFIX
+        )
+
+    # Save most recent files
+    # to a recent folder if required
+    if IM_RECENT_MAX_FILES > 0 and not CALIBRATE_ON:
+        save_recent(
+            IM_RECENT_MAX_FILES,
+            IM_RECENT_DIR_PATH,
+            filename,
+            IM_PREFIX,
+        )
+    return filename
+
+
 # ------------------------------------------------------------------------------
 def speed_notify():
     """
@@ -1283,25 +1818,11 @@ def speed_camera():
         """)
 
     # initialize variables and settings
-    ave_speed = 0.0
     # initialize variables
     frame_count = 0   # used for FPS calculation
     fps_time = time.time()
-    first_event = True  # Start a New Motion Track
-    start_pos_x = None
-    end_pos_x = None
-    prev_pos_x = None
-    travel_direction = None
-    font = cv2.FONT_HERSHEY_SIMPLEX
-
-    # Calculate position of text on the images
-    if IM_SHOW_TEXT_BOTTOM_ON:
-        text_y = image_height - 50  # show text at bottom of image
-    else:
-        text_y = 10  # show text at top of image
 
     lastSpaceCheck = datetime.datetime.now()
-    speed_path = IM_DIR_PATH
 
     # check and open sqlite3 db
     db_conn = db_check(DB_PATH)
@@ -1323,22 +1844,18 @@ def speed_camera():
     db_conn.close()
     speed_notify()
 
-    # initialize a cropped grayimage1 image
+    # initialize the motion pipeline previous greyscale crop image
     image2 = vs.read()  # Get image from VideoSteam thread instance
     try:
         # crop image to motion tracking area only
         image_crop = image2[MO_CROP_Y_UPPER:MO_CROP_Y_LOWER, MO_CROP_X_LEFT:MO_CROP_X_RIGHT]
     except:
-        vs.stop()
         logging.warning("Problem Connecting To Camera Stream.")
         logging.warning("Restarting Camera.  One Moment Please ...")
-        time.sleep(4)
+        vs.stop(CAM_STOP_TIMEOUT_SEC)  # returns when camera is released
         return
 
-    grayimage1 = cv2.cvtColor(image_crop, cv2.COLOR_BGR2GRAY)
-    track_count = 0
-    speed_list = []
-    event_timer = time.time()
+    mo_detector.prime(image_crop)
     image_sign_bg = np.zeros((IM_SIGN_RESIZE[0], IM_SIGN_RESIZE[1], 4))
     image_sign_view = cv2.resize(image_sign_bg, (IM_SIGN_RESIZE))
     image_sign_view_time = time.time()
@@ -1356,26 +1873,43 @@ def speed_camera():
     else:
         print("Logging Messages Disabled per LOG_VERBOSE_ON=%s" % LOG_VERBOSE_ON)
 
-    mo_track_timeout = datetime.datetime.now()
     ai_neg_time_on = datetime.datetime.now()
+    # Start in idle mode if enabled. Stream decodes only MO_IDLE_FPS frames per sec
+    burst_until = 0.0
+    stream_idle = MO_IDLE_FPS > 0
+    stride_settle = 0  # track steps to wait after a frame stride change
+    if stream_idle:
+        logging.info("Idle Mode MO_IDLE_FPS=%.1f fps until Motion Found", MO_IDLE_FPS)
+        vs.set_idle(MO_IDLE_FPS)
     print(HORIZ_LINE)
     logging.info("Begin Motion Tracking .....")
     # Start main speed camera loop
     still_scanning = True
     while still_scanning:
-        cur_track_time = time.time() # record event time.  Used for speed calc
-        # Detect motion snd return latest image, cropped greyscale and
-        # All motion contours
-        image2, grayimage1, contours = get_motion_contours(grayimage1)
-        # If contours found, returns the one with biggest area GT MO_MIN_AREA_PX
-        motion_found, big_contour = get_biggest_contour(contours)
-
-        # Keep camera running while waiting for timer to expire per MO_TRACK_TIMEOUT_SEC
-        if timer_is_on(mo_track_timeout):
-            continue
+        # Detect motion and return latest image, motion boxes biggest first
+        # and the frame capture time used for speed calc.
+        # Capture to capture time deltas are not skewed by processing time.
+        image2, motion_boxes, cur_track_time = get_motion_boxes()
+        motion_found = len(motion_boxes) > 0
+
+        if MO_IDLE_FPS > 0:
+            # Switch stream between idle and full frame rate burst mode
+            if motion_found or mo_detector.motion:
+                burst_until = cur_track_time + MO_BURST_HOLD_SEC
+                if stream_idle:
+                    logging.info("Burst Mode Full Frame Rate for at least %.1f sec", MO_BURST_HOLD_SEC)
+                    vs.set_idle(0)
+                    stream_idle = False
+            elif not stream_idle and cur_track_time > burst_until:
+                logging.info("Idle Mode MO_IDLE_FPS=%.1f fps No Motion for %.1f sec",
+                             MO_IDLE_FPS, MO_BURST_HOLD_SEC)
+                vs.set_idle(MO_IDLE_FPS)
+                stream_idle = True
 
         if GUI_WINDOW_ON or ALIGN_CAM_ON or CALIBRATE_ON:
-            image2_copy = image2  # make a copy of current image2 when needed
+            # draw track boxes and crop lines on a copy. image2 is a stream
+            # frame buffer that the ring, dvr and frame bus still use
+            image2_copy = image2.copy()
 
         if not motion_found:
             if IM_SAVE_4AI_ON and not timer_is_on(ai_neg_time_on):
@@ -1391,516 +1925,226 @@ def speed_camera():
                 logging.info(" Next AI neg image in %.2f hours",
                               float(IM_SAVE_4AI_NEG_TIMER_SEC / 3600))
 
-        else:   # Motion Found
-            (track_x, track_y, track_w, track_h) = big_contour
-            total_contours = len(contours)
-            biggest_area = int(track_w * track_h)
-            ##############################
-            # Process motion events and track object movement
-            ##############################
-            if first_event:  # This is a first valid motion event
-                first_event = False  # Only one first track event
-                track_start_time = cur_track_time  # Record track start time
-                prev_start_time = cur_track_time
-                start_pos_x = track_x
-                prev_pos_x = track_x
-                end_pos_x = track_x
+        ##############################
+        # Process motion events and track object movement. See motion_track.py
+        ##############################
+        finished = mo_tracker.update(motion_boxes, cur_track_time)
+        new_tracks = mo_tracker.new_tracks(cur_track_time)
+        if IM_FIRST_AND_LAST_ON and new_tracks:
+            # copy since stream frame buffers are recycled
+            mo_im_first = image2.copy()
+            for track in new_tracks:
+                track.first_image = mo_im_first
+
+        if MO_MULTI_TRACK_ON:
+            # MultiTracker has no single track event. Work from its tracks
+            for track in new_tracks:
+                logging.info(
+                    "New  - Track %i 0/%i xy(%i,%i) Start New Track",
+                    track.id,
+                    MO_TRACK_EVENT_COUNT,
+                    track.box[0],
+                    track.box[1],
+                )
+            if MO_STRIDE_MAX > 1:
+                # tracks still collecting speed steps and those that took one on this frame
+                active = [t for t in mo_tracker.tracks if not t.done]
+                stepped = [t for t in active
+                           if t.prev_time == cur_track_time and t.start_time < cur_track_time]
+                # tracks whose box moved too far from the last step for a speed step
+                out_range = [t for t in active
+                             if abs(t.box[0] - t.prev_x) > MO_MAX_X_DIFF_PX]
+                if new_tracks:
+                    # new object speed is not known yet so take the first step at full rate
+                    if set_frame_stride(1, "New Track"):
+                        stride_settle = STRIDE_SETTLE_STEPS
+                elif out_range:
+                    if set_frame_stride(1, "Out of Range"):
+                        stride_settle = STRIDE_SETTLE_STEPS
+                elif not active:
+                    # all tracks are measured so be ready for the next object
+                    set_frame_stride(1, "No Active Track")
+                elif stepped:
+                    if stride_settle:
+                        stride_settle -= 1
+                    elif set_frame_stride(min(stride_for_step(t.step_px, t.step_sec) for t in stepped),
+                                          "for %i px Step" % max(t.step_px for t in stepped)):
+                        # smallest stride keeps the fastest track within MO_MAX_X_DIFF_PX
+                        stride_settle = STRIDE_SETTLE_STEPS
+        elif mo_tracker.event == "new":
+            (track_x, track_y, track_w, track_h) = mo_tracker.track.box
+            logging.info(
+                "New  - 0/%i xy(%i,%i) Start New Track",
+                MO_TRACK_EVENT_COUNT,
+                track_x,
+                track_y,
+            )
+            if MO_STRIDE_MAX > 1:
+                # object speed is not known yet so take the first step at full rate
+                if set_frame_stride(1, "New Track"):
+                    stride_settle = STRIDE_SETTLE_STEPS
+        elif mo_tracker.event == "reset":
+            logging.info(
+                "Reset- event_timer %.2f>%.2f sec Exceeded",
+                cur_track_time - mo_tracker.track.last_seen,
+                MO_EVENT_TIMEOUT_SEC,
+            )
+            print(HORIZ_LINE)
+        elif mo_tracker.event in ("add", "out"):
+            track = mo_tracker.track
+            (track_x, track_y, track_w, track_h) = track.box
+            if track.direction == "L2R":
+                ave_speed = track.px_speed() * speed_conv_L2R
+            else:
+                ave_speed = track.px_speed() * speed_conv_R2L
+            if mo_tracker.event == "add":
                 logging.info(
-                    "New  - 0/%i xy(%i,%i) Start New Track",
+                    " Add - %i/%i xy(%i,%i) %3.2f %s"
+                    " D=%i/%i C=%i %ix%i=%i sqpx %s",
+                    track.steps,
                     MO_TRACK_EVENT_COUNT,
                     track_x,
                     track_y,
+                    ave_speed,
+                    speed_units,
+                    track.step_px,
+                    MO_MAX_X_DIFF_PX,
+                    mo_detector.raw_count,
+                    track_w,
+                    track_h,
+                    track_w * track_h,
+                    track.direction,
                 )
-                event_timer = time.time()  # Reset event timeout
-                track_count = 0
-                speed_list = []
-                if IM_FIRST_AND_LAST_ON:
-                    mo_im_first = image2
-                continue
+                if MO_STRIDE_MAX > 1:
+                    if stride_settle:
+                        stride_settle -= 1
+                    elif set_frame_stride(stride_for_step(track.step_px, track.step_sec),
+                                          "for %i px Step" % track.step_px):
+                        stride_settle = STRIDE_SETTLE_STEPS
             else:
-                # Check if last motion event timed out
-                reset_time_diff = time.time() - event_timer
-                if reset_time_diff >= MO_EVENT_TIMEOUT_SEC:
-                    # event_timer exceeded so reset for new track
-                    event_timer = time.time()
-                    first_event = True
+                if MO_LOG_OUT_RANGE_ON:  # Log event if True
                     logging.info(
-                        "Reset- event_timer %.2f>%.2f sec Exceeded",
-                        reset_time_diff,
-                        MO_EVENT_TIMEOUT_SEC,
+                        " Out - %i/%i xy(%i,%i) Max D=%i>=%ipx"
+                        " C=%i %ix%i=%i sqpx %s",
+                        track.steps,
+                        MO_TRACK_EVENT_COUNT,
+                        track_x,
+                        track_y,
+                        track.step_px,
+                        MO_MAX_X_DIFF_PX,
+                        mo_detector.raw_count,
+                        track_w,
+                        track_h,
+                        track_w * track_h,
+                        track.direction,
                     )
-                    print(HORIZ_LINE)
-                    continue
-                prev_pos_x = end_pos_x
-                end_pos_x = track_x
-
-                # set calibration for direction of travel
-                if end_pos_x - start_pos_x > 0:
-                    travel_direction = "L2R"
-                    cal_obj_px = CAL_OBJ_PX_L2R
-                    cal_obj_mm = CAL_OBJ_MM_L2R
-                else:
-                    travel_direction = "R2L"
-                    cal_obj_px = CAL_OBJ_PX_R2L
-                    cal_obj_mm = CAL_OBJ_MM_R2L
-
-                # check if movement is within acceptable distance
-                # range of last event
-                if (abs(end_pos_x - prev_pos_x) >= MO_MIN_X_DIFF_PX and
-                    abs(end_pos_x - prev_pos_x) <= MO_MAX_X_DIFF_PX):
-                    cur_track_dist = abs(end_pos_x - prev_pos_x)
-                    try:
-                        if travel_direction == "L2R":
-                            cur_ave_speed = float(
-                                abs(cur_track_dist / float(abs(cur_track_time - prev_start_time)))
-                                * speed_conv_L2R)
-                        else:
-                            cur_ave_speed = float(
-                                abs(cur_track_dist / float( abs(cur_track_time - prev_start_time)))
-                                * speed_conv_R2L)
-                    except ZeroDivisionError:  # This sometimes happens on windows due to clock precision issue
-                        logging.warning(
-                            "Division by Zero Error. Aborting this track event."
-                        )
-                        event_timer = time.time() # reset event timer
-                        continue
-                    track_count += 1  # increment track counter
-                    speed_list.append(cur_ave_speed)
-                    ave_speed = np.median(speed_list)  # Cslculate the median ave speed
-                    prev_start_time = cur_track_time
-                    event_timer = time.time()
-
-                    # check if trscking is complete
-                    if track_count >= MO_TRACK_EVENT_COUNT:
-                        tot_track_dist = abs(track_x - start_pos_x)
-                        tot_track_time = abs(track_start_time - cur_track_time)
-                        if IM_FIRST_AND_LAST_ON or IM_SAVE_4AI_ON:
-                            mo_im_last = image2
-                        if ave_speed > MO_MAX_SPEED_OVER or CALIBRATE_ON:
-                            logging.info(
-                                " Add - %i/%i xy(%i,%i) %3.2f %s"
-                                " D=%i/%i C=%i %ix%i=%i sqpx %s",
-                                track_count,
-                                MO_TRACK_EVENT_COUNT,
-                                track_x,
-                                track_y,
-                                ave_speed,
-                                speed_units,
-                                abs(track_x - prev_pos_x),
-                                MO_MAX_X_DIFF_PX,
-                                total_contours,
-                                track_w,
-                                track_h,
-                                biggest_area,
-                                travel_direction,
-                            )
-                            # Resize and process previous image
-                            # before saving to disk
-                            # Create a calibration image file name
-                            # There are no subdirectories to deal with
-                            if CALIBRATE_ON:
-                                log_time = datetime.datetime.now()
-                                filename = get_image_name(speed_path, "calib-")
-                                image2 = take_calibration_image(ave_speed, filename, image2_copy)
-                            else:
-                                # Check if subdirectories configured
-                                # and create new subdirectory if required
-                                speed_path = subdir_checks(
-                                    IM_SUBDIR_MAX_HOURS,
-                                    IM_SUBDIR_MAX_FILES,
-                                    IM_DIR_PATH,
-                                    IM_PREFIX,
-                                )
-
-                                # Record log_time for use later in csv and sqlite
-                                log_time = datetime.datetime.now()
-                                # Create image file name
-                                if IM_SHOW_SPEED_FILENAME_ON:
-                                    # add ave_speed value to filename after prefix
-                                    speed_prefix = (
-                                        IM_PREFIX
-                                        + str(int(round(ave_speed)))
-                                        + "-"
-                                    )
-                                    filename = get_image_name(
-                                        speed_path, speed_prefix
-                                    )
-                                else:
-                                    # create image file name path
-                                    filename = get_image_name(
-                                        speed_path, IM_PREFIX
-                                    )
-
-                            # Add motion rectangle to image if required
-                            if IM_SHOW_CROP_AREA_ON:
-                                image2 = speed_image_add_lines(image2, cvRed)
-                                # show centre of motion if required
-                                if CV_SHOW_CIRCLE_ON:
-                                    cv2.circle(
-                                        image2,
-                                        (track_x + MO_CROP_X_LEFT, track_y + MO_CROP_Y_UPPER),
-                                        CV_CIRCLE_SIZE_PX,
-                                        cvGreen,
-                                        CV_LINE_WIDTH_PX,
-                                    )
-                                else:
-                                    cv2.rectangle(
-                                        image2,
-                                        (
-                                        int(track_x + MO_CROP_X_LEFT),
-                                        int(track_y + MO_CROP_Y_UPPER),
-                                        ),
-                                        (
-                                        int(track_x + MO_CROP_X_LEFT + track_w),
-                                        int(track_y + MO_CROP_Y_UPPER + track_h),
-                                        ),
-                                        cvGreen,
-                                        CV_LINE_WIDTH_PX,
-                                        )
-                            big_image = cv2.resize(image2, (image_width, image_height ))
-                            if IM_SHOW_SIGN_ON:
-                                image_sign_view_time = time.time()
-                                image_sign_bg = np.zeros(
-                                    (IM_SIGN_RESIZE[0], IM_SIGN_RESIZE[1], 4)
-                                )
-                                image_sign_view = cv2.resize(
-                                    image_sign_bg, (IM_SIGN_RESIZE)
-                                )
-                                image_sign_text = str(int(round(ave_speed, 0)))
-                                cv2.putText(
-                                    image_sign_view,
-                                    image_sign_text,
-                                    IM_SIGN_TEXT_XY,
-                                    font,
-                                    IM_SIGN_FONT_SCALE,
-                                    IM_SIGN_FONT_COLOR,
-                                    IM_SIGN_FONT_THICK_PX,
-                                )
-
-                            # Write text on image before saving
-                            # if required.
-                            if IM_SHOW_TEXT_ON:
-                                image_text = "SPEED %.1f %s - %s" % (
-                                    ave_speed,
-                                    speed_units,
-                                    filename,
-                                )
-                                text_x = int(
-                                    (image_width / 2)
-                                    - (len(image_text) * IM_FONT_SIZE_PX / 3)
-                                )
-                                if text_x < 2:
-                                    text_x = 2
-                                cv2.putText(
-                                    big_image,
-                                    image_text,
-                                    (text_x, text_y),
-                                    font,
-                                    IM_FONT_SCALE,
-                                    IM_FONT_COLOR,
-                                    IM_FONT_THICKNESS,
-                                )
-
-                            # Save resized image. If jpg format, user can customize image quality 1-100 (higher is better)
-                            # and/or enble/disable optimization per config.py settings.
-                            # otherwise if png, bmp, gif, etc normal image write will occur
-                            logging.info(" Saved %ix%i %s", image_width, image_height, filename)
-                            if ((IM_FORMAT_EXT.lower() == ".jpg" or IM_FORMAT_EXT.lower() == ".jpeg")
-                                 and IM_JPG_OPTIMIZE_ON):
-                                try:
-                                    cv2.imwrite(filename, big_image,
-                                                [ int(cv2.IMWRITE_JPEG_QUALITY), IM_JPG_QUALITY,
-                                                  int(cv2.IMWRITE_JPEG_OPTIMIZE), 1
-                                                ]
-                                               )
-                                except:  # sometimes issue with IP camera so default to non optimized imwrite
-                                    logging.warning('Problem writing optimized. Saving Normal %s', filename)
-                                    cv2.imwrite(filename, big_image)
-                            else:
-                                cv2.imwrite(filename, big_image)
-
-                            # Save a positive AI motion image for later processing
-                            # make sure there is enough light for a clear image.
-                            if IM_SAVE_4AI_ON:
-                                if is_daytime(mo_im_last, IM_SAVE_4AI_DAY_THRESH):
-                                    AI_pos_filename = get_image_name(IM_SAVE_4AI_POS_DIR, IM_PREFIX)
-                                    logging.info(" Saved %s", AI_pos_filename)
-                                    cv2.imwrite(AI_pos_filename, mo_im_last)
-                                    ai_data = ("%s, %i, %i, %i, %i" %
-                                               (QUOTE + AI_pos_filename + QUOTE,
-                                               MO_CROP_X_LEFT + track_x,
-                                               MO_CROP_Y_UPPER + track_y,
-                                               track_w, track_h))
-                                    log_to_csv(AI_CSV_filepath, ai_data)
-                                else:
-                                    logging.info(' Low Light - AI pos Image Not Saved IM_SAVE_4AI_DAY_THRESH = %i'
-                                                 % IM_SAVE_4AI_DAY_THRESH)
-
-                            if IM_FIRST_AND_LAST_ON:
-                                # Save first and last image for later AI processing
-                                fn_split = os.path.splitext(filename)
-                                filename_first = fn_split[0] + "_1" + fn_split[1]
-                                filename_last = fn_split[0] + "_2" + fn_split[1]
-                                logging.info("Saving first %s", filename_first)
-                                cv2.imwrite(filename_first, mo_im_first)
-                                logging.info("Saving last %s", filename_last)
-                                cv2.imwrite(filename_last, mo_im_last)
-
-                            if USER_MOTION_CODE_ON:
-                                # ===========================================
-                                # Put your user code in userMotionCode() function
-                                # In the File user_motion_code.py
-                                # ===========================================
-                                try:
-                                    user_motion_code.userMotionCode(
-                                        vs, image_width, image_height, filename
-                                    )
-                                except ValueError:
-                                    logging.error(
-                                        "Problem running userMotionCode function from File %s",
-                                        userMotionFilePath,
-                                    )
-                                except TypeError as err:
-                                    logging.error(
-                                        "Problem with file user_motion_code.py Possibly out of date"
-                                    )
-                                    logging.error("Err Msg: %s", err)
-                                    logging.error(
-                                        "Suggest you delete/rename file and perform menubox UPGRADE"
-                                    )
-
-                            log_idx = "%04d%02d%02d-%02d%02d%02d%d" % (
-                                log_time.year,
-                                log_time.month,
-                                log_time.day,
-                                log_time.hour,
-                                log_time.minute,
-                                log_time.second,
-                                log_time.microsecond / 100000,
-                            )
-                            log_timestamp = "%s%04d-%02d-%02d %02d:%02d:%02d%s" % (
-                                QUOTE,
-                                log_time.year,
-                                log_time.month,
-                                log_time.day,
-                                log_time.hour,
-                                log_time.minute,
-                                log_time.second,
-                                QUOTE,
-                            )
-                            m_area = track_w * track_h
-
-                            if PLUGIN_ENABLE_ON:
-                                plugin_name = PLUGIN_NAME
-                            else:
-                                plugin_name = "None"
-
-                            # create the speed data list ready for db insert
-                            speed_data = (
-                                log_idx,
-                                log_timestamp,
-                                CAMERA.upper(),
-                                round(ave_speed, 2),
-                                speed_units,
-                                filename,
-                                image_width,
-                                image_height,
-                                IM_BIGGER,
-                                travel_direction,
-                                plugin_name,
-                                track_x,
-                                track_y,
-                                track_w,
-                                track_h,
-                                m_area,
-                                MO_CROP_X_LEFT,
-                                MO_CROP_X_RIGHT,
-                                MO_CROP_Y_UPPER,
-                                MO_CROP_Y_LOWER,
-                                MO_MAX_SPEED_OVER,
-                                MO_MIN_AREA_PX,
-                                MO_TRACK_EVENT_COUNT,
-                                cal_obj_px,
-                                cal_obj_mm,
-                                "",
-                                CAM_LOCATION,
-                            )
-
-                            # Insert speed_data into sqlite3 database table
-                            # Note cam_location and status may not be in proper order
-                            # Unless speed table is recreated.
-                            try:
-                                sql_cmd = """insert into {} values {}""".format(
-                                    DB_TABLE, speed_data
-                                )
-                                db_conn = db_check(DB_PATH)
-                                db_conn.execute(sql_cmd)
-                                db_conn.commit()
-                                db_conn.close()
-                            except sqlite3.Error as e:
-                                logging.error("sqlite3 DB %s", DB_PATH)
-                                logging.error(
-                                    "Failed: To INSERT Speed Data into TABLE %s",
-                                    DB_TABLE,
-                                )
-                                logging.error("Err Msg: %s", e)
-                            else:
-                                logging.info(
-                                    " SQL - Inserted Data Row into %s", DB_PATH
-                                )
-
-                            # Format and Save Data to CSV Log File
-                            if LOG_DATA_TO_CSV:
-                                log_csv_time = (
-                                    "%s%04d-%02d-%02d %02d:%02d:%02d%s"
-                                    % (
-                                        QUOTE,
-                                        log_time.year,
-                                        log_time.month,
-                                        log_time.day,
-                                        log_time.hour,
-                                        log_time.minute,
-                                        log_time.second,
-                                        QUOTE,
-                                    )
-                                )
-                                log_csv_text = (
-                                    "%s,%.2f,%s%s%s,%s%s%s,"
-                                    "%i,%i,%i,%i,%i,%s%s%s,%s,%s,%s"
-                                    % (
-                                        log_csv_time,
-                                        ave_speed,
-                                        QUOTE,
-                                        speed_units,
-                                        QUOTE,
-                                        QUOTE,
-                                        filename,
-                                        QUOTE,
-                                        track_x,
-                                        track_y,
-                                        track_w,
-                                        track_h,
-                                        track_w * track_h,
-                                        QUOTE,
-                                        travel_direction,
-                                        QUOTE,
-                                        QUOTE,
-                                        CAM_LOCATION,
-                                        QUOTE,
-                                    )
-                                )
-                                log_to_csv(speed_CSV_filepath, log_csv_text)
-
-                            if SPACE_TIMER_HRS > 0:
-                                lastSpaceCheck = free_disk_space_check(lastSpaceCheck)
-
-                            # Manage a maximum number of files
-                            # and delete oldest if required.
-                            if IM_MAX_FILES > 0:
-                                delete_old_files(
-                                    IM_MAX_FILES, speed_path, IM_PREFIX
-                                )
-
-                            # Save most recent files
-                            # to a recent folder if required
-                            if IM_RECENT_MAX_FILES > 0 and not CALIBRATE_ON:
-                                save_recent(
-                                    IM_RECENT_MAX_FILES,
-                                    IM_RECENT_DIR_PATH,
-                                    filename,
-                                    IM_PREFIX,
-                                )
-                            logging.info(
-                                "End  - %s Ave Speed %.1f %s Tracked %i px in %.3f sec Calib %ipx %imm",
-                                travel_direction,
-                                ave_speed,
-                                speed_units,
-                                tot_track_dist,
-                                tot_track_time,
-                                cal_obj_px,
-                                cal_obj_mm,
-                            )
-                        else:
-                            logging.info(
-                                "End  - Skip Photo SPEED %.1f %s"
-                                " MO_MAX_SPEED_OVER=%i  %i px in %.3f sec"
-                                " C=%i A=%i sqpx",
-                                ave_speed,
-                                speed_units,
-                                MO_MAX_SPEED_OVER,
-                                tot_track_dist,
-                                tot_track_time,
-                                total_contours,
-                                biggest_area,
-                            )
-                        # Optional Wait to avoid multiple recording of same object
-                        print(HORIZ_LINE)
-                        if MO_TRACK_TIMEOUT_SEC > 0:
-                            logging.info(
-                                "MO_TRACK_TIMEOUT_SEC %0.2f sec Delay to Avoid Tracking Same Object Multiple Times."
-                                % MO_TRACK_TIMEOUT_SEC
-                            )
-                            first_event = True  # Reset Track
-                            # Set track timeout time
-                            mo_track_timeout = (datetime.datetime.now() +
-                                                datetime.timedelta(seconds=MO_TRACK_TIMEOUT_SEC))
-                            continue  # go back to start of speed loop to idle camera
-                        first_event = True
-                    else:
-                        logging.info(
-                            " Add - %i/%i xy(%i,%i) %3.2f %s"
-                            " D=%i/%i C=%i %ix%i=%i sqpx %s",
-                            track_count,
-                            MO_TRACK_EVENT_COUNT,
-                            track_x,
-                            track_y,
-                            ave_speed,
-                            speed_units,
-                            abs(track_x - prev_pos_x),
-                            MO_MAX_X_DIFF_PX,
-                            total_contours,
-                            track_w,
-                            track_h,
-                            biggest_area,
-                            travel_direction,
-                        )
-                        end_pos_x = track_x
-                        # valid motion found so update event_timer
-                        event_timer = time.time()
-                # Movement was not within range parameters
-                else:
-                    # Check if Max px distance from prev position is greater
-                    # than the MO_MAX_X_DIFF_PX setting
-                    if abs(track_x - prev_pos_x) >= MO_MAX_X_DIFF_PX:
-                        if MO_LOG_OUT_RANGE_ON:  # Log event if True
-                            logging.info(
-                                " Out - %i/%i xy(%i,%i) Max D=%i>=%ipx"
-                                " C=%i %ix%i=%i sqpx %s",
-                                track_count,
-                                MO_TRACK_EVENT_COUNT,
-                                track_x,
-                                track_y,
-                                abs(track_x - prev_pos_x),
-                                MO_MAX_X_DIFF_PX,
-                                total_contours,
-                                track_w,
-                                track_h,
-                                biggest_area,
-                                travel_direction,
-                            )
-                        # if track_count is LT or EQ to half MO_TRACK_EVENT_COUNT
-                        if track_count <= MO_TRACK_EVENT_COUNT / 2:
-                            event_timer = time.time()  # Reset Event Timer
-                        else:
-                            first_event = True  # start new track
-                        continue  # go back to start of loop
-
-            if GUI_WINDOW_ON:
-                # show small circle at contour xy if required
-                # otherwise a rectangle around most recent contour
+                if MO_STRIDE_MAX > 1:
+                    # next step time also spans this one so let it settle
+                    set_frame_stride(1, "Out of Range")
+                    stride_settle = STRIDE_SETTLE_STEPS
+        elif mo_tracker.event == "slow" and MO_STRIDE_MAX > 1:
+            # moved less than MO_MIN_X_DIFF_PX so skip more frames
+            if set_frame_stride(min(MO_STRIDE_MAX, vs.stride * 2), "for Slow Object"):
+                stride_settle = STRIDE_SETTLE_STEPS
+
+        for track in finished:
+            # tracking is complete
+            (track_x, track_y, track_w, track_h) = track.box
+            travel_direction = track.direction
+            if travel_direction == "L2R":
+                ave_speed = track.px_speed() * speed_conv_L2R
+                cal_obj_px = CAL_OBJ_PX_L2R
+                cal_obj_mm = CAL_OBJ_MM_L2R
+            else:
+                ave_speed = track.px_speed() * speed_conv_R2L
+                cal_obj_px = CAL_OBJ_PX_R2L
+                cal_obj_mm = CAL_OBJ_MM_R2L
+            tot_track_dist = abs(track_x - track.start_x)
+            tot_track_time = cur_track_time - track.start_time
+            if hasattr(vs, "check_speed"):
+                # simcam knows the true speed of the vehicle in the lane at frame y
+                vs.check_speed(cur_track_time, travel_direction, ave_speed,
+                               MO_CROP_Y_UPPER + track_y + track_h // 2)
+            if ave_speed > MO_MAX_SPEED_OVER or CALIBRATE_ON:
+                if MO_MULTI_TRACK_ON:
+                    logging.info(
+                        " Add - Track %i %i/%i xy(%i,%i) %3.2f %s C=%i T=%i %ix%i=%i sqpx %s",
+                        track.id,
+                        track.steps,
+                        MO_TRACK_EVENT_COUNT,
+                        track_x,
+                        track_y,
+                        ave_speed,
+                        speed_units,
+                        mo_detector.raw_count,
+                        len(mo_tracker.tracks),
+                        track_w,
+                        track_h,
+                        track_w * track_h,
+                        travel_direction,
+                    )
+                save_image = None
+                if hasattr(vs, "read_color"):
+                    # ffmpegcam frames are grey. Save the newest colour frame
+                    save_image = vs.read_color()
+                if save_image is None:
+                    # copy so other tracks saved from this frame do not get this box
+                    save_image = image2.copy()
+                save_speed_event(
+                    save_image,
+                    track.box,
+                    ave_speed,
+                    travel_direction,
+                    cur_track_time,
+                    track.first_image,
+                    image2 if IM_FIRST_AND_LAST_ON or IM_SAVE_4AI_ON else None,
+                )
+                if IM_SHOW_SIGN_ON:
+                    image_sign_view_time = time.time()
+                    image_sign_view = speed_sign_image(ave_speed)
+                if SPACE_TIMER_HRS > 0:
+                    lastSpaceCheck = free_disk_space_check(lastSpaceCheck)
+                logging.info(
+                    "End  - Track %i %s Ave Speed %.1f %s Tracked %i px in %.3f sec Calib %ipx %imm",
+                    track.id,
+                    travel_direction,
+                    ave_speed,
+                    speed_units,
+                    tot_track_dist,
+                    tot_track_time,
+                    cal_obj_px,
+                    cal_obj_mm,
+                )
+            else:
+                logging.info(
+                    "End  - Track %i Skip Photo SPEED %.1f %s"
+                    " MO_MAX_SPEED_OVER=%i  %i px in %.3f sec"
+                    " C=%i A=%i sqpx",
+                    track.id,
+                    ave_speed,
+                    speed_units,
+                    MO_MAX_SPEED_OVER,
+                    tot_track_dist,
+                    tot_track_time,
+                    mo_detector.raw_count,
+                    track_w * track_h,
+                )
+            print(HORIZ_LINE)
+            if not MO_MULTI_TRACK_ON and MO_TRACK_TIMEOUT_SEC > 0:
+                # Optional Wait to avoid multiple recording of same object
+                logging.info(
+                    "MO_TRACK_TIMEOUT_SEC %0.2f sec Delay to Avoid Tracking Same Object Multiple Times."
+                    % MO_TRACK_TIMEOUT_SEC
+                )
+
+        if GUI_WINDOW_ON:
+            # show small circle at track xy if required
+            # otherwise a rectangle around each tracked object
+            for track in mo_tracker.tracks:
+                (track_x, track_y, track_w, track_h) = track.box
                 if CV_SHOW_CIRCLE_ON:
                     cv2.circle(
-                        image2,
+                        image2_copy,
                         (
                             int(track_x + MO_CROP_X_LEFT * CV_WINDOW_BIGGER),
                             int(track_y + MO_CROP_Y_UPPER * CV_WINDOW_BIGGER),
@@ -1911,7 +2155,7 @@ def speed_camera():
                     )
                 else:
                     cv2.rectangle(
-                        image2,
+                        image2_copy,
                         (int(MO_CROP_X_LEFT + track_x), int(MO_CROP_Y_UPPER + track_y)),
                         (
                             int(MO_CROP_X_LEFT + track_x + track_w),
@@ -1922,8 +2166,8 @@ def speed_camera():
                     )
 
         if ALIGN_CAM_ON:
-            image2 = speed_image_add_lines(image2_copy, cvRed)
-            image_align = cv2.resize(image2, (image_width, image_height))
+            image2_copy = speed_image_add_lines(image2_copy, cvRed)
+            image_align = cv2.resize(image2_copy, (image_width, image_height))
             cv2.imwrite(align_filename, image_align)
             logging.info(
                 "ALIGN_CAM_ON=%s ALIGN_DELAY_SEC=%i - Browser View Cam Align Image at %s",
@@ -1935,20 +2179,20 @@ def speed_camera():
 
         if GUI_WINDOW_ON:
             if GUI_IMAGE_WIN_ON:
-                image2 = speed_image_add_lines(image2_copy, cvRed)
-                big_image = cv2.resize(image2, (image_width, image_height))
+                image2_copy = speed_image_add_lines(image2_copy, cvRed)
+                big_image = cv2.resize(image2_copy, (image_width, image_height))
                 cv2.imshow("Movement (q Quits)", big_image)
 
             if GUI_THRESH_WIN_ON:
                 # resize and display motion threshold image
-                diff_size = (int(differenceimage.shape[1] * IM_BIGGER),
-                             int(differenceimage.shape[0] * IM_BIGGER))
-                big_diff_image = cv2.resize(differenceimage, diff_size)
+                diff_size = (int(mo_detector.shape[1] * IM_BIGGER),
+                             int(mo_detector.shape[0] * IM_BIGGER))
+                big_diff_image = cv2.resize(mo_detector.difference, diff_size)
                 cv2.imshow("Threshold", big_diff_image)
 
             if GUI_CROP_WIN_ON:
                 # resize and display cropped image
-                crop_image = image2[MO_CROP_Y_UPPER + CV_LINE_WIDTH_PX:MO_CROP_Y_LOWER, MO_CROP_X_LEFT + CV_LINE_WIDTH_PX:MO_CROP_X_RIGHT]
+                crop_image = image2_copy[MO_CROP_Y_UPPER + CV_LINE_WIDTH_PX:MO_CROP_Y_LOWER, MO_CROP_X_LEFT + CV_LINE_WIDTH_PX:MO_CROP_X_RIGHT]
                 crop_size = (int(crop_image.shape[1] * IM_BIGGER),
                              int(crop_image.shape[0] * IM_BIGGER))
                 big_crop_image = cv2.resize(crop_image, crop_size)
@@ -1974,11 +2218,12 @@ def speed_camera():
         if cv2.waitKey(1) & 0xFF == ord("q"):
             cv2.destroyAllWindows()
             logging.info("End Motion Tracking ......")
-            vs.stop()
+            vs.stop(CAM_STOP_TIMEOUT_SEC)
             still_scanning = False
 
         # Optionally show fps motion image processing every 1000 loops
-        if LOG_FPS_ON:
+        # Always for speed-multicam.py workers so it can report per camera stats
+        if LOG_FPS_ON or MULTICAM_QUEUE is not None:
             fps_time, frame_count = get_fps(fps_time, frame_count)
 
 
@@ -1988,8 +2233,8 @@ if __name__ == "__main__":
     vs = strmcam()  # start video stream thread
     image1 = vs.read()
     try:
-        grayimage1 = cv2.cvtColor(image1, cv2.COLOR_BGR2GRAY)
-    except cv2.error as err_msg:
+        grayimage1 = gray_image(image1)
+    except (cv2.error, AttributeError) as err_msg:
         logging.error('%s Problem Connecting Camera. Review Log Messages and Correct', CAMERA.upper())
         logging.error(err_msg)
         logging.error('Check camera connection settings and Hardware')
@@ -1997,28 +2242,65 @@ if __name__ == "__main__":
 
     # Get actual image size (shape) from video stream.
     # Necessary for IP camera
-    img_height, img_width, _ = image1.shape
+    img_height, img_width = image1.shape[:2]
     image_width = int(img_width * IM_BIGGER)
     # Set height of trigger point image to save
     image_height = int(img_height * IM_BIGGER)
     # Auto Calculate motion crop area settings
 
     if MO_CROP_AUTO_ON:
-        X_SCALE = 3.5
-        Y_SCALE = 3.0
-        # reduce motion area for larger stream sizes
-        if img_width > 1000:
-            X_SCALE = 2.8
-            Y_SCALE = 2.5
         # If motion box crop settings not found in config.py then
         # Auto adjust the crop image to suit the real image size.
         # For details See comments in config.py Motion Events settings section
-        MO_CROP_X_LEFT = int(img_width / X_SCALE)
-        MO_CROP_X_RIGHT = int(img_width - MO_CROP_X_LEFT)
-        MO_CROP_Y_UPPER = int(img_height / Y_SCALE)
-        MO_CROP_Y_LOWER = int(img_height - MO_CROP_Y_UPPER)
+        (MO_CROP_X_LEFT, MO_CROP_X_RIGHT,
+         MO_CROP_Y_UPPER, MO_CROP_Y_LOWER) = auto_crop_area(img_width, img_height)
+    if hasattr(vs, "set_roi"):
+        # netcam and ffmpegcam only need to send the motion crop area.
+        # simcam runs its vehicles through it
+        vs.set_roi(MO_CROP_X_LEFT, MO_CROP_X_RIGHT, MO_CROP_Y_UPPER, MO_CROP_Y_LOWER)
     # setup buffer area to ensure contour is mostly contained in crop area
     x_buf = int((MO_CROP_X_RIGHT - MO_CROP_X_LEFT) / MO_X_LR_SIDE_BUFF_PX)
+    # Motion detection buffers are sized once for the crop area
+    mo_learn_rates = {"average": MO_AVG_LEARN_RATE,
+                      "mog2": MO_MOG2_LEARN_RATE,
+                      "knn": MO_KNN_LEARN_RATE}
+    try:
+        mo_pipe = create_motion_pipeline(MO_ENGINE,
+                                         MO_CROP_X_RIGHT - MO_CROP_X_LEFT,
+                                         MO_CROP_Y_LOWER - MO_CROP_Y_UPPER,
+                                         BLUR_SIZE, THRESHOLD_SENSITIVITY,
+                                         learn_rate=mo_learn_rates.get(MO_ENGINE.lower()),
+                                         history=MO_BG_HISTORY,
+                                         scale=MO_DETECT_SCALE,
+                                         pyr_down=MO_DETECT_PYRDOWN_ON,
+                                         refine=MO_DETECT_REFINE_ON,
+                                         auto_threshold=MO_AUTO_THRESHOLD_ON,
+                                         threshold_min=MO_THRESHOLD_MIN,
+                                         threshold_max=MO_THRESHOLD_MAX,
+                                         noise_factor=MO_NOISE_FACTOR)
+    except ValueError as err_msg:
+        logging.error(err_msg)
+        vs.stop(CAM_STOP_TIMEOUT_SEC)
+        sys.exit(1)
+    logging.info("Motion Engine %s  Detect Size %ix%i", mo_pipe.engine,
+                 mo_pipe.detect_shape[1], mo_pipe.detect_shape[0])
+    # speed_camera() only uses the MotionDetector and Tracker interfaces
+    if MO_MULTI_TRACK_ON:
+        mo_detector = ContourDetector(mo_pipe, MO_MIN_AREA_PX, x_buf, MO_MULTI_MAX_TRACKS,
+                                      MO_BLOB_STATS_ON, MO_BLOB_MAX_ASPECT)
+        mo_tracker = MultiTracker(MO_MIN_X_DIFF_PX, MO_MAX_X_DIFF_PX,
+                                  MO_TRACK_EVENT_COUNT, MO_EVENT_TIMEOUT_SEC,
+                                  MO_MULTI_MAX_TRACKS)
+        logging.info("Multi Track On. Up to %i Objects", MO_MULTI_MAX_TRACKS)
+    else:
+        # biggest motion box only
+        mo_detector = ContourDetector(mo_pipe, MO_MIN_AREA_PX, x_buf, 1,
+                                      MO_BLOB_STATS_ON, MO_BLOB_MAX_ASPECT)
+        mo_tracker = SingleTracker(MO_MIN_X_DIFF_PX, MO_MAX_X_DIFF_PX,
+                                   MO_TRACK_EVENT_COUNT, MO_EVENT_TIMEOUT_SEC,
+                                   MO_TRACK_TIMEOUT_SEC)
+    # speed event idx and image names from frame capture times
+    event_clock = EventClock(getattr(vs, "realtime", True))
     make_media_dirs()
 
     try:
@@ -2027,7 +2309,7 @@ if __name__ == "__main__":
         print("")
         logging.info("User Pressed Keyboard ctrl-c")
         # Remove temporary plugin configuration file if it exists.  plugins/current.py
-        if PLUGIN_ENABLE_ON:
+        if PLUGIN_ENABLE_ON and not MULTICAM_PLUGIN:
             logging.info("Remove Temporary plugin config Files")
             try:
                 if os.path.exists(pluginCurrent):
@@ -2040,7 +2322,7 @@ if __name__ == "__main__":
             except OSError as err_msg:
                 logging.warning("Failed To Remove File %s - %s", pluginCurrentpyc, err_msg)
         logging.info("%s Stop Camera Stream Thread.", CAMERA.upper())
-        vs.stop()
+        vs.stop(CAM_STOP_TIMEOUT_SEC)
         logging.info("%s %s Exiting Program", PROG_NAME, PROG_VER)
         logging.info("Bye ...")
         sys.exit()
@@ -32,13 +32,13 @@ echo "Note: config.py will not be overwritten. Updated settings are in config.py
 speedFiles=("menubox.sh" "speed-cam.py" "sql_speed_gt.py" \
 "speed-cam.sh" "search-speed.py" "search_config.py" "makehtml.py" "speed-web.py" \
 "speed-web.sh" "alpr-speed.py" "sql-make-graph-count-totals.py" "sql-make-graph-speed-ave.py" \
-"strmcam.py" "strmusbipcam.py" "strmpilegcam.py" "strmpilibcam.py")
+"strmcam.py" "strmframe.py" "strmshm.py" "strmusbipcam.py" "strmpilegcam.py" "strmpilibcam.py" "strmvidfile.py" "strmdvr.py" "dvr-clip.py" "strmnetcam.py" "speed-multicam.py" "strmsimcam.py" "strmgstcam.py" "strmffmpegcam.py" "strmmjpegcam.py" "motion_detect.py" "motion_track.py" "speed_bench.py" "speed_calc.py")
 else
 speedFiles=("menubox.sh" "speed-cam.py" "sql_speed_gt.py" \
 "speed-cam.sh" "search-speed.py" "search_config.py" "makehtml.py" "speed-web.py" \
 "speed-web.sh" "rclone-security-sync-recent.sh" \
 "alpr-speed.py" "sql-make-graph-count-totals.py" "sql-make-graph-speed-ave.py" "user_motion_code.py" \
-"strmcam.py" "strmusbipcam.py" "strmpilegcam.py" "strmpilibcam.py")
+"strmcam.py" "strmframe.py" "strmshm.py" "strmusbipcam.py" "strmpilegcam.py" "strmpilibcam.py" "strmvidfile.py" "strmdvr.py" "dvr-clip.py" "strmnetcam.py" "speed-multicam.py" "strmsimcam.py" "strmgstcam.py" "strmffmpegcam.py" "strmmjpegcam.py" "motion_detect.py" "motion_track.py" "speed_bench.py" "speed_calc.py")
 fi
 
 for fname in "${speedFiles[@]}" ; do
@@ -63,6 +63,10 @@ if [ ! -f supervisor/speed-web.conf ]; then   # Do not overwrite existing file
 wget -O supervisor/speed-web.conf -q --show-progress https://raw.github.com/pageauc/speed-camera/master/source/supervisor/speed-web.conf
 fi
 
+if [ ! -f supervisor/speed-multicam.conf ]; then   # Do not overwrite existing file
+wget -O supervisor/speed-multicam.conf -q --show-progress https://raw.github.com/pageauc/speed-camera/master/source/supervisor/speed-multicam.conf
+fi
+
 wget -O supervisor/Readme.md -q --show-progress https://raw.github.com/pageauc/speed-camera/master/source/supervisor/Readme.md
 wget -O media/webserver.txt -q --show-progress https://raw.github.com/pageauc/speed-camera/master/source/webserver.txt
 
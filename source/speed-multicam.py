@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+'''
+Run several speed-cam.py camera pipelines in one service.
+
+Each camera profile is a plugins/*.py file listed in config.py
+MULTICAM_PLUGINS. Every profile runs the normal speed-cam.py code in its
+own worker process, optionally pinned to a cpu core per MULTICAM_CPUS.
+Workers import their plugin directly (plugins/current.py is not used) and
+send speed rows and stats to this process over a bounded queue. Worker
+image names and csv files include the plugin name so cameras sharing
+the media folders do not overwrite each other.
+
+This process is the single sqlite3 writer for all cameras, optionally
+starts one speed-web.py for all of them and logs per camera fps and
+queue stats every MULTICAM_STATS_SEC seconds. Worker log messages are
+tagged with the plugin name. A worker that crashes is restarted.
+
+Run instead of speed-cam.py eg
+    python3 speed-multicam.py
+'''
+from __future__ import print_function
+PROG_VER = "13.1"
+import os
+import sys
+import time
+import queue
+import runpy
+import logging
+import sqlite3
+import subprocess
+import multiprocessing as mp
+
+mypath = os.path.abspath(__file__)
+baseDir = os.path.dirname(mypath)
+os.chdir(baseDir)  # speed-cam.py media paths are relative
+sys.path.insert(0, baseDir)
+import config
+from config import DB_DIR, DB_NAME, DB_TABLE
+
+# Optional settings. Use defaults if not in an older config.py
+MULTICAM_PLUGINS = getattr(config, 'MULTICAM_PLUGINS', [])
+MULTICAM_CPUS = getattr(config, 'MULTICAM_CPUS', [])
+MULTICAM_QUEUE_SIZE = getattr(config, 'MULTICAM_QUEUE_SIZE', 1000)
+MULTICAM_STATS_SEC = getattr(config, 'MULTICAM_STATS_SEC', 60)
+MULTICAM_RESTART_SEC = getattr(config, 'MULTICAM_RESTART_SEC', 10)
+MULTICAM_WEB_ON = getattr(config, 'MULTICAM_WEB_ON', True)
+
+LOG_FORMAT = "%(asctime)s %(levelname)-8s %(funcName)-10s %(message)s"
+logging.basicConfig(level=logging.INFO, format=LOG_FORMAT,
+                    datefmt="%Y-%m-%d %H:%M:%S")
+
+SPEED_CAM_PATH = os.path.join(baseDir, "speed-cam.py")
+DB_PATH = os.path.join(baseDir, DB_DIR, DB_NAME)
+
+
+# ------------------------------------------------------------------------------
+def camera_worker(plugin_name, cpu, msg_queue):
+    '''
+    Worker process entry. Runs speed-cam.py for one plugin camera profile.
+    '''
+    if cpu is not None and hasattr(os, "sched_setaffinity"):
+        try:
+            os.sched_setaffinity(0, {cpu})
+        except OSError as err_msg:
+            print("WARN : %s Could Not Pin to cpu %i %s" % (plugin_name, cpu, err_msg))
+    # set up logging before speed-cam.py does so messages are tagged per camera
+    logging.basicConfig(level=logging.INFO,
+                        format="%(asctime)s " + plugin_name + " %(levelname)-8s %(funcName)-10s %(message)s",
+                        datefmt="%Y-%m-%d %H:%M:%S", force=True)
+    os.environ["SPEED_CAM_PLUGIN"] = plugin_name
+    try:
+        runpy.run_path(SPEED_CAM_PATH,
+                       init_globals={"MULTICAM_QUEUE": msg_queue},
+                       run_name="__main__")
+    except KeyboardInterrupt:
+        pass
+
+
+# ------------------------------------------------------------------------------
+class SpeedDbWriter:
+    '''
+    Single sqlite3 connection that inserts speed rows from all workers.
+    Workers create the table when they start so the connection is
+    opened on the first row.
+    '''
+
+    def __init__(self, db_path, db_table):
+        self.db_path = db_path
+        self.db_table = db_table
+        self.db_conn = None
+        self.pending = 0
+        self.rows = 0
+
+    def insert(self, speed_data, plugin_name):
+        if self.db_conn is None:
+            self.db_conn = sqlite3.connect(self.db_path, timeout=5)
+        sql_cmd = "insert into {} values ({})".format(
+            self.db_table, ",".join(["?"] * len(speed_data)))
+        try:
+            try:
+                self.db_conn.execute(sql_cmd, speed_data)
+            except sqlite3.IntegrityError:
+                # idx is the event time to 0.1 sec so two cameras can
+                # collide. Keep both rows by adding the camera to idx
+                speed_data = (speed_data[0] + "-" + plugin_name,) + tuple(speed_data[1:])
+                self.db_conn.execute(sql_cmd, speed_data)
+        except sqlite3.Error as err_msg:
+            logging.error("Failed: To INSERT Speed Data into TABLE %s %s",
+                          self.db_table, err_msg)
+            return
+        self.pending += 1
+
+    def commit(self):
+        # one commit for all rows received since the last one
+        if self.pending:
+            self.db_conn.commit()
+            self.rows += self.pending
+            self.pending = 0
+
+    def close(self):
+        if self.db_conn is not None:
+            self.commit()
+            self.db_conn.close()
+            self.db_conn = None
+
+
+# ------------------------------------------------------------------------------
+def start_worker(plugin_name, cpu, msg_queue):
+    worker = mp.Process(target=camera_worker, name=plugin_name,
+                        args=(plugin_name, cpu, msg_queue))
+    worker.daemon = False
+    worker.start()
+    if cpu is None:
+        logging.info("Started %s pid=%i", plugin_name, worker.pid)
+    else:
+        logging.info("Started %s pid=%i on cpu %i", plugin_name, worker.pid, cpu)
+    return worker
+
+
+def wait_db_ready(timeout=15.0):
+    '''
+    Wait for the first worker to create the sqlite3 DB and speed table
+    so other workers do not all try to create it at the same time.
+    '''
+    end_time = time.monotonic() + timeout
+    while time.monotonic() < end_time:
+        if os.path.isfile(DB_PATH) and os.path.getsize(DB_PATH) >= 100:
+            try:
+                db_conn = sqlite3.connect(DB_PATH, timeout=1)
+                found = db_conn.execute("select name from sqlite_master where type='table' and name=?",
+                                        (DB_TABLE,)).fetchone()
+                db_conn.close()
+            except sqlite3.Error:
+                found = None
+            if found:
+                return True
+        time.sleep(0.2)
+    logging.warning("DB %s Not Ready after %.0f sec", DB_PATH, timeout)
+    return False
+
+
+def worker_cpu(index):
+    '''Return the cpu core for worker index or None to leave unpinned'''
+    if index < len(MULTICAM_CPUS):
+        return MULTICAM_CPUS[index]
+    return None
+
+
+def log_stats(cam_stats, rows, msg_queue):
+    try:
+        depth = msg_queue.qsize()
+    except NotImplementedError:  # macOS
+        depth = -1
+    logging.info("DB rows=%i queue depth=%i of %i", rows, depth, MULTICAM_QUEUE_SIZE)
+    for plugin_name in MULTICAM_PLUGINS:
+        stats = cam_stats.get(plugin_name)
+        if stats is None:
+            logging.info("%-12s No stats yet", plugin_name)
+            continue
+        logging.info("%-12s fps=%.1f captured=%i read=%i missed=%i speeds=%i queue_dropped=%i"
+                     " threshold=%i noise=%.1f",
+                     plugin_name, stats.get('fps', 0.0), stats.get('captured', 0),
+                     stats.get('read', 0), stats.get('missed', 0),
+                     stats.get('speeds', 0), stats.get('queue_dropped', 0),
+                     stats.get('mo_threshold', 0), stats.get('mo_noise', 0.0))
+
+
+# ------------------------------------------------------------------------------
+def main():
+    if not MULTICAM_PLUGINS:
+        logging.error("No Cameras. Set config.py MULTICAM_PLUGINS eg [\"picam240\", \"webcam480\"]")
+        sys.exit(1)
+    for plugin_name in MULTICAM_PLUGINS:
+        if not os.path.isfile(os.path.join(baseDir, "plugins", plugin_name + ".py")):
+            logging.error("Plugin File Not Found plugins/%s.py", plugin_name)
+            sys.exit(1)
+    logging.info("%s ver %s Starting %i Cameras %s", os.path.basename(mypath),
+                 PROG_VER, len(MULTICAM_PLUGINS), " ".join(MULTICAM_PLUGINS))
+
+    msg_queue = mp.Queue(MULTICAM_QUEUE_SIZE)
+    workers = {}
+    for index, plugin_name in enumerate(MULTICAM_PLUGINS):
+        workers[plugin_name] = start_worker(plugin_name, worker_cpu(index), msg_queue)
+        if index == 0:
+            wait_db_ready()
+
+    web_proc = None
+    if MULTICAM_WEB_ON:
+        web_proc = subprocess.Popen([sys.executable, os.path.join(baseDir, "speed-web.py")])
+        logging.info("Started speed-web.py pid=%i", web_proc.pid)
+
+    db_writer = SpeedDbWriter(DB_PATH, DB_TABLE)
+    cam_stats = {}
+    speeds = {}
+    exited = {}  # plugin_name: time worker was found stopped
+    stats_time = time.monotonic()
+    try:
+        while workers:
+            try:
+                msg = msg_queue.get(timeout=1.0)
+            except queue.Empty:
+                msg = None
+            while msg is not None:
+                kind, plugin_name, data = msg
+                if kind == "speed":
+                    db_writer.insert(data, plugin_name)
+                    speeds[plugin_name] = speeds.get(plugin_name, 0) + 1
+                elif kind == "stats":
+                    cam_stats[plugin_name] = data
+                try:
+                    msg = msg_queue.get_nowait()
+                except queue.Empty:
+                    msg = None
+            db_writer.commit()
+            for plugin_name in speeds:
+                if plugin_name in cam_stats:
+                    cam_stats[plugin_name]['speeds'] = speeds[plugin_name]
+
+            now = time.monotonic()
+            for index, plugin_name in enumerate(MULTICAM_PLUGINS):
+                worker = workers.get(plugin_name)
+                if worker is None or worker.is_alive():
+                    continue
+                if worker.exitcode == 0:
+                    logging.info("%s Finished", plugin_name)
+                    del workers[plugin_name]
+                elif plugin_name not in exited:
+                    logging.warning("%s Stopped exitcode=%s. Restart in %i sec",
+                                    plugin_name, worker.exitcode, MULTICAM_RESTART_SEC)
+                    exited[plugin_name] = now
+                elif now - exited[plugin_name] > MULTICAM_RESTART_SEC:
+                    del exited[plugin_name]
+                    workers[plugin_name] = start_worker(plugin_name, worker_cpu(index), msg_queue)
+
+            if now - stats_time > MULTICAM_STATS_SEC:
+                log_stats(cam_stats, db_writer.rows, msg_queue)
+                stats_time = now
+    except KeyboardInterrupt:
+        print("")
+        logging.info("User Pressed Keyboard ctrl-c")
+    # workers get ctrl-c too. Wait for them to release their cameras
+    for plugin_name, worker in workers.items():
+        worker.join(10)
+        if worker.is_alive():
+            logging.warning("%s Did Not Stop. Terminating", plugin_name)
+            worker.terminate()
+    # save any rows sent while workers were stopping
+    while True:
+        try:
+            kind, plugin_name, data = msg_queue.get_nowait()
+        except (queue.Empty, OSError):
+            break
+        if kind == "speed":
+            db_writer.insert(data, plugin_name)
+    db_writer.close()
+    if web_proc is not None:
+        web_proc.terminate()
+    log_stats(cam_stats, db_writer.rows, msg_queue)
+    logging.info("Bye ...")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,381 @@
+# Benchmark motion detectors and trackers over recorded clips
+# Runs a motion_detect.py MotionDetector and a motion_track.py Tracker over
+# every frame of a video clip like speed-cam.py does, using the motion crop
+# area, calibration and MO_ settings in config.py. Reports per stage
+# timing (read and decode, detect, track), processing fps, motion areas
+# and boxes per frame and, if the clip has a ground truth csv, the speed
+# error of each vehicle. Detection is scored against the simcam vehicle
+# boxes in frames where the vehicle is completely inside the crop area less
+# the side buffers, like speed-cam.py needs. Hit% is frames where the best
+# box overlaps the vehicle box with IoU (intersection over union) of 0.5
+# or more.
+#
+# Frame times are the frame number / clip fps so results do not depend on
+# how fast this computer is and every run over a clip gives the same speeds.
+#
+# Record a simcam clip with its ground truth csv (clip name with .csv)
+#    python3 speed_bench.py -r media/bench/sim.avi
+#    python3 speed_bench.py -r media/bench/sim-2lane.avi -l 2 -g 0.3
+#    python3 speed_bench.py -r media/bench/sim-night.avi -z 24
+# Compare engines and trackers on one or more clips
+#    python3 speed_bench.py media/bench/sim.avi
+#    python3 speed_bench.py media/bench/sim-2lane.avi -e diff,average -k single,multi
+#    python3 speed_bench.py media/bench/sim.avi -b -d 2
+#    python3 speed_bench.py media/bench/sim.avi -w 500 -b      rain streaks added to each frame
+#    python3 speed_bench.py media/bench/sim-night.avi -t       auto threshold
+#    python3 speed_bench.py media/bench/sim.avi -a 100          other MO_MIN_AREA_PX
+# Clips without a ground truth csv, eg from strmdvr.py, report timing and
+# tracks only.
+
+import logging
+import os
+import cv2
+import numpy as np
+import config
+import speed_calc
+import strmsimcam
+from motion_detect import create_motion_pipeline, ContourDetector, MOTION_ENGINES
+from motion_track import SingleTracker, MultiTracker
+
+TRACKERS = ("single", "multi")
+RAIN_SEED = 2  # same rain streaks for every detector
+HIT_IOU = 0.5  # box overlap that counts as a detection hit
+
+
+def setting(name, default):
+    '''Return config.py setting name or default if it is not there'''
+    return getattr(config, name, default)
+
+
+def crop_area(width, height):
+    '''Return the speed-cam.py (x_left, x_right, y_upper, y_lower) motion crop area'''
+    if setting('MO_CROP_AUTO_ON', False):
+        return speed_calc.auto_crop_area(width, height)
+    return (config.MO_CROP_X_LEFT, config.MO_CROP_X_RIGHT,
+            config.MO_CROP_Y_UPPER, config.MO_CROP_Y_LOWER)
+
+
+def speed_conv(direction):
+    '''Return the speed-cam.py px/sec to kph or mph conversion for direction'''
+    if direction == "L2R":
+        return speed_calc.speed_conv(config.CAL_OBJ_PX_L2R, config.CAL_OBJ_MM_L2R,
+                                     config.MO_SPEED_MPH_ON)
+    return speed_calc.speed_conv(config.CAL_OBJ_PX_R2L, config.CAL_OBJ_MM_R2L,
+                                 config.MO_SPEED_MPH_ON)
+
+
+def truth_path(clip_path):
+    '''Return the ground truth csv path for clip_path'''
+    return os.path.splitext(clip_path)[0] + ".csv"
+
+
+def record_clip(clip_path, frames, lanes=1, gap_sec=None, noise=None):
+    '''
+    Write frames of simcam vehicles to clip_path plus the ground truth csv.
+    gap_sec and noise None use the config.py SIMCAM_ settings
+    '''
+    size = setting('IM_SIZE', (320, 240))
+    framerate = setting('IM_FRAMERATE', 30)
+    sim = strmsimcam.CamStream(size=size,
+                               framerate=framerate,
+                               speeds=setting('SIMCAM_SPEEDS', [30, 45, 60]),
+                               directions=setting('SIMCAM_DIRECTIONS', "both"),
+                               obj_size=setting('SIMCAM_OBJ_SIZE', (60, 30)),
+                               gap_sec=setting('SIMCAM_GAP_SEC', 2.0) if gap_sec is None else gap_sec,
+                               lanes=lanes,
+                               noise=setting('SIMCAM_NOISE', 4) if noise is None else noise,
+                               light_change=setting('SIMCAM_LIGHT_CHANGE', 0.2),
+                               crop=crop_area(size[0], size[1]),
+                               cal=(config.CAL_OBJ_PX_L2R, config.CAL_OBJ_MM_L2R,
+                                    config.CAL_OBJ_PX_R2L, config.CAL_OBJ_MM_R2L),
+                               mph=config.MO_SPEED_MPH_ON,
+                               truth_path=truth_path(clip_path))
+    clip_dir = os.path.dirname(clip_path)
+    if clip_dir and not os.path.isdir(clip_dir):
+        os.makedirs(clip_dir)
+    writer = cv2.VideoWriter(clip_path, cv2.VideoWriter_fourcc(*"MJPG"), framerate, tuple(size))
+    if not writer.isOpened():
+        raise IOError("Could Not Open Video Writer for %s" % clip_path)
+    image = np.empty((size[1], size[0], 3), np.uint8)
+    for index in range(frames):
+        sim_time = index / sim.framerate
+        sim.frame_index = index
+        sim.track_vehicle(sim_time)
+        sim.render(image, sim_time)
+        writer.write(image)
+    writer.release()
+    # vehicles still in the crop area leave at the end of the clip.
+    # Ones that have not reached it yet are not in the clip truth
+    for vehicle in sim.vehicles:
+        if vehicle is not None and vehicle['enter_time'] is not None:
+            sim.finish_vehicle(vehicle, frames / sim.framerate)
+    sim.save_truth()
+    return len(sim.ground_truth)
+
+
+def create_detector(engine, width, height, blobs_on=False, max_boxes=1, scale=None,
+                    min_area=None, auto_threshold=None):
+    '''
+    Return a ContourDetector for engine with config.py settings for a
+    width x height crop. scale, min_area and auto_threshold None use the
+    config.py setting
+    '''
+    if auto_threshold is None:
+        auto_threshold = setting('MO_AUTO_THRESHOLD_ON', False)
+    learn_rates = {"average": setting('MO_AVG_LEARN_RATE', 0.1),
+                   "mog2": setting('MO_MOG2_LEARN_RATE', -1),
+                   "knn": setting('MO_KNN_LEARN_RATE', -1)}
+    pipeline = create_motion_pipeline(engine, width, height,
+                                      config.BLUR_SIZE, config.THRESHOLD_SENSITIVITY,
+                                      learn_rate=learn_rates.get(engine),
+                                      history=setting('MO_BG_HISTORY', 200),
+                                      scale=setting('MO_DETECT_SCALE', 1) if scale is None else scale,
+                                      pyr_down=setting('MO_DETECT_PYRDOWN_ON', False),
+                                      refine=setting('MO_DETECT_REFINE_ON', True),
+                                      auto_threshold=auto_threshold,
+                                      threshold_min=setting('MO_THRESHOLD_MIN', None),
+                                      threshold_max=setting('MO_THRESHOLD_MAX', None),
+                                      noise_factor=setting('MO_NOISE_FACTOR', 2.5))
+    x_buf = int(width / config.MO_X_LR_SIDE_BUFF_PX)
+    return ContourDetector(pipeline, config.MO_MIN_AREA_PX if min_area is None else min_area,
+                           x_buf, max_boxes,
+                           blobs_on, setting('MO_BLOB_MAX_ASPECT', 0))
+
+
+def create_tracker(name):
+    '''Return the motion_track.py Tracker name per TRACKERS with config.py settings'''
+    if name == "multi":
+        return MultiTracker(config.MO_MIN_X_DIFF_PX, config.MO_MAX_X_DIFF_PX,
+                            config.MO_TRACK_EVENT_COUNT, config.MO_EVENT_TIMEOUT_SEC,
+                            setting('MO_MULTI_MAX_TRACKS', 10))
+    if name == "single":
+        return SingleTracker(config.MO_MIN_X_DIFF_PX, config.MO_MAX_X_DIFF_PX,
+                             config.MO_TRACK_EVENT_COUNT, config.MO_EVENT_TIMEOUT_SEC,
+                             config.MO_TRACK_TIMEOUT_SEC)
+    raise ValueError("Unknown Tracker %s. Use one of %s" % (name, ", ".join(TRACKERS)))
+
+
+def match_truth(truth, cap_time, direction, center_y, frame_sec):
+    '''
+    Return the ground truth row in the crop area at cap_time in direction
+    nearest center_y or None. Rows with no enter_time are skipped
+    '''
+    candidates = [row for row in truth
+                  if row['direction'] == direction and row['enter_time'] and
+                  float(row['enter_time']) <= cap_time <= float(row['exit_time']) + 2 * frame_sec]
+    if not candidates:
+        return None
+    if center_y is not None and candidates[0].get('center_y'):
+        return min(candidates, key=lambda row: abs(float(row['center_y']) - center_y))
+    return candidates[0]
+
+
+def truth_boxes(truth, cap_time):
+    '''
+    Return the frame (x, y, w, h) boxes of truth vehicles at cap_time.
+    Empty if the truth csv is from before vehicle boxes were recorded
+    '''
+    boxes = []
+    for row in truth:
+        if not row.get('start_x') or float(row['start_time']) > cap_time:
+            continue
+        travel = (cap_time - float(row['start_time'])) * float(row['px_per_sec'])
+        if row['direction'] == "L2R":
+            x = float(row['start_x']) + travel
+        else:
+            x = float(row['start_x']) - travel
+        boxes.append((int(round(x)), int(row['y']), int(row['width']), int(row['height'])))
+    return boxes
+
+
+def box_iou(box1, box2):
+    '''Return intersection over union of two (x, y, w, h) boxes'''
+    x1 = max(box1[0], box2[0])
+    y1 = max(box1[1], box2[1])
+    x2 = min(box1[0] + box1[2], box2[0] + box2[2])
+    y2 = min(box1[1] + box1[3], box2[1] + box2[3])
+    inter = max(0, x2 - x1) * max(0, y2 - y1)
+    union = box1[2] * box1[3] + box2[2] * box2[3] - inter
+    return inter / float(union) if union else 0.0
+
+
+def add_rain(image, rng, drops):
+    '''Draw drops rain streaks at random places on image'''
+    height, width = image.shape[:2]
+    for x, y in zip(rng.integers(0, width, drops), rng.integers(0, height, drops)):
+        cv2.line(image, (int(x), int(y)), (int(x) + 2, int(y) + 12), (230, 230, 230), 2)
+
+
+def bench_clip(clip_path, engine, tracker_name, blobs_on=False, scale=None,
+               min_area=None, auto_threshold=None, drops=0):
+    '''
+    Run the engine detector and tracker_name tracker over clip_path with
+    drops rain streaks added to each frame. Returns a dict of stage
+    timing, detection and speed error results.
+    '''
+    truth = None
+    if os.path.isfile(truth_path(clip_path)):
+        # older clips have rows for vehicles that never reached the crop area
+        truth = [row for row, measured in strmsimcam.read_truth(truth_path(clip_path))
+                 if row['enter_time']]
+    video = cv2.VideoCapture(clip_path)
+    if not video.isOpened():
+        raise IOError("Could Not Open Video Clip %s" % clip_path)
+    frame_sec = 1.0 / (video.get(cv2.CAP_PROP_FPS) or 30.0)
+    tracker = create_tracker(tracker_name)
+    detector = None
+    crop = None
+    stage_sec = {'read': 0.0, 'detect': 0.0, 'track': 0.0}
+    tick_sec = 1.0 / cv2.getTickFrequency()
+    rng = np.random.default_rng(RAIN_SEED)
+    frames = 0
+    tracks = []
+    raw_total = boxes_total = motion_frames = 0
+    truth_frames = hits = 0
+    iou_total = 0.0
+    while True:
+        start_tick = cv2.getTickCount()
+        grabbed, image = video.read()
+        read_tick = cv2.getTickCount()
+        if not grabbed:
+            break
+        cap_time = frames * frame_sec
+        frames += 1
+        if drops:
+            add_rain(image, rng, drops)
+        if detector is None:
+            crop = crop_area(image.shape[1], image.shape[0])
+            detector = create_detector(engine, crop[1] - crop[0], crop[3] - crop[2],
+                                       blobs_on, 1 if tracker_name == "single" else
+                                       setting('MO_MULTI_MAX_TRACKS', 10), scale,
+                                       min_area, auto_threshold)
+            detector.prime(image[crop[2]:crop[3], crop[0]:crop[1]])
+            continue
+        detect_start = cv2.getTickCount()
+        boxes = detector.detect(image[crop[2]:crop[3], crop[0]:crop[1]])
+        detect_tick = cv2.getTickCount()
+        finished = tracker.update(boxes, cap_time)
+        track_tick = cv2.getTickCount()
+        stage_sec['read'] += (read_tick - start_tick) * tick_sec
+        stage_sec['detect'] += (detect_tick - detect_start) * tick_sec
+        stage_sec['track'] += (track_tick - detect_tick) * tick_sec
+        raw_total += detector.raw_count
+        boxes_total += len(boxes)
+        if boxes:
+            motion_frames += 1
+        if truth is not None:
+            # score vehicles that speed-cam.py could track in this frame
+            left = crop[0] + detector.x_buf
+            right = crop[1] - detector.x_buf
+            for truth_box in truth_boxes(truth, cap_time):
+                if truth_box[0] <= left or truth_box[0] + truth_box[2] >= right:
+                    continue
+                truth_frames += 1
+                iou = max([box_iou((crop[0] + x, crop[2] + y, w, h), truth_box)
+                           for x, y, w, h in boxes] or [0.0])
+                iou_total += iou
+                if iou >= HIT_IOU:
+                    hits += 1
+        for track in finished:
+            tracks.append((cap_time, track.direction,
+                           track.px_speed() * speed_conv(track.direction),
+                           crop[2] + track.box[1] + track.box[3] // 2))
+    video.release()
+    result = {'clip': os.path.basename(clip_path),
+              'detector': detector.name if detector else engine,
+              'tracker': tracker_name,
+              'frames': frames,
+              'tracks': len(tracks),
+              'vehicles': None,
+              'hit_pct': None}
+    timed = max(1, frames - 1)
+    result['raw'] = raw_total / float(timed)
+    result['boxes'] = boxes_total / float(max(1, motion_frames))
+    result['threshold'] = detector.stats().get('mo_threshold', 0) if detector else 0
+    for stage, seconds in stage_sec.items():
+        result[stage + '_ms'] = 1000.0 * seconds / timed
+    total_sec = sum(stage_sec.values())
+    result['fps'] = timed / total_sec if total_sec else 0.0
+    if truth is not None:
+        errors = {}
+        extra = 0
+        for cap_time, direction, speed, center_y in tracks:
+            row = match_truth(truth, cap_time, direction, center_y, frame_sec)
+            if row is None or row['id'] in errors:
+                extra += 1  # no vehicle there or tracked twice
+                continue
+            truth_speed = float(row['speed'])
+            errors[row['id']] = 100.0 * abs(speed - truth_speed) / truth_speed
+        result.update({'vehicles': len(truth),
+                       'measured': len(errors),
+                       'extra': extra,
+                       'mean_err': sum(errors.values()) / max(1, len(errors)),
+                       'max_err': max(errors.values()) if errors else 0.0})
+    if truth_frames:
+        result['hit_pct'] = 100.0 * hits / truth_frames
+        result['iou'] = iou_total / truth_frames
+    return result
+
+
+if __name__ == "__main__":
+    import argparse
+    logging.basicConfig(level=logging.WARNING,
+                        format="%(asctime)s %(levelname)-8s %(funcName)-10s %(message)s",
+                        datefmt="%Y-%m-%d %H:%M:%S")
+    ap = argparse.ArgumentParser(description="Compare motion detector and tracker speed and accuracy on clips")
+    ap.add_argument('clips', nargs='*',
+                    help='video clips. Ground truth is the clip path with .csv')
+    ap.add_argument('-r', default=None, dest='record',
+                    help='record a simcam clip with ground truth to this path and exit')
+    ap.add_argument('-n', type=int, default=1800, dest='frames',
+                    help='frames to record. Default 1800')
+    ap.add_argument('-l', type=int, default=1, dest='lanes',
+                    help='simcam lanes to record. Default 1')
+    ap.add_argument('-g', type=float, default=None, dest='gap_sec',
+                    help='seconds between vehicles to record. Default SIMCAM_GAP_SEC')
+    ap.add_argument('-z', type=int, default=None, dest='noise',
+                    help='sensor noise standard deviation to record. Default SIMCAM_NOISE')
+    ap.add_argument('-e', default=setting('MO_ENGINE', "diff"), dest='engines',
+                    help='comma separated engines %s. Default MO_ENGINE' % ",".join(MOTION_ENGINES))
+    ap.add_argument('-k', default="single", dest='trackers',
+                    help='comma separated trackers %s. Default single' % ",".join(TRACKERS))
+    ap.add_argument('-b', action='store_true', dest='blobs_on',
+                    help='use connectedComponentsWithStats blobs instead of contours')
+    ap.add_argument('-d', type=int, default=None, dest='scale',
+                    help='detect on a 2 or 4 times reduced image. Default MO_DETECT_SCALE')
+    ap.add_argument('-a', type=int, default=None, dest='min_area',
+                    help='min motion area sq-px. Default MO_MIN_AREA_PX')
+    ap.add_argument('-t', action='store_true', default=None, dest='auto_threshold',
+                    help='auto threshold from the difference image noise level. Default MO_AUTO_THRESHOLD_ON')
+    ap.add_argument('-w', type=int, default=0, dest='drops',
+                    help='rain streaks added to each frame. Default 0')
+    args = ap.parse_args()
+
+    if args.record:
+        vehicles = record_clip(args.record, args.frames, args.lanes, args.gap_sec, args.noise)
+        print("Recorded %i frames %i vehicles to %s and %s"
+              % (args.frames, vehicles, args.record, truth_path(args.record)))
+    if not args.clips:
+        if not args.record:
+            ap.print_usage()
+        raise SystemExit(0)
+    print("Clip              Detector      Tracker  read ms  detect ms  track ms     fps"
+          "  Raw/frame  Boxes  Thresh  Tracks  Measured  Extra  Mean Err%  Max Err%   Hit%   IoU")
+    for clip in args.clips:
+        for engine_name in args.engines.split(","):
+            for tracker_name in args.trackers.split(","):
+                result = bench_clip(clip, engine_name.strip().lower(), tracker_name.strip(),
+                                    args.blobs_on, args.scale, args.min_area,
+                                    args.auto_threshold, args.drops)
+                line = ("%-17s %-13s %-7s %8.2f %10.2f %9.3f %7.0f %10.1f %6.2f %7i %7i"
+                        % (result['clip'][:17], result['detector'], result['tracker'],
+                           result['read_ms'], result['detect_ms'], result['track_ms'],
+                           result['fps'], result['raw'], result['boxes'], result['threshold'],
+                           result['tracks']))
+                if result['vehicles'] is not None:
+                    line += ("  %4i/%-4i %6i %10.2f %9.2f"
+                             % (result['measured'], result['vehicles'], result['extra'],
+                                result['mean_err'], result['max_err']))
+                if result['hit_pct'] is not None:
+                    line += " %6.1f %5.2f" % (result['hit_pct'], result['iou'])
+                print(line)
@@ -0,0 +1,93 @@
+# Speed calculations shared by speed-cam.py, speed_bench.py and strmsimcam.py
+# so benchmarks and simulated vehicles use exactly the same motion crop area
+# and px/sec to speed conversion as speed-cam.py.
+#
+# EventClock gives speed-cam.py speed events the time of the frame that
+# finished the track instead of the time the event is saved. vidfile and
+# simcam replay faster than real time so wall clock tenths of a second
+# repeat and give duplicate database idx and image names. Events in the same
+# tenth of a second, eg two MO_MULTI_TRACK_ON tracks finishing on one frame,
+# get -1, -2 ... added to the name so each keeps its own row and image.
+
+import datetime
+
+CONV_KPH_2_MPH = 0.621371       # conversion from KPH to MPH
+CONV_MM_PER_SEC_2_KPH = 0.0036  # conversion from MM/sec to KPH
+CLOCK_RESYNC_SEC = 5.0          # live event times follow wall clock steps bigger than this eg ntp
+
+
+def auto_crop_area(width, height):
+    '''
+    Return the MO_CROP_AUTO_ON motion crop area (x_left, x_right,
+    y_upper, y_lower) for a width x height stream image
+    '''
+    x_scale = 3.5
+    y_scale = 3.0
+    # reduce motion area for larger stream sizes
+    if width > 1000:
+        x_scale = 2.8
+        y_scale = 2.5
+    x_left = int(width / x_scale)
+    y_upper = int(height / y_scale)
+    return (x_left, int(width - x_left), y_upper, int(height - y_upper))
+
+
+def speed_conv(cal_obj_px, cal_obj_mm, mph=False):
+    '''
+    Return the factor that converts px/sec to kph, or mph if mph=True,
+    for a calibration object of cal_obj_px px and cal_obj_mm mm
+    '''
+    px_to_kph = float(cal_obj_mm / cal_obj_px * CONV_MM_PER_SEC_2_KPH)
+    if mph:
+        return CONV_KPH_2_MPH * px_to_kph
+    return px_to_kph
+
+
+class EventClock(object):
+    '''
+    Convert frame capture times to speed event datetimes. Capture times
+    are time.monotonic() for live cameras and the video position or
+    simulated clock for vidfile and simcam. The first event gets the
+    wall clock time and later events add the capture time since then,
+    so replayed events keep their spacing. realtime=True resyncs to the
+    wall clock if it moves more than CLOCK_RESYNC_SEC from capture time.
+    '''
+
+    def __init__(self, realtime=True):
+        self.realtime = realtime
+        self.wall_start = None
+        self.cap_start = 0.0
+        self.last_name = None  # name of the last event without a repeat number
+        self.repeats = 0       # events since then with the same name
+
+    def event_time(self, cap_time):
+        '''Return the datetime of the frame captured at cap_time'''
+        now = datetime.datetime.now()
+        if self.wall_start is not None:
+            event_time = self.wall_start + datetime.timedelta(seconds=cap_time - self.cap_start)
+            if not self.realtime or abs((now - event_time).total_seconds()) < CLOCK_RESYNC_SEC:
+                return event_time
+        self.wall_start = now
+        self.cap_start = cap_time
+        return now
+
+    def event_name(self, event_time):
+        '''
+        Return the YYYYMMDD-HHMMSS plus tenths of a second idx and image
+        name. Repeats of the last name get -1, -2 ... added
+        '''
+        name = "%04d%02d%02d-%02d%02d%02d%d" % (
+            event_time.year,
+            event_time.month,
+            event_time.day,
+            event_time.hour,
+            event_time.minute,
+            event_time.second,
+            event_time.microsecond // 100000,
+        )
+        if name == self.last_name:
+            self.repeats += 1
+            return "%s-%i" % (name, self.repeats)
+        self.last_name = name
+        self.repeats = 0
+        return name
@@ -7,11 +7,12 @@ def strmcam():
     import time
     import subprocess
     import logging
+    import atexit
+    import importlib
 
     PROG_VER="13.1"   # version of this module
-    CAM_WARMUP_SEC = 3
     # List of valid camera values in the config.py file
-    CAMLIST = ('usbcam', 'rtspcam', 'pilibcam', 'pilegcam')
+    CAMLIST = ('usbcam', 'rtspcam', 'gstcam', 'ffmpegcam', 'mjpegcam', 'pilibcam', 'pilegcam', 'vidfile', 'netcam', 'simcam')
 
     # Setup logging
     logging.basicConfig(level=logging.INFO,
@@ -36,20 +37,85 @@ def strmcam():
         logging.error(err_msg)
         sys.exit(1)
     logging.info("Imported Required Camera Stream Settings from config.py")
+    # Optional settings. Use defaults if not in an older config.py
+    import config
+    CAM_STALL_SEC = getattr(config, 'CAM_STALL_SEC', 3.0)
+    CAM_RECONNECT_MIN_SEC = getattr(config, 'CAM_RECONNECT_MIN_SEC', 0.5)
+    CAM_RECONNECT_MAX_SEC = getattr(config, 'CAM_RECONNECT_MAX_SEC', 30)
+    CAM_START_TIMEOUT_SEC = getattr(config, 'CAM_START_TIMEOUT_SEC', 5.0)
+    CAM_FRAME_POOL_SIZE = getattr(config, 'CAM_FRAME_POOL_SIZE', 8)
+    USBCAM_FOURCC = getattr(config, 'USBCAM_FOURCC', '')
+    USBCAM_BUFFER_SIZE = getattr(config, 'USBCAM_BUFFER_SIZE', 0)
+    GSTCAM_SRC = getattr(config, 'GSTCAM_SRC', RTSPCAM_SRC)
+    GSTCAM_SCALE_ON = getattr(config, 'GSTCAM_SCALE_ON', True)
+    GSTCAM_GRAY_ON = getattr(config, 'GSTCAM_GRAY_ON', False)
+    GSTCAM_LATENCY_MS = getattr(config, 'GSTCAM_LATENCY_MS', 200)
+    FFMPEGCAM_SRC = getattr(config, 'FFMPEGCAM_SRC', RTSPCAM_SRC)
+    FFMPEGCAM_COLOR_FPS = getattr(config, 'FFMPEGCAM_COLOR_FPS', 2.0)
+    FFMPEGCAM_RTSP_TCP_ON = getattr(config, 'FFMPEGCAM_RTSP_TCP_ON', True)
+    MJPEGCAM_SRC = getattr(config, 'MJPEGCAM_SRC', 'http://localhost:8080/stream.mjpg')
+    MJPEGCAM_REDUCE = getattr(config, 'MJPEGCAM_REDUCE', 1)
+    VIDFILE_SRC = getattr(config, 'VIDFILE_SRC', 'media/video/test.mp4')
+    VIDFILE_REALTIME_ON = getattr(config, 'VIDFILE_REALTIME_ON', False)
+    CAM_SHM_BUS_ON = getattr(config, 'CAM_SHM_BUS_ON', False)
+    CAM_SHM_NAME = getattr(config, 'CAM_SHM_NAME', 'speed-cam')
+    CAM_SHM_SLOTS = getattr(config, 'CAM_SHM_SLOTS', 4)
+    NETCAM_SRC = getattr(config, 'NETCAM_SRC', 'localhost:8765')
+    SIMCAM_SPEEDS = getattr(config, 'SIMCAM_SPEEDS', [30, 45, 60])
+    SIMCAM_DIRECTIONS = getattr(config, 'SIMCAM_DIRECTIONS', 'both')
+    SIMCAM_OBJ_SIZE = getattr(config, 'SIMCAM_OBJ_SIZE', (60, 30))
+    SIMCAM_GAP_SEC = getattr(config, 'SIMCAM_GAP_SEC', 2.0)
+    SIMCAM_LANES = getattr(config, 'SIMCAM_LANES', 1)
+    SIMCAM_NOISE = getattr(config, 'SIMCAM_NOISE', 4)
+    SIMCAM_LIGHT_CHANGE = getattr(config, 'SIMCAM_LIGHT_CHANGE', 0.2)
+    SIMCAM_REALTIME_ON = getattr(config, 'SIMCAM_REALTIME_ON', False)
+    SIMCAM_TRUTH_PATH = getattr(config, 'SIMCAM_TRUTH_PATH', 'media/simcam-truth.csv')
+    DVR_ON = getattr(config, 'DVR_ON', False)
+    DVR_DIR = getattr(config, 'DVR_DIR', 'media/dvr')
+    DVR_SEGMENT_SEC = getattr(config, 'DVR_SEGMENT_SEC', 60)
+    DVR_MAX_MB = getattr(config, 'DVR_MAX_MB', 2000)
+    # motion crop area for ffmpegcam and simcam. speed-cam.py calls set_roi() if different
+    MO_CROP_AUTO_ON = getattr(config, 'MO_CROP_AUTO_ON', False)
+    MO_CROP_X_LEFT = config.MO_CROP_X_LEFT
+    MO_CROP_X_RIGHT = config.MO_CROP_X_RIGHT
+    MO_CROP_Y_UPPER = config.MO_CROP_Y_UPPER
+    MO_CROP_Y_LOWER = config.MO_CROP_Y_LOWER
 
-    if PLUGIN_ENABLE_ON:
+    # speed-multicam.py workers select their plugin per process. See speed-cam.py
+    MULTICAM_PLUGIN = os.environ.get("SPEED_CAM_PLUGIN", "")
+    PLUGIN_MODULE = MULTICAM_PLUGIN or "current"
+
+    if PLUGIN_ENABLE_ON or MULTICAM_PLUGIN:
+        PLUGIN_NAME = MULTICAM_PLUGIN or PLUGIN_NAME
         mypath = os.path.abspath(__file__)  # Find the full path of this python script
         # get the path location only (excluding script name)
         baseDir = mypath[0 : mypath.rfind("/") + 1]
         pluginDir = os.path.join(baseDir, "plugins")
-        pluginPath = os.path.join(pluginDir, PLUGIN_NAME + ".py")
 
         # add plugin directory to program PATH
         sys.path.insert(0, pluginDir)
         # Try importing any camera plugin settings if present
         try:
-            from plugins.current import (CAMERA, IM_SIZE, RTSPCAM_SRC, USBCAM_SRC,
-                                         IM_FRAMERATE, IM_ROTATION, IM_HFLIP, IM_VFLIP)
+            plugin = importlib.import_module("plugins." + PLUGIN_MODULE)
+            # plugins only set some of these so keep config.py values for the rest
+            CAMERA = getattr(plugin, 'CAMERA', CAMERA)
+            IM_SIZE = getattr(plugin, 'IM_SIZE', IM_SIZE)
+            RTSPCAM_SRC = getattr(plugin, 'RTSPCAM_SRC', RTSPCAM_SRC)
+            GSTCAM_SRC = getattr(plugin, 'GSTCAM_SRC', GSTCAM_SRC)
+            FFMPEGCAM_SRC = getattr(plugin, 'FFMPEGCAM_SRC', FFMPEGCAM_SRC)
+            MJPEGCAM_SRC = getattr(plugin, 'MJPEGCAM_SRC', MJPEGCAM_SRC)
+            USBCAM_SRC = getattr(plugin, 'USBCAM_SRC', USBCAM_SRC)
+            IM_FRAMERATE = getattr(plugin, 'IM_FRAMERATE', IM_FRAMERATE)
+            IM_ROTATION = getattr(plugin, 'IM_ROTATION', IM_ROTATION)
+            IM_HFLIP = getattr(plugin, 'IM_HFLIP', IM_HFLIP)
+            IM_VFLIP = getattr(plugin, 'IM_VFLIP', IM_VFLIP)
+            VIDFILE_SRC = getattr(plugin, 'VIDFILE_SRC', VIDFILE_SRC)
+            NETCAM_SRC = getattr(plugin, 'NETCAM_SRC', NETCAM_SRC)
+            MO_CROP_AUTO_ON = getattr(plugin, 'MO_CROP_AUTO_ON', MO_CROP_AUTO_ON)
+            MO_CROP_X_LEFT = getattr(plugin, 'MO_CROP_X_LEFT', MO_CROP_X_LEFT)
+            MO_CROP_X_RIGHT = getattr(plugin, 'MO_CROP_X_RIGHT', MO_CROP_X_RIGHT)
+            MO_CROP_Y_UPPER = getattr(plugin, 'MO_CROP_Y_UPPER', MO_CROP_Y_UPPER)
+            MO_CROP_Y_LOWER = getattr(plugin, 'MO_CROP_Y_LOWER', MO_CROP_Y_LOWER)
         except Exception as err_msg:
             logging.warning("%s", err_msg)
         logging.info("%s Imported New Camera Stream Settings from plugin %s", CAMERA.upper(), PLUGIN_NAME)
@@ -115,7 +181,8 @@ def strmcam():
                 cam_title = cam_name
                 vs = CamStream(size=IM_SIZE,
                                vflip=IM_VFLIP,
-                               hflip=IM_HFLIP).start()
+                               hflip=IM_HFLIP,
+                               pool_size=CAM_FRAME_POOL_SIZE).start(CAM_START_TIMEOUT_SEC)
 
             else:
                 logging.error('Looks like Pi Legacy Camera is Enabled')
@@ -146,7 +213,8 @@ def strmcam():
                            framerate=IM_FRAMERATE,
                            rotation=IM_ROTATION,
                            hflip=IM_HFLIP,
-                           vflip=IM_VFLIP).start()
+                           vflip=IM_VFLIP,
+                           pool_size=CAM_FRAME_POOL_SIZE).start(CAM_START_TIMEOUT_SEC)
         elif cam_name == 'usbcam' or cam_name == 'rtspcam':
             if cam_name == 'rtspcam':
                 cam_src = RTSPCAM_SRC
@@ -163,12 +231,204 @@ def strmcam():
             except ImportError:
                 logging.error("Could Not Import Webcam from strmusbipcam.py")
                 sys.exit(1)
-            vs = CamStream(src=cam_src, size=IM_SIZE).start()
+            if cam_name == 'usbcam':
+                usb_profile = {'framerate': IM_FRAMERATE,
+                               'fourcc': USBCAM_FOURCC,
+                               'buffer_size': USBCAM_BUFFER_SIZE}
+            else:
+                # rtsp stream format is set by the ip camera
+                usb_profile = {'buffer_size': USBCAM_BUFFER_SIZE}
+            vs = CamStream(src=cam_src,
+                           size=IM_SIZE,
+                           pool_size=CAM_FRAME_POOL_SIZE,
+                           **usb_profile,
+                           stall_sec=CAM_STALL_SEC,
+                           backoff_min_sec=CAM_RECONNECT_MIN_SEC,
+                           backoff_max_sec=CAM_RECONNECT_MAX_SEC).start(CAM_START_TIMEOUT_SEC)
+
+        elif cam_name == 'gstcam':
+            if not os.path.exists('strmgstcam.py'):
+                logging.error("File Not Found. Could Not Import strmgstcam.py")
+                sys.exit(1)
+            try:
+                from strmgstcam import CamStream, gst_available
+            except ImportError:
+                logging.error("Could Not Import CamStream from strmgstcam.py")
+                sys.exit(1)
+            if not gst_available():
+                logging.error("OpenCV was Built Without GStreamer Support")
+                logging.info("Edit config.py and Change CAMERA to rtspcam or Install OpenCV with GStreamer")
+                sys.exit(1)
+            cam_title = cam_name.upper() + ' src=' + str(GSTCAM_SRC)
+            vs = CamStream(src=GSTCAM_SRC,
+                           size=IM_SIZE,
+                           scale=GSTCAM_SCALE_ON,
+                           gray=GSTCAM_GRAY_ON,
+                           latency_ms=GSTCAM_LATENCY_MS,
+                           framerate=IM_FRAMERATE,
+                           pool_size=CAM_FRAME_POOL_SIZE,
+                           stall_sec=CAM_STALL_SEC,
+                           backoff_min_sec=CAM_RECONNECT_MIN_SEC,
+                           backoff_max_sec=CAM_RECONNECT_MAX_SEC).start(CAM_START_TIMEOUT_SEC)
+
+        elif cam_name == 'ffmpegcam':
+            if not os.path.exists('strmffmpegcam.py'):
+                logging.error("File Not Found. Could Not Import strmffmpegcam.py")
+                sys.exit(1)
+            try:
+                from strmffmpegcam import CamStream, ffmpeg_available
+            except ImportError:
+                logging.error("Could Not Import CamStream from strmffmpegcam.py")
+                sys.exit(1)
+            if not ffmpeg_available():
+                logging.error("ffmpeg Not Found. Install with sudo apt install ffmpeg")
+                sys.exit(1)
+            # ffmpeg sends only the motion crop area. speed-cam.py calls
+            # set_roi() if MO_CROP_AUTO_ON calculates a different one
+            ffmpeg_roi = None
+            if not MO_CROP_AUTO_ON:
+                ffmpeg_roi = (MO_CROP_X_LEFT, MO_CROP_Y_UPPER,
+                              MO_CROP_X_RIGHT - MO_CROP_X_LEFT,
+                              MO_CROP_Y_LOWER - MO_CROP_Y_UPPER)
+            cam_title = cam_name.upper() + ' src=' + str(FFMPEGCAM_SRC)
+            vs = CamStream(src=FFMPEGCAM_SRC,
+                           size=IM_SIZE,
+                           roi=ffmpeg_roi,
+                           color_fps=FFMPEGCAM_COLOR_FPS,
+                           rtsp_tcp=FFMPEGCAM_RTSP_TCP_ON,
+                           pool_size=CAM_FRAME_POOL_SIZE,
+                           stall_sec=CAM_STALL_SEC,
+                           backoff_min_sec=CAM_RECONNECT_MIN_SEC,
+                           backoff_max_sec=CAM_RECONNECT_MAX_SEC).start(CAM_START_TIMEOUT_SEC)
+
+        elif cam_name == 'mjpegcam':
+            if not os.path.exists('strmmjpegcam.py'):
+                logging.error("File Not Found. Could Not Import strmmjpegcam.py")
+                sys.exit(1)
+            try:
+                from strmmjpegcam import CamStream
+            except ImportError:
+                logging.error("Could Not Import CamStream from strmmjpegcam.py")
+                sys.exit(1)
+            cam_title = cam_name.upper() + ' src=' + MJPEGCAM_SRC + ' reduce=' + str(MJPEGCAM_REDUCE)
+            vs = CamStream(src=MJPEGCAM_SRC,
+                           reduce=MJPEGCAM_REDUCE,
+                           framerate=IM_FRAMERATE,
+                           stall_sec=CAM_STALL_SEC,
+                           backoff_min_sec=CAM_RECONNECT_MIN_SEC,
+                           backoff_max_sec=CAM_RECONNECT_MAX_SEC).start(CAM_START_TIMEOUT_SEC)
+
+        elif cam_name == 'netcam':
+            if not os.path.exists('strmnetcam.py'):
+                logging.error("File Not Found. Could Not Import strmnetcam.py")
+                sys.exit(1)
+            try:
+                from strmnetcam import CamStream
+            except ImportError:
+                logging.error("Could Not Import CamStream from strmnetcam.py")
+                sys.exit(1)
+            cam_title = cam_name.upper() + ' src=' + NETCAM_SRC
+            vs = CamStream(src=NETCAM_SRC,
+                           size=IM_SIZE,
+                           pool_size=CAM_FRAME_POOL_SIZE,
+                           stall_sec=CAM_STALL_SEC,
+                           backoff_min_sec=CAM_RECONNECT_MIN_SEC,
+                           backoff_max_sec=CAM_RECONNECT_MAX_SEC).start(CAM_START_TIMEOUT_SEC)
+
+        elif cam_name == 'simcam':
+            if not os.path.exists('strmsimcam.py'):
+                logging.error("File Not Found. Could Not Import strmsimcam.py")
+                sys.exit(1)
+            try:
+                from strmsimcam import CamStream
+            except ImportError:
+                logging.error("Could Not Import CamStream from strmsimcam.py")
+                sys.exit(1)
+            # vehicles cross the motion crop area at speeds in speed-cam units
+            # using the speed-cam calibration so results can be checked.
+            # speed-cam.py calls set_roi() if MO_CROP_AUTO_ON calculates one
+            sim_crop = None
+            if not MO_CROP_AUTO_ON:
+                sim_crop = (MO_CROP_X_LEFT, MO_CROP_X_RIGHT,
+                            MO_CROP_Y_UPPER, MO_CROP_Y_LOWER)
+            cam_title = (cam_name.upper() + ' speeds=' + str(SIMCAM_SPEEDS) +
+                         ' directions=' + SIMCAM_DIRECTIONS + ' truth=' + SIMCAM_TRUTH_PATH)
+            vs = CamStream(size=IM_SIZE,
+                           framerate=IM_FRAMERATE,
+                           speeds=SIMCAM_SPEEDS,
+                           directions=SIMCAM_DIRECTIONS,
+                           obj_size=SIMCAM_OBJ_SIZE,
+                           gap_sec=SIMCAM_GAP_SEC,
+                           lanes=SIMCAM_LANES,
+                           noise=SIMCAM_NOISE,
+                           light_change=SIMCAM_LIGHT_CHANGE,
+                           crop=sim_crop,
+                           cal=(config.CAL_OBJ_PX_L2R, config.CAL_OBJ_MM_L2R,
+                                config.CAL_OBJ_PX_R2L, config.CAL_OBJ_MM_R2L),
+                           mph=config.MO_SPEED_MPH_ON,
+                           realtime=SIMCAM_REALTIME_ON,
+                           truth_path=SIMCAM_TRUTH_PATH,
+                           pool_size=CAM_FRAME_POOL_SIZE).start(CAM_START_TIMEOUT_SEC)
+
+        elif cam_name == 'vidfile':
+            if not os.path.exists('strmvidfile.py'):
+                logging.error("File Not Found. Could Not Import strmvidfile.py")
+                sys.exit(1)
+            if not os.path.isfile(VIDFILE_SRC):
+                logging.error("Video File Not Found VIDFILE_SRC=%s", VIDFILE_SRC)
+                logging.info('Edit config.py VIDFILE_SRC variable.')
+                sys.exit(1)
+            try:
+                from strmvidfile import CamStream
+            except ImportError:
+                logging.error("Could Not Import CamStream from strmvidfile.py")
+                sys.exit(1)
+            cam_title = cam_name.upper() + ' src=' + VIDFILE_SRC + ' realtime=' + str(VIDFILE_REALTIME_ON)
+            vs = CamStream(filepath=VIDFILE_SRC,
+                           realtime=VIDFILE_REALTIME_ON,
+                           pool_size=CAM_FRAME_POOL_SIZE).start(CAM_START_TIMEOUT_SEC)
 
         logging.info("%s", cam_title)
         return vs
 
+    # ------------------------------------------------------------------------------
+    def start_frame_bus(vs):
+        '''
+        Publish stream frames to a shared memory ring so other
+        local processes can read them. See strmshm.py
+        '''
+        try:
+            from strmshm import FrameBusPublisher
+        except ImportError as err_msg:
+            logging.warning("CAM_SHM_BUS_ON=True but Could Not Import strmshm.py %s", err_msg)
+            return
+        vs.bus = FrameBusPublisher(vs, name=CAM_SHM_NAME, slots=CAM_SHM_SLOTS).start()
+        atexit.register(vs.bus.stop)  # remove shared memory on exit
+        logging.info("CAM_SHM_BUS_ON=True Frames Shared as %s", CAM_SHM_NAME)
+
+    def start_dvr(vs):
+        '''
+        Record all stream frames to rolling video segments with a
+        timestamp index. See strmdvr.py and dvr-clip.py
+        '''
+        try:
+            from strmdvr import DvrRecorder
+        except ImportError as err_msg:
+            logging.warning("DVR_ON=True but Could Not Import strmdvr.py %s", err_msg)
+            return
+        vs.dvr = DvrRecorder(vs, dvr_dir=DVR_DIR, segment_sec=DVR_SEGMENT_SEC,
+                             max_mb=DVR_MAX_MB).start()
+        atexit.register(vs.dvr.stop)  # close the open segment on exit
+        logging.info("DVR_ON=True Recording %i sec Segments to %s Max %i MB",
+                     DVR_SEGMENT_SEC, DVR_DIR, DVR_MAX_MB)
+
+    # create_cam_thread returns when the camera delivers a frame with settled
+    # exposure or CAM_START_TIMEOUT_SEC expires. No fixed warm up sleep needed.
+    start_time = time.monotonic()
     vs = create_cam_thread(CAMERA)
-    logging.info("ver %s Warming Up Camera %i sec ...", PROG_VER, CAM_WARMUP_SEC)
-    time.sleep(CAM_WARMUP_SEC)  # Allow Camera to warm up
+    if CAM_SHM_BUS_ON:
+        start_frame_bus(vs)
+    if DVR_ON:
+        start_dvr(vs)
+    logging.info("ver %s Camera Started in %.2f sec", PROG_VER, time.monotonic() - start_time)
     return vs
@@ -0,0 +1,214 @@
+# Continuous DVR segment recorder for camera stream frames
+# Records rolling fixed length video segments from a CamStream so a stretch
+# of time can be re-analysed later eg after changing MO_CROP_* or
+# THRESHOLD_SENSITIVITY settings. Use dvr-clip.py to extract a clip.
+#
+# Each segment is a pair of files in DVR_DIR named per the wall clock time
+# of the first frame
+#   dvr-YYYYMMDD-HHMMSS.avi   MJPG video. Every frame is a key frame so
+#                             seeking to a frame number is exact
+#   dvr-YYYYMMDD-HHMMSS.idx   csv text index with one line per frame
+#                             frame_no,wall_time,seq
+#
+# wall_time is epoch seconds of the frame capture time so a speed table row
+# can be matched to frame numbers by reading only the small index files.
+# Oldest segments are deleted when the DVR_DIR total exceeds max_mb.
+#
+# sample implementation
+# ---------------------
+#    from strmdvr import DvrRecorder
+#    dvr = DvrRecorder(vs, dvr_dir="media/dvr", segment_sec=60, max_mb=2000).start()
+#    ...
+#    dvr.stop()
+
+import datetime
+import glob
+import logging
+import os
+import time
+from threading import Thread
+import cv2
+
+DVR_PREFIX = "dvr-"
+DVR_VIDEO_EXT = ".avi"
+DVR_INDEX_EXT = ".idx"
+
+
+class DvrRecorder:
+    '''
+    Thread that writes every frame from a CamStream ring to rolling
+    video segments with a sidecar timestamp index. Waits on the ring
+    directly so the CamStream reader sequence is not affected.
+    '''
+
+    def __init__(self, vs, dvr_dir="media/dvr", segment_sec=60,
+                 max_mb=2000, fourcc="MJPG", fps=None):
+        self.vs = vs
+        self.dvr_dir = dvr_dir
+        self.segment_sec = segment_sec
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.fourcc = fourcc
+        self.fps = fps or getattr(vs, 'framerate', 30) or 30
+        self.writer = None
+        self.index = None
+        self.segment_start = 0.0
+        self.segment_shape = None
+        self.segment_frames = 0
+        self.wall_offset = None  # add to frame timestamp for epoch time
+        self.recorded = 0        # frames written
+        self.dropped = 0         # frames that left the ring before being written
+        self.segments = 0
+        self.deleted = 0         # segments removed by retention
+        self.stopped = False
+        self.thread = None
+        if not os.path.isdir(self.dvr_dir):
+            logging.info("Create DVR Folder %s", self.dvr_dir)
+            os.makedirs(self.dvr_dir)
+
+    def start(self):
+        self.thread = Thread(target=self.update, name="DvrRecorder", args=())
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def update(self):
+        seq = self.vs.ring.seq
+        while not self.stopped:
+            # hold frames so pool buffers are not recycled while encoding
+            frames = self.vs.ring.wait_after(seq, timeout=1.0, hold=True)
+            for frame in frames:
+                if frame.seq > seq + 1 and seq:
+                    self.dropped += frame.seq - seq - 1
+                seq = frame.seq
+                try:
+                    self.write(frame)
+                except Exception as err_msg:
+                    logging.error("DVR Write Failed %s", err_msg)
+                if self.vs.ring.pool is not None:
+                    self.vs.ring.pool.release(frame.image)
+        self.close_segment()
+
+    def write(self, frame):
+        if self.wall_offset is None:
+            # frame timestamps are monotonic. Map them to wall clock once
+            # so index times do not jump if the system clock is adjusted
+            self.wall_offset = time.time() - frame.timestamp
+        if (self.writer is None or
+                frame.timestamp - self.segment_start >= self.segment_sec or
+                frame.image.shape != self.segment_shape):
+            self.open_segment(frame)
+        self.writer.write(frame.image)
+        self.index.write("%i,%.3f,%i\n" % (self.segment_frames,
+                                          frame.timestamp + self.wall_offset,
+                                          frame.seq))
+        self.segment_frames += 1
+        self.recorded += 1
+
+    def open_segment(self, frame):
+        self.close_segment()
+        wall_time = frame.timestamp + self.wall_offset
+        name = DVR_PREFIX + datetime.datetime.fromtimestamp(wall_time).strftime("%Y%m%d-%H%M%S")
+        base_path = os.path.join(self.dvr_dir, name)
+        height, width = frame.image.shape[:2]
+        is_color = frame.image.ndim == 3
+        self.writer = cv2.VideoWriter(base_path + DVR_VIDEO_EXT,
+                                      cv2.VideoWriter_fourcc(*self.fourcc),
+                                      self.fps, (width, height), is_color)
+        self.index = open(base_path + DVR_INDEX_EXT, "w")
+        self.segment_start = frame.timestamp
+        self.segment_shape = frame.image.shape
+        self.segment_frames = 0
+        self.segments += 1
+        logging.info("DVR Recording %s%s", base_path, DVR_VIDEO_EXT)
+
+    def close_segment(self):
+        if self.writer is None:
+            return
+        self.writer.release()
+        self.index.close()
+        self.writer = None
+        self.index = None
+        self.enforce_retention()
+
+    def enforce_retention(self):
+        # delete oldest segments until the folder is within max_bytes
+        videos = sorted(glob.glob(os.path.join(self.dvr_dir, DVR_PREFIX + "*" + DVR_VIDEO_EXT)))
+        sizes = []
+        for video in videos:
+            try:
+                sizes.append(os.path.getsize(video))
+            except OSError:
+                sizes.append(0)
+        total = sum(sizes)
+        for video, size in zip(videos, sizes):
+            if total <= self.max_bytes:
+                break
+            for path in (video, os.path.splitext(video)[0] + DVR_INDEX_EXT):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            total -= size
+            self.deleted += 1
+            logging.info("DVR Retention Deleted %s", video)
+
+    def stats(self):
+        '''Return a dict of recorder counters for logging'''
+        return {'dvr_recorded': self.recorded,
+                'dvr_dropped': self.dropped,
+                'dvr_segments': self.segments,
+                'dvr_deleted': self.deleted}
+
+    def stop(self):
+        self.stopped = True
+        if self.thread is not None:
+            self.thread.join()
+
+
+def list_segments(dvr_dir):
+    '''Return a sorted list of (start epoch time, base path) for each segment'''
+    segments = []
+    for video in glob.glob(os.path.join(dvr_dir, DVR_PREFIX + "*" + DVR_VIDEO_EXT)):
+        base_path = os.path.splitext(video)[0]
+        stamp = os.path.basename(base_path)[len(DVR_PREFIX):]
+        try:
+            start = time.mktime(time.strptime(stamp, "%Y%m%d-%H%M%S"))
+        except ValueError:
+            continue
+        segments.append((start, base_path))
+    segments.sort()
+    return segments
+
+
+def read_index(base_path):
+    '''Return a list of (frame_no, wall_time, seq) from a segment index'''
+    entries = []
+    try:
+        with open(base_path + DVR_INDEX_EXT) as index:
+            for line in index:
+                parts = line.strip().split(",")
+                if len(parts) == 3:
+                    entries.append((int(parts[0]), float(parts[1]), int(parts[2])))
+    except (OSError, ValueError) as err_msg:
+        logging.warning("Could Not Read DVR Index %s %s", base_path, err_msg)
+    return entries
+
+
+def find_frames(dvr_dir, start_time, end_time):
+    '''
+    Return a list of (base path, [(frame_no, wall_time, seq), ...]) for each
+    segment that holds frames between start_time and end_time epoch seconds.
+    Only the index files of segments that can overlap are read.
+    '''
+    segments = list_segments(dvr_dir)
+    found = []
+    for i, (seg_start, base_path) in enumerate(segments):
+        # segment names are truncated to the second
+        if seg_start > end_time:
+            break
+        if i + 1 < len(segments) and segments[i + 1][0] < start_time - 1:
+            continue
+        entries = [e for e in read_index(base_path) if start_time <= e[1] <= end_time]
+        if entries:
+            found.append((base_path, entries))
+    return found
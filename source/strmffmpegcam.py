@@ -0,0 +1,349 @@
+# FFmpeg subprocess camera stream that delivers greyscale motion frames.
+# ffmpeg decodes the camera or file, scales to IM_SIZE, crops the motion
+# area and converts it to grey so python only receives the few bytes the
+# motion detection needs. Each frame is read from the pipe straight into a
+# preallocated numpy buffer with readinto, then pasted onto a full size grey
+# canvas so speed-cam.py crops it as usual.
+#
+# Full colour frames for speed photos come from a second low rate ffmpeg
+# output on its own pipe (color_fps per second, 0=Off). read_color() returns
+# the newest one, up to 1/color_fps sec older than the motion frame. The
+# canvas outside the motion area is the grey of the last colour frame.
+#
+# Needs the ffmpeg program eg sudo apt install ffmpeg
+#
+# src can be an rtsp://, http:// or other ffmpeg url or a video file.
+# Files are read at their recorded pace (ffmpeg -re) like a live camera
+# and eof is set True at the end of the file.
+#
+# Test locally
+#    python3 strmffmpegcam.py media/video/test.mp4
+
+import logging
+import os
+import random
+import shutil
+import subprocess
+import time
+from threading import Thread, Event, Lock
+import cv2
+import numpy as np
+from strmframe import RingReader
+from strmusbipcam import (STATE_CONNECTING, STATE_STREAMING,
+                          STATE_RECONNECTING, STATE_STOPPED)
+
+
+def ffmpeg_available():
+    '''Return True if the ffmpeg program is on the PATH'''
+    return shutil.which("ffmpeg") is not None
+
+
+def read_exact(pipe, view):
+    '''Fill memoryview view from pipe. Returns False at end of stream'''
+    got = 0
+    while got < len(view):
+        count = pipe.readinto(view[got:])
+        if not count:
+            return False
+        got += count
+    return True
+
+
+class CamStream(RingReader):
+    '''
+    Run ffmpeg and put full size grey frames with the newest motion
+    area in the ring. Restarts ffmpeg with backoff like strmusbipcam.
+    '''
+
+    def __init__(self,
+                 src="",
+                 size=(320, 240),
+                 roi=None,
+                 color_fps=2.0,
+                 rtsp_tcp=True,
+                 ring_size=4,
+                 pool_size=8,
+                 stall_sec=3.0,
+                 backoff_min_sec=0.5,
+                 backoff_max_sec=30.0,
+                 name="FFmpegCamStream"):
+        self.src = src
+        self.size = size
+        self.color_fps = color_fps
+        self.rtsp_tcp = rtsp_tcp
+        self.name = name
+        self.is_file = os.path.isfile(str(src))
+        self.init_reader(ring_size, pool_size)
+        self.state = STATE_CONNECTING
+        self.proc = None
+        self.color_pipe = None
+        self.color_thread = None
+        self.restart = False       # set_roi() needs ffmpeg restarted with a new crop
+        self.eof = False
+        width, height = size
+        self.roi = None
+        self.set_crop(roi)
+        self.canvas = np.zeros((height, width), np.uint8)
+        self.canvas_lock = Lock()
+        # colour frames are read into the back buffer then swapped
+        self.color_front = np.zeros((height, width, 3), np.uint8)
+        self.color_back = np.zeros((height, width, 3), np.uint8)
+        self.color_lock = Lock()
+        self.color_frames = 0
+
+        # reconnect settings and metrics
+        self.stall_sec = stall_sec
+        self.backoff_min_sec = backoff_min_sec
+        self.backoff_max_sec = backoff_max_sec
+        self.reconnects = 0
+        self.reconnect_attempts = 0
+        self.down_sec = 0.0
+
+        self.thread = None
+        self.stopped = False
+        self.stop_event = Event()
+
+    def set_crop(self, roi):
+        # roi = (x, y, w, h) within size. None is the whole frame
+        width, height = self.size
+        if roi is None:
+            roi = (0, 0, width, height)
+        x, y, w, h = roi
+        x = max(0, min(x, width - 1))
+        y = max(0, min(y, height - 1))
+        self.roi = (x, y, max(1, min(w, width - x)), max(1, min(h, height - y)))
+        self.roi_buf = np.empty((self.roi[3], self.roi[2]), np.uint8)
+
+    def set_roi(self, x_left, x_right, y_upper, y_lower):
+        '''
+        Have ffmpeg deliver only this area of each frame. Call with
+        the speed-cam motion crop settings. Restarts ffmpeg if changed.
+        '''
+        roi = (x_left, y_upper, x_right - x_left, y_lower - y_upper)
+        if roi == self.roi:
+            return
+        logging.info("%s Motion Area %s. Restarting ffmpeg", self.name, roi)
+        self.pending_roi = roi
+        self.restart = True
+        self.kill_ffmpeg()
+
+    def ffmpeg_cmd(self, color_fd):
+        # decode, scale and split into a grey motion area output on stdout
+        # and an optional low rate colour output on color_fd
+        width, height = self.size
+        x, y, w, h = self.roi
+        cmd = ["ffmpeg", "-hide_banner", "-loglevel", "error", "-nostdin"]
+        if self.is_file:
+            cmd.append("-re")
+        elif str(self.src).startswith("rtsp://"):
+            if self.rtsp_tcp:
+                cmd.extend(["-rtsp_transport", "tcp"])
+            cmd.extend(["-fflags", "nobuffer", "-flags", "low_delay"])
+        cmd.extend(["-i", str(self.src), "-an"])
+        motion = "crop=%i:%i:%i:%i,format=gray" % (w, h, x, y)
+        if color_fd is None:
+            graph = "[0:v]scale=%i:%i,%s[mo]" % (width, height, motion)
+        else:
+            graph = ("[0:v]scale=%i:%i,split=2[m][c];[m]%s[mo];[c]fps=%g,format=bgr24[co]"
+                     % (width, height, motion, self.color_fps))
+        cmd.extend(["-filter_complex", graph,
+                    "-map", "[mo]", "-f", "rawvideo", "pipe:1"])
+        if color_fd is not None:
+            cmd.extend(["-map", "[co]", "-f", "rawvideo", "pipe:%i" % color_fd])
+        return cmd
+
+    def start_ffmpeg(self):
+        # returns True if ffmpeg started
+        color_fd = None
+        if self.color_fps > 0:
+            read_fd, color_fd = os.pipe()
+        cmd = self.ffmpeg_cmd(color_fd)
+        try:
+            if color_fd is None:
+                self.proc = subprocess.Popen(cmd, stdout=subprocess.PIPE,
+                                             stdin=subprocess.DEVNULL, bufsize=0)
+            else:
+                self.proc = subprocess.Popen(cmd, stdout=subprocess.PIPE,
+                                             stdin=subprocess.DEVNULL, bufsize=0,
+                                             pass_fds=(color_fd,))
+        except OSError as err_msg:
+            logging.error("%s Could Not Run ffmpeg %s", self.name, err_msg)
+            if color_fd is not None:
+                os.close(read_fd)
+                os.close(color_fd)
+            return False
+        logging.info("%s %s", self.name, " ".join(cmd))
+        if color_fd is not None:
+            os.close(color_fd)  # ffmpeg has its own copy
+            self.color_pipe = os.fdopen(read_fd, "rb", buffering=0)
+            self.color_thread = Thread(target=self.update_color, name=self.name + "Color", args=())
+            self.color_thread.daemon = True
+            self.color_thread.start()
+        return True
+
+    def kill_ffmpeg(self):
+        # ask ffmpeg to exit so the pipe read in update() returns
+        proc = self.proc
+        if proc is not None and proc.poll() is None:
+            proc.terminate()
+
+    def close_ffmpeg(self):
+        # wait for ffmpeg to exit and close its pipes. Returns the exit code
+        proc, self.proc = self.proc, None
+        if proc is None:
+            return None
+        try:
+            proc.wait(1.0)  # pipe ended so ffmpeg is normally exiting
+        except subprocess.TimeoutExpired:
+            proc.terminate()
+            try:
+                proc.wait(2.0)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.wait()
+        proc.stdout.close()
+        if self.color_thread is not None:
+            self.color_thread.join(2.0)
+            self.color_thread = None
+        if self.color_pipe is not None:
+            self.color_pipe.close()
+            self.color_pipe = None
+        return proc.returncode
+
+    def start(self, ready_timeout=5.0):
+        # start the thread to read frames from ffmpeg and
+        # return once a frame with sane exposure is available
+        self.thread = Thread(target=self.update, name=self.name, args=())
+        self.thread.daemon = True
+        self.thread.start()
+        if ready_timeout:
+            self.wait_ready(ready_timeout)
+        return self
+
+    def update_color(self):
+        # keep the newest colour frame. Also keeps the colour pipe drained
+        # so ffmpeg never blocks writing it
+        pipe = self.color_pipe
+        while not self.stopped:
+            if not read_exact(pipe, memoryview(self.color_back).cast("B")):
+                break
+            with self.color_lock:
+                self.color_front, self.color_back = self.color_back, self.color_front
+                self.color_frames += 1
+            with self.canvas_lock:
+                cv2.cvtColor(self.color_front, cv2.COLOR_BGR2GRAY, dst=self.canvas)
+
+    def read_color(self):
+        '''Return a copy of the newest full colour frame or None if there is none'''
+        with self.color_lock:
+            if not self.color_frames:
+                return None
+            return self.color_front.copy()
+
+    def update(self):
+        while not self.stopped:
+            if self.proc is None and not self.start_ffmpeg():
+                self.reconnect()
+                continue
+            roi_view = memoryview(self.roi_buf).cast("B")
+            if read_exact(self.proc.stdout, roi_view):
+                cap_time = time.monotonic()
+                if not self.decode_due(cap_time):
+                    continue  # idle mode. Nothing to decode but skip the copy
+                x, y, w, h = self.roi
+                buf = self.get_buffer(self.canvas.shape)
+                out = buf if buf is not None else np.empty(self.canvas.shape, np.uint8)
+                with self.canvas_lock:
+                    self.canvas[y:y + h, x:x + w] = self.roi_buf
+                    np.copyto(out, self.canvas)
+                self.put_buffer(buf, out, cap_time)
+                self.state = STATE_STREAMING
+                continue
+            returncode = self.close_ffmpeg()
+            if self.stopped:
+                break
+            if self.restart:
+                self.restart = False
+                self.set_crop(self.pending_roi)
+                continue
+            if self.is_file and returncode == 0:
+                self.eof = True
+                logging.info("%s End of File %s", self.name, self.src)
+                break
+            logging.warning("%s ffmpeg Stopped exitcode=%s", self.name, returncode)
+            self.reconnect()
+        self.close_ffmpeg()
+        self.state = STATE_STOPPED
+        # wake any reader waiting for a frame that will never come
+        with self.ring.cond:
+            self.ring.cond.notify_all()
+
+    def reconnect(self):
+        # restart ffmpeg with exponential backoff and jitter until it runs
+        self.state = STATE_RECONNECTING
+        down_start = time.monotonic()
+        backoff = self.backoff_min_sec
+        attempts = 0
+        while not self.stopped:
+            if self.stop_event.wait(random.uniform(backoff / 2.0, backoff)):
+                break
+            self.reconnect_attempts += 1
+            attempts += 1
+            if self.start_ffmpeg():
+                self.reconnects += 1
+                logging.info("%s Restarted ffmpeg after %.1f sec and %i attempts",
+                             self.name, time.monotonic() - down_start, attempts)
+                break
+            backoff = min(backoff * 2.0, self.backoff_max_sec)
+        self.down_sec += time.monotonic() - down_start
+
+    def read_frame(self, wait_new=False, timeout=1.0):
+        # no new frames will come once the file has ended
+        if wait_new and self.eof and self.ring.seq <= self.last_seq:
+            return None
+        return RingReader.read_frame(self, wait_new, timeout)
+
+    def health(self):
+        # return current stream state per strmusbipcam STATE_ values
+        return self.state
+
+    def stats(self):
+        # frame counters plus restart metrics and colour frames received
+        stats = RingReader.stats(self)
+        stats.update({'state': self.state,
+                      'reconnects': self.reconnects,
+                      'reconnect_attempts': self.reconnect_attempts,
+                      'down_sec': self.down_sec,
+                      'color_frames': self.color_frames})
+        return stats
+
+    def stop(self, timeout=3.0):
+        # indicate that the thread should be stopped and end ffmpeg
+        self.stopped = True
+        self.stop_event.set()
+        self.kill_ffmpeg()
+        self.join_thread(timeout)
+
+
+if __name__ == "__main__":
+    import sys
+    logging.basicConfig(level=logging.INFO,
+                        format="%(asctime)s %(levelname)-8s %(funcName)-10s %(message)s",
+                        datefmt="%Y-%m-%d %H:%M:%S")
+    if not ffmpeg_available():
+        logging.error("ffmpeg Not Found. Install with sudo apt install ffmpeg")
+        sys.exit(1)
+    test_src = sys.argv[1] if len(sys.argv) > 1 else "media/video/test.mp4"
+    vs = CamStream(src=test_src, roi=(40, 80, 240, 80)).start()
+    start_time = time.monotonic()
+    frames = 0
+    while time.monotonic() - start_time < 10.0 and not vs.eof:
+        if vs.read_next(timeout=1.0) is not None:
+            frames += 1
+    elapsed = time.monotonic() - start_time
+    color = vs.read_color()
+    vs.stop()
+    stats = vs.stats()
+    print("Read %.1f fps  captured=%i missed=%i color_frames=%i color=%s"
+          % (frames / elapsed, stats['captured'], stats['missed'], stats['color_frames'],
+             None if color is None else color.shape))
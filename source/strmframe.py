@@ -0,0 +1,372 @@
+# Frame helpers shared by the strm*.py camera stream modules
+# Import required libraries
+import time
+import logging
+from collections import deque, namedtuple
+from threading import Condition, Lock
+import numpy as np
+
+# A captured image plus the sequence number and monotonic capture time
+# assigned by the stream thread when the frame arrived.
+Frame = namedtuple('Frame', ['image', 'seq', 'timestamp'])
+
+
+class FramePool:
+    '''
+    Pool of preallocated image buffers recycled between frames so the
+    stream thread does not allocate a new array for every capture.
+    Buffers are reference counted. acquire() returns a buffer with one
+    reference, addref() and release() adjust it and a buffer goes back
+    to the free list when its count drops to zero. Releasing a buffer
+    the pool does not know about is ignored.
+    '''
+
+    def __init__(self, count=8):
+        self.count = count     # max free buffers kept for reuse
+        self.shape = None
+        self.dtype = None
+        self.free = []
+        self.refs = {}         # id(buffer): [buffer, reference count]
+        self.lock = Lock()
+        self.allocated = 0     # new buffers created
+        self.reused = 0        # captures that reused a pool buffer
+
+    def acquire(self, shape, dtype=np.uint8):
+        '''Return a free buffer of shape, allocating one if none free'''
+        with self.lock:
+            if shape != self.shape or dtype != self.dtype:
+                # frame size changed eg ip camera reconnect so start over
+                self.shape = shape
+                self.dtype = dtype
+                self.free = []
+                self.refs = {}
+            if self.free:
+                buf = self.free.pop()
+                self.reused += 1
+            else:
+                buf = np.empty(shape, dtype)
+                self.allocated += 1
+            self.refs[id(buf)] = [buf, 1]
+            return buf
+
+    def addref(self, buf):
+        with self.lock:
+            ref = self.refs.get(id(buf))
+            if ref is not None and ref[0] is buf:
+                ref[1] += 1
+
+    def release(self, buf):
+        with self.lock:
+            ref = self.refs.get(id(buf))
+            if ref is None or ref[0] is not buf:
+                return
+            ref[1] -= 1
+            if ref[1] <= 0:
+                del self.refs[id(buf)]
+                if len(self.free) < self.count:
+                    self.free.append(buf)
+
+
+class FrameRing:
+    '''
+    Bounded ring buffer of Frame tuples filled by a camera stream thread.
+    Oldest frames are dropped when the ring is full so the reader
+    always sees the most recent capture.
+
+    sample implementation
+    ---------------------
+    ring = FrameRing(size=4)
+    ring.put(image)             # stream thread
+    frame = ring.latest()       # newest frame, does not block
+    frame = ring.wait_newer(frame.seq, timeout=1.0)  # block for a newer one
+    '''
+
+    def __init__(self, size=4, pool=None):
+        self.frames = deque(maxlen=max(1, int(size)))
+        self.cond = Condition()
+        self.seq = 0   # sequence number of the newest frame
+        self.pool = pool  # optional FramePool the images came from
+
+    def put(self, image, timestamp=None):
+        '''Add a new image to the ring and wake any waiting readers'''
+        if timestamp is None:
+            timestamp = time.monotonic()
+        with self.cond:
+            self.seq += 1
+            frame = Frame(image, self.seq, timestamp)
+            evicted = None
+            if len(self.frames) == self.frames.maxlen:
+                evicted = self.frames[0]
+            self.frames.append(frame)
+            if evicted is not None and self.pool is not None:
+                self.pool.release(evicted.image)  # drop the ring reference
+            self.cond.notify_all()
+        return frame
+
+    def hold(self, frame):
+        # add a pool reference for a reader. Caller holds self.cond
+        if frame is not None and self.pool is not None:
+            self.pool.addref(frame.image)
+        return frame
+
+    def latest(self, hold=False):
+        '''
+        Return the newest Frame or None if nothing captured yet.
+        hold=True adds a pool reference the caller must release.
+        '''
+        with self.cond:
+            if self.frames:
+                frame = self.frames[-1]
+                return self.hold(frame) if hold else frame
+            return None
+
+    def wait_newer(self, seq, timeout=None, hold=False):
+        '''
+        Block until a frame with a sequence number greater than seq
+        is available. Returns the newest Frame or None on timeout.
+        '''
+        with self.cond:
+            if not self.cond.wait_for(lambda: self.seq > seq, timeout):
+                return None
+            frame = self.frames[-1]
+            return self.hold(frame) if hold else frame
+
+    def wait_after(self, seq, timeout=None, hold=False):
+        '''
+        Block until a frame newer than seq is available then return a list
+        of all frames still in the ring with a sequence number greater than
+        seq, oldest first. Used by consumers like the DVR recorder that want
+        every frame rather than just the newest. Empty list on timeout.
+        '''
+        with self.cond:
+            if not self.cond.wait_for(lambda: self.seq > seq, timeout):
+                return []
+            frames = [frame for frame in self.frames if frame.seq > seq]
+            if hold:
+                for frame in frames:
+                    self.hold(frame)
+            return frames
+
+    def clear(self):
+        '''Remove all frames. Sequence numbers keep counting up'''
+        with self.cond:
+            if self.pool is not None:
+                for frame in self.frames:
+                    self.pool.release(frame.image)
+            self.frames.clear()
+
+
+class RingReader:
+    '''
+    Mixin for CamStream classes that fill self.ring from their update
+    thread. Provides read_frame(), read_next(), read(), set_idle(),
+    set_stride(), wait_ready(), join_thread() and stats(). Update threads use
+    decode_due(), retrieve_frame() or get_buffer() and put_buffer().
+    The CamStream __init__ must call self.init_reader(ring_size, pool_size).
+    '''
+
+    def init_reader(self, ring_size=4, pool_size=0):
+        # pool_size > 0 captures into recycled preallocated buffers.
+        # Frame images returned by read_frame() then stay valid until the
+        # next read. Copy an image if it is needed longer. read() copies.
+        self.pool = None
+        if pool_size > 0:
+            self.pool = FramePool(pool_size)
+        self.ring = FrameRing(size=ring_size, pool=self.pool)
+        self.held = None     # frame returned to the reader holding a pool reference
+        self.frame_shape = None  # shape of the last captured image for the pool
+        self.frame = None    # image of the last frame returned
+        self.last_seq = 0    # sequence number of the last frame returned
+        self.dup_avoided = 0    # reads that waited instead of repeating a frame
+        self.frames_missed = 0  # frames captured but never returned to reader
+        self.frames_read = 0
+        self.idle_interval = 0.0   # seconds between decoded frames. 0=full rate
+        self.last_decode_time = 0.0
+        self.frames_skipped = 0    # frames grabbed but not decoded while idle
+        self.stride = 1            # decode every stride grabbed frames
+        self.grab_count = 0
+        self.last_grab_time = 0.0
+        self.grab_interval = 0.0   # average seconds between grabbed frames
+        self.frames_strided = 0    # frames grabbed but not decoded per stride
+
+    def set_idle(self, idle_fps=0):
+        '''
+        Decode only idle_fps frames per second. Other frames are grabbed
+        and discarded without decoding. idle_fps=0 returns to full rate.
+        '''
+        if idle_fps > 0:
+            self.idle_interval = 1.0 / idle_fps
+        else:
+            self.idle_interval = 0.0
+
+    def set_stride(self, stride=1):
+        '''
+        Decode only every stride grabbed frames. The frames in between are
+        discarded without decoding. stride=1 decodes every frame.
+        '''
+        self.stride = max(1, int(stride))
+
+    def decode_due(self, cap_time):
+        '''
+        Called by the update thread for each grabbed frame. Returns True
+        if the frame should be decoded and put in the ring.
+        '''
+        self.grab_count += 1
+        if self.last_grab_time:
+            interval = cap_time - self.last_grab_time
+            if self.grab_interval:
+                self.grab_interval += 0.05 * (interval - self.grab_interval)
+            else:
+                self.grab_interval = interval
+        self.last_grab_time = cap_time
+        if self.stride > 1 and self.grab_count % self.stride:
+            self.frames_strided += 1
+            return False
+        if cap_time - self.last_decode_time >= self.idle_interval:
+            self.last_decode_time = cap_time
+            return True
+        self.frames_skipped += 1
+        return False
+
+    def read_frame(self, wait_new=False, timeout=1.0):
+        '''
+        Return the newest Frame (image, seq, timestamp) without blocking.
+        If wait_new is True block up to timeout seconds until a frame newer
+        than the last one returned is available. None if nothing is available.
+        '''
+        hold = self.pool is not None
+        if wait_new:
+            frame = self.ring.latest()
+            if frame is None or frame.seq <= self.last_seq:
+                self.dup_avoided += 1
+                frame = self.ring.wait_newer(self.last_seq, timeout, hold)
+            elif hold:
+                frame = self.ring.latest(hold)
+        else:
+            frame = self.ring.latest(hold)
+        if frame is not None and frame.seq != self.last_seq:
+            if self.last_seq and frame.seq > self.last_seq + 1:
+                self.frames_missed += frame.seq - self.last_seq - 1
+            self.last_seq = frame.seq
+            self.frames_read += 1
+            if hold:
+                # previous frame goes back to the pool once the ring drops it
+                if self.held is not None:
+                    self.pool.release(self.held.image)
+                self.held = frame
+        elif frame is not None and hold:
+            self.pool.release(frame.image)  # already holding this frame
+        return frame
+
+    def get_buffer(self, shape):
+        '''
+        Called by the update thread. Return a pool buffer to capture into
+        or None if the pool is disabled.
+        '''
+        if self.pool is None or shape is None:
+            return None
+        return self.pool.acquire(shape)
+
+    def put_buffer(self, buf, image, cap_time):
+        '''
+        Called by the update thread with the buffer from get_buffer() and
+        the image actually captured. If the capture did not use the buffer
+        (eg frame size changed) the buffer is given back.
+        '''
+        if buf is not None and image is not buf:
+            self.pool.release(buf)
+        self.ring.put(image, cap_time)
+
+    def retrieve_frame(self, stream, cap_time):
+        '''
+        Called by the update thread after an opencv VideoCapture grab().
+        Decode the frame into a pool buffer (if enabled) and put it in the
+        ring. Returns False if the frame could not be decoded.
+        '''
+        buf = self.get_buffer(self.frame_shape)
+        if buf is None:
+            grabbed, image = stream.retrieve()
+        else:
+            grabbed, image = stream.retrieve(buf)
+        if not grabbed:
+            if buf is not None:
+                self.pool.release(buf)
+            return False
+        self.frame_shape = image.shape
+        self.put_buffer(buf, image, cap_time)
+        return True
+
+    def wait_ready(self, timeout=5.0, settle=10.0):
+        '''
+        Block until the stream delivers a frame with a sane exposure.
+        Sane means not black or white and the mean pixel value changed by
+        less than settle from the previous frame (auto exposure has settled).
+        Returns seconds waited or None if timeout expired first.
+        '''
+        start_time = time.monotonic()
+        end_time = start_time + timeout
+        seq = 0
+        prev_mean = None
+        while True:
+            remaining = end_time - time.monotonic()
+            frame = None
+            if remaining > 0:
+                frame = self.ring.wait_newer(seq, remaining)
+            if frame is None:
+                logging.warning("%s No Ready Frame after %.2f sec", self.__module__, timeout)
+                return None
+            seq = frame.seq
+            mean = float(frame.image[::8, ::8].mean())  # subsample is enough
+            if (0.5 < mean < 254.5 and prev_mean is not None and
+                    abs(mean - prev_mean) < settle):
+                ready_sec = time.monotonic() - start_time
+                logging.info("%s Ready in %.2f sec (%i frames)",
+                             self.__module__, ready_sec, seq)
+                return ready_sec
+            prev_mean = mean
+
+    def join_thread(self, timeout=3.0):
+        '''
+        Wait for the update thread to exit. Returns True if it did
+        within timeout seconds.
+        '''
+        if self.thread is None:
+            return True
+        start_time = time.monotonic()
+        self.thread.join(timeout)
+        if self.thread.is_alive():
+            logging.warning("%s Thread Did Not Stop within %.2f sec",
+                            self.__module__, timeout)
+            return False
+        logging.info("%s Thread Stopped in %.2f sec",
+                     self.__module__, time.monotonic() - start_time)
+        return True
+
+    def read_next(self, timeout=1.0):
+        '''Block until a frame not yet returned is available. None on timeout'''
+        return self.read_frame(wait_new=True, timeout=timeout)
+
+    def read(self, wait_new=False, timeout=1.0):
+        '''
+        Return the image of the newest frame. With a frame pool the image
+        is a copy so callers like user_motion_code.py can keep it. The
+        motion loop uses read_frame() and read_next() to avoid the copy.
+        '''
+        frame = self.read_frame(wait_new, timeout)
+        if frame is not None:
+            if self.pool is not None:
+                self.frame = frame.image.copy()
+            else:
+                self.frame = frame.image
+        return self.frame
+
+    def stats(self):
+        '''Return a dict of frame counters for logging'''
+        return {'captured': self.ring.seq,
+                'read': self.frames_read,
+                'missed': self.frames_missed,
+                'skipped': self.frames_skipped,
+                'strided': self.frames_strided,
+                'dup_avoided': self.dup_avoided,
+                'pool_alloc': self.pool.allocated if self.pool else 0,
+                'pool_reused': self.pool.reused if self.pool else 0}
@@ -0,0 +1,157 @@
+# GStreamer appsink camera stream for RTSP and other sources
+# OpenCV's default FFmpeg backend queues decoded RTSP frames internally so
+# on a busy network speed-cam.py can fall seconds behind the camera. This
+# stream builds a GStreamer pipeline that ends in
+#     appsink drop=true max-buffers=1 sync=false
+# so late frames are dropped inside GStreamer and a grab always returns the
+# newest decoded frame. Optional decode time scaling to IM_SIZE and GRAY8
+# conversion are done in the pipeline instead of in python.
+#
+# Needs OpenCV built with GStreamer (cv2.getBuildInformation() shows
+# GStreamer: YES) eg Raspberry Pi OS python3-opencv plus the gstreamer1.0
+# plugins-good, plugins-bad and libav packages for rtsp and h264.
+#
+# src can be
+#     rtsp://user:password@IP:554/path   rtspsrc with decodebin
+#     a video file path                  filesrc with decodebin
+#     "test"                             videotestsrc for local testing
+#     any gst source description containing "!" or ending in "src ..."
+#         eg "videotestsrc is-live=true pattern=ball"
+#     a full pipeline ending in appsink. Used as is
+#
+# Reconnect, idle mode and frame pool handling are the same as strmusbipcam.py
+#
+# Test locally
+#    python3 strmgstcam.py test
+#    python3 strmgstcam.py media/video/test.mp4
+
+import logging
+import os
+import cv2
+import strmusbipcam
+
+GST_APPSINK = "appsink drop=true max-buffers=1 sync=false"
+
+
+def gst_available():
+    '''Return True if OpenCV was built with the GStreamer backend'''
+    for line in cv2.getBuildInformation().splitlines():
+        if line.strip().startswith("GStreamer:"):
+            return "YES" in line
+    return False
+
+
+def gst_quote(value):
+    '''
+    Return value as a double quoted GStreamer property value so paths
+    with spaces and rtsp passwords with ! or " parse as one value
+    '''
+    return '"%s"' % value.replace('\\', '\\\\').replace('"', '\\"')
+
+
+def build_pipeline(src, size=None, gray=False, framerate=None, latency_ms=200):
+    '''
+    Return a GStreamer pipeline description for src that ends in a
+    dropping appsink. size=(width, height) scales while decoding and
+    gray=True delivers single channel GRAY8 frames.
+    '''
+    src = str(src).strip()
+    if "appsink" in src:
+        return src  # user supplied full pipeline
+    if src.startswith("rtsp://"):
+        # drop-on-latency stops the jitter buffer from queueing old frames
+        source = ("rtspsrc location=%s latency=%i drop-on-latency=true ! decodebin"
+                  % (gst_quote(src), latency_ms))
+    elif src == "test":
+        source = "videotestsrc is-live=true pattern=ball"
+    elif os.path.isfile(src):
+        source = "filesrc location=%s ! decodebin" % gst_quote(src)
+    elif "!" in src or src.split(" ")[0].endswith("src"):
+        source = src
+    else:
+        source = "filesrc location=%s ! decodebin" % gst_quote(src)
+    chain = [source, "videoconvert"]
+    caps = "video/x-raw,format=%s" % ("GRAY8" if gray else "BGR")
+    if size:
+        chain.append("videoscale")
+        caps += ",width=%i,height=%i" % (size[0], size[1])
+    if framerate and source.startswith("videotestsrc"):
+        caps += ",framerate=%i/1" % framerate
+    chain.extend([caps, GST_APPSINK])
+    return " ! ".join(chain)
+
+
+class CamStream(strmusbipcam.CamStream):
+    '''
+    strmusbipcam.CamStream that opens a GStreamer pipeline per
+    build_pipeline() instead of cv2.VideoCapture(src).
+    '''
+
+    def __init__(self,
+                 src="test",
+                 size=(320, 240),
+                 scale=True,
+                 gray=False,
+                 latency_ms=200,
+                 framerate=30,
+                 ring_size=4,
+                 pool_size=8,
+                 stall_sec=3.0,
+                 backoff_min_sec=0.5,
+                 backoff_max_sec=30.0,
+                 name="GstCamStream"):
+        # set before strmusbipcam.CamStream opens the stream
+        self.gray = gray
+        self.pipeline = build_pipeline(src, size if scale else None, gray,
+                                       framerate, latency_ms)
+        strmusbipcam.CamStream.__init__(self,
+                                        src=src,
+                                        size=size,
+                                        ring_size=ring_size,
+                                        pool_size=pool_size,
+                                        stall_sec=stall_sec,
+                                        backoff_min_sec=backoff_min_sec,
+                                        backoff_max_sec=backoff_max_sec,
+                                        framerate=framerate,
+                                        name=name)
+
+    def open_stream(self):
+        # appsink already drops late frames so there is no buffer to set
+        stream = cv2.VideoCapture(self.pipeline, cv2.CAP_GSTREAMER)
+        if not stream.isOpened():
+            logging.error("%s Could Not Open GStreamer Pipeline %s", self.name, self.pipeline)
+        else:
+            logging.info("%s Pipeline %s", self.name, self.pipeline)
+        return stream
+
+    def check_profile(self, stream):
+        # fourcc and buffersize do not apply to appsink
+        logging.info("%s Capture %ix%i gray=%s", self.name,
+                     int(stream.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                     int(stream.get(cv2.CAP_PROP_FRAME_HEIGHT)), self.gray)
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+    logging.basicConfig(level=logging.INFO,
+                        format="%(asctime)s %(levelname)-8s %(funcName)-10s %(message)s",
+                        datefmt="%Y-%m-%d %H:%M:%S")
+    if not gst_available():
+        logging.error("OpenCV was Built Without GStreamer. See cv2.getBuildInformation()")
+        sys.exit(1)
+    test_src = sys.argv[1] if len(sys.argv) > 1 else "test"
+    if os.path.isfile(test_src):
+        logging.info("filesrc is not paced. Frames decoded faster than read are dropped")
+    vs = CamStream(src=test_src, gray="gray" in sys.argv[2:]).start()
+    start_time = time.monotonic()
+    frames = 0
+    while time.monotonic() - start_time < 10.0:
+        frame = vs.read_next(timeout=1.0)
+        if frame is not None:
+            frames += 1
+    vs.stop()
+    stats = vs.stats()
+    print("Read %.1f fps  captured=%i read=%i missed=%i shape=%s"
+          % (frames / 10.0, stats['captured'], stats['read'], stats['missed'],
+             None if frame is None else frame.image.shape))
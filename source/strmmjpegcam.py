@@ -0,0 +1,405 @@
+# HTTP MJPEG and snapshot IP camera stream
+# Many low cost ip cameras serve motion jpeg over http instead of rtsp
+#   multipart/x-mixed-replace streams  eg http://IP/video.mjpg
+#   single jpeg snapshot urls          eg http://IP/snapshot.jpg
+# The type is found from the response Content-Type. One http connection is
+# kept open. A stream is parsed incrementally part by part and a snapshot url
+# is requested again on the same keep alive connection for each frame.
+#
+# The network thread keeps only the newest jpeg and a decode thread turns it
+# into a frame, so a slow decode drops jpegs rather than falling behind.
+# reduce=2, 4 or 8 decodes at 1/2, 1/4 or 1/8 size with IMREAD_REDUCED_COLOR_*
+# which is several times faster than a full decode and a resize.
+#
+# Stand-in camera for testing. Serves simcam frames on port 8080
+#    python3 strmmjpegcam.py serve
+#    python3 strmmjpegcam.py http://localhost:8080/stream.mjpg
+#    python3 strmmjpegcam.py http://localhost:8080/snapshot.jpg
+
+import base64
+import http.client
+import logging
+import random
+import socket
+import time
+from threading import Thread, Event, Condition
+from urllib.parse import urlsplit
+import cv2
+import numpy as np
+from strmframe import RingReader
+from strmusbipcam import (STATE_CONNECTING, STATE_STREAMING,
+                          STATE_RECONNECTING, STATE_STOPPED)
+
+REDUCE_FLAGS = {1: cv2.IMREAD_COLOR,
+                2: cv2.IMREAD_REDUCED_COLOR_2,
+                4: cv2.IMREAD_REDUCED_COLOR_4,
+                8: cv2.IMREAD_REDUCED_COLOR_8}
+READ_CHUNK = 65536
+
+
+class MjpegParser:
+    '''
+    Incremental multipart/x-mixed-replace parser. feed() bytes as they
+    arrive and it returns the list of complete jpeg parts found. Parts with
+    a Content-Length header are cut by length, others at the next boundary.
+    '''
+
+    def __init__(self, boundary):
+        boundary = boundary.strip('"')
+        if not boundary.startswith("--"):
+            boundary = "--" + boundary
+        self.boundary = boundary.encode()
+        self.buf = bytearray()
+        self.length = None    # Content-Length of the part being read
+        self.in_body = False
+
+    def feed(self, data):
+        self.buf += data
+        parts = []
+        while True:
+            if not self.in_body:
+                start = self.buf.find(self.boundary)
+                if start < 0:
+                    # keep a tail in case the boundary is split across reads
+                    del self.buf[:max(0, len(self.buf) - len(self.boundary))]
+                    return parts
+                head_end = self.buf.find(b"\r\n\r\n", start)
+                if head_end < 0:
+                    del self.buf[:start]
+                    return parts
+                self.length = None
+                for line in bytes(self.buf[start:head_end]).split(b"\r\n")[1:]:
+                    name, _, value = line.partition(b":")
+                    if name.strip().lower() == b"content-length":
+                        try:
+                            self.length = int(value.strip())
+                        except ValueError:
+                            pass
+                del self.buf[:head_end + 4]
+                self.in_body = True
+            if self.length is not None:
+                if len(self.buf) < self.length:
+                    return parts
+                parts.append(bytes(self.buf[:self.length]))
+                del self.buf[:self.length]
+            else:
+                end = self.buf.find(self.boundary)
+                if end < 0:
+                    return parts
+                parts.append(bytes(self.buf[:end]).rstrip(b"\r\n"))
+                del self.buf[:end]
+            self.in_body = False
+
+
+class CamStream(RingReader):
+    '''
+    Read an http MJPEG stream or snapshot url and put decoded frames in
+    the ring. Reconnects with backoff like strmusbipcam.
+    '''
+
+    def __init__(self,
+                 src="http://localhost:8080/stream.mjpg",
+                 reduce=1,
+                 framerate=10,
+                 ring_size=4,
+                 pool_size=0,
+                 stall_sec=3.0,
+                 backoff_min_sec=0.5,
+                 backoff_max_sec=30.0,
+                 name="MjpegCamStream"):
+        self.src = src
+        self.name = name
+        self.reduce_flag = REDUCE_FLAGS.get(reduce, cv2.IMREAD_COLOR)
+        if reduce not in REDUCE_FLAGS:
+            logging.warning("%s reduce=%s Not 1, 2, 4 or 8. Using 1", name, reduce)
+        self.framerate = float(framerate) if framerate else 10.0   # snapshot request rate
+        url = urlsplit(src)
+        self.https = url.scheme == "https"
+        self.host = url.hostname or "localhost"
+        self.port = url.port
+        self.path = url.path or "/"
+        if url.query:
+            self.path += "?" + url.query
+        self.headers = {"Connection": "keep-alive"}
+        if url.username:
+            auth = "%s:%s" % (url.username, url.password or "")
+            self.headers["Authorization"] = "Basic " + base64.b64encode(auth.encode()).decode()
+        self.conn = None
+        self.init_reader(ring_size, pool_size)
+        self.state = STATE_CONNECTING
+        # newest jpeg waiting for the decode thread
+        self.jpeg = None
+        self.jpeg_time = 0.0
+        self.jpeg_cond = Condition()
+
+        # reconnect settings and metrics
+        self.stall_sec = stall_sec
+        self.backoff_min_sec = backoff_min_sec
+        self.backoff_max_sec = backoff_max_sec
+        self.reconnects = 0
+        self.reconnect_attempts = 0
+        self.down_sec = 0.0
+        self.http_jpegs = 0
+        self.http_dropped = 0    # jpegs replaced by a newer one before decode
+        self.http_bytes = 0
+        self.decode_errors = 0
+
+        self.thread = None
+        self.decode_thread = None
+        self.stopped = False
+        self.stop_event = Event()
+
+    def start(self, ready_timeout=5.0):
+        # start the network and decode threads and return
+        # once a frame with sane exposure is available
+        self.decode_thread = Thread(target=self.update_decode, name=self.name + "Decode", args=())
+        self.decode_thread.daemon = True
+        self.decode_thread.start()
+        self.thread = Thread(target=self.update, name=self.name, args=())
+        self.thread.daemon = True
+        self.thread.start()
+        if ready_timeout:
+            self.wait_ready(ready_timeout)
+        return self
+
+    def connect(self):
+        # open the http connection. Returns True if connected
+        if self.https:
+            conn = http.client.HTTPSConnection(self.host, self.port, timeout=self.stall_sec)
+        else:
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=self.stall_sec)
+        try:
+            conn.connect()
+        except OSError as err_msg:
+            logging.warning("%s Could Not Connect to %s:%s %s", self.name, self.host, self.port, err_msg)
+            return False
+        self.conn = conn
+        return True
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def put_jpeg(self, jpeg):
+        # hand the newest jpeg to the decode thread
+        self.http_jpegs += 1
+        with self.jpeg_cond:
+            if self.jpeg is not None:
+                self.http_dropped += 1
+            self.jpeg = jpeg
+            self.jpeg_time = time.monotonic()
+            self.jpeg_cond.notify()
+
+    def update(self):
+        # request the url and read jpegs until stopped
+        while not self.stopped:
+            if self.conn is None and not self.connect():
+                self.reconnect()
+                continue
+            try:
+                self.conn.request("GET", self.path, headers=self.headers)
+                resp = self.conn.getresponse()
+                if resp.status != 200:
+                    raise http.client.HTTPException("http status %i %s" % (resp.status, resp.reason))
+                content_type = resp.getheader("Content-Type", "")
+                if content_type.startswith("multipart/"):
+                    self.read_stream(resp, content_type)
+                else:
+                    self.read_snapshots(resp)
+            except (OSError, http.client.HTTPException) as err_msg:
+                if self.stopped:
+                    break
+                logging.warning("%s Stream Lost %s", self.name, err_msg)
+            self.close()
+            if not self.stopped:
+                self.reconnect()
+        self.close()
+        self.state = STATE_STOPPED
+        with self.jpeg_cond:
+            self.jpeg_cond.notify()
+
+    def read_stream(self, resp, content_type):
+        # parse multipart parts from the open response until it ends
+        boundary = "--"
+        for param in content_type.split(";")[1:]:
+            name, _, value = param.strip().partition("=")
+            if name.lower() == "boundary":
+                boundary = value
+        logging.info("%s MJPEG Stream %s boundary=%s", self.name, self.src, boundary)
+        parser = MjpegParser(boundary)
+        while not self.stopped:
+            data = resp.read1(READ_CHUNK)
+            if not data:
+                raise http.client.HTTPException("stream ended")
+            self.http_bytes += len(data)
+            for jpeg in parser.feed(data):
+                self.put_jpeg(jpeg)
+
+    def read_snapshots(self, resp):
+        # request the snapshot url again on the same connection at framerate
+        logging.info("%s Snapshot URL %s at %.1f fps", self.name, self.src, self.framerate)
+        interval = 1.0 / self.framerate
+        next_time = time.monotonic()
+        while not self.stopped:
+            jpeg = resp.read()
+            self.http_bytes += len(jpeg)
+            self.put_jpeg(jpeg)
+            next_time += interval
+            delay = next_time - time.monotonic()
+            if delay > 0:
+                if self.stop_event.wait(delay):
+                    break
+            else:
+                next_time = time.monotonic()  # camera is slower than framerate
+            self.conn.request("GET", self.path, headers=self.headers)
+            resp = self.conn.getresponse()
+            if resp.status != 200:
+                raise http.client.HTTPException("http status %i %s" % (resp.status, resp.reason))
+
+    def update_decode(self):
+        # decode the newest jpeg into the ring
+        while not self.stopped:
+            with self.jpeg_cond:
+                if self.jpeg is None:
+                    self.jpeg_cond.wait(1.0)
+                    continue
+                jpeg, cap_time = self.jpeg, self.jpeg_time
+                self.jpeg = None
+            if not self.decode_due(cap_time):
+                continue
+            image = cv2.imdecode(np.frombuffer(jpeg, np.uint8), self.reduce_flag)
+            if image is None:
+                self.decode_errors += 1
+                continue
+            self.put_buffer(None, image, cap_time)
+            self.state = STATE_STREAMING
+
+    def reconnect(self):
+        # wait with exponential backoff and jitter until connected or stopped
+        self.state = STATE_RECONNECTING
+        down_start = time.monotonic()
+        backoff = self.backoff_min_sec
+        attempts = 0
+        while not self.stopped:
+            if self.stop_event.wait(random.uniform(backoff / 2.0, backoff)):
+                break
+            self.reconnect_attempts += 1
+            attempts += 1
+            if self.connect():
+                self.reconnects += 1
+                logging.info("%s Reconnected after %.1f sec and %i attempts",
+                             self.name, time.monotonic() - down_start, attempts)
+                break
+            backoff = min(backoff * 2.0, self.backoff_max_sec)
+        self.down_sec += time.monotonic() - down_start
+
+    def health(self):
+        # return current stream state per strmusbipcam STATE_ values
+        return self.state
+
+    def stats(self):
+        # frame counters plus reconnect and http metrics
+        stats = RingReader.stats(self)
+        stats.update({'state': self.state,
+                      'reconnects': self.reconnects,
+                      'reconnect_attempts': self.reconnect_attempts,
+                      'down_sec': self.down_sec,
+                      'http_jpegs': self.http_jpegs,
+                      'http_dropped': self.http_dropped,
+                      'http_bytes': self.http_bytes,
+                      'decode_errors': self.decode_errors})
+        return stats
+
+    def stop(self, timeout=3.0):
+        # indicate that the threads should be stopped and unblock the read
+        self.stopped = True
+        self.stop_event.set()
+        conn = self.conn
+        if conn is not None and conn.sock is not None:
+            try:
+                conn.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        self.join_thread(timeout)
+        self.decode_thread.join(timeout)
+
+
+def serve_test_camera(port=8080, size=(320, 240), framerate=15):
+    '''
+    Stand-in http camera for testing. Serves simcam frames as
+    /stream.mjpg (multipart) and /snapshot.jpg
+    '''
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from strmsimcam import CamStream as SimCamStream
+    sim = SimCamStream(size=size, framerate=framerate, realtime=True, pool_size=0).start()
+    boundary = "speedcamframe"
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"   # keep alive for snapshot requests
+
+        def log_message(self, fmt, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.startswith("/snapshot"):
+                jpeg = cv2.imencode(".jpg", sim.read())[1].tobytes()
+                self.send_response(200)
+                self.send_header("Content-Type", "image/jpeg")
+                self.send_header("Content-Length", str(len(jpeg)))
+                self.end_headers()
+                self.wfile.write(jpeg)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "multipart/x-mixed-replace; boundary=" + boundary)
+            self.send_header("Connection", "close")
+            self.end_headers()
+            seq = 0
+            try:
+                while True:
+                    frame = sim.ring.wait_newer(seq, 2.0)
+                    if frame is None:
+                        continue
+                    seq = frame.seq
+                    jpeg = cv2.imencode(".jpg", frame.image)[1].tobytes()
+                    self.wfile.write(("--%s\r\nContent-Type: image/jpeg\r\n"
+                                      "Content-Length: %i\r\n\r\n" % (boundary, len(jpeg))).encode())
+                    self.wfile.write(jpeg)
+                    self.wfile.write(b"\r\n")
+            except OSError:
+                pass
+            self.close_connection = True
+
+    server = ThreadingHTTPServer(("", port), Handler)
+    server.daemon_threads = True
+    logging.info("Test Camera http://localhost:%i/stream.mjpg and /snapshot.jpg", port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("")
+    server.server_close()
+    sim.stop()
+
+
+if __name__ == "__main__":
+    import sys
+    logging.basicConfig(level=logging.INFO,
+                        format="%(asctime)s %(levelname)-8s %(funcName)-10s %(message)s",
+                        datefmt="%Y-%m-%d %H:%M:%S")
+    if len(sys.argv) > 1 and sys.argv[1] == "serve":
+        serve_test_camera()
+        sys.exit(0)
+    test_src = sys.argv[1] if len(sys.argv) > 1 else "http://localhost:8080/stream.mjpg"
+    test_reduce = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    vs = CamStream(src=test_src, reduce=test_reduce).start()
+    start_time = time.monotonic()
+    shape = None
+    while time.monotonic() - start_time < 10.0:
+        frame = vs.read_next(timeout=1.0)
+        if frame is not None:
+            shape = frame.image.shape
+    vs.stop()
+    stats = vs.stats()
+    print("Read %.1f fps  jpegs=%i dropped=%i shape=%s"
+          % (stats['read'] / 10.0, stats['http_jpegs'], stats['http_dropped'],
+             shape))
@@ -0,0 +1,392 @@
+# Network camera stream. Lets a low powered capture node eg Pi Zero send
+# frames over TCP to a central speed-cam.py that does the motion analysis.
+#
+# Capture node (sender)  runs  python3 strmnetcam.py
+#   Opens the local camera per its own config.py CAMERA setting and listens
+#   on NETCAM_PORT for one receiver at a time. Ships only the motion crop
+#   area (ROI) requested by the receiver plus a full frame every
+#   NETCAM_FULL_FRAME_SEC so the receiver image stays current.
+#
+# Central analyzer (receiver)  config.py CAMERA = "netcam"
+#   NETCAM_SRC = "host:port" of the capture node. CamStream below rebuilds
+#   full size frames by pasting each ROI onto the last full frame.
+#
+# Every message carries the sender frame seq and capture timestamp so speed
+# timing is from the capture node clock, not network arrival time.
+# Nothing is queued. The sender always sends the newest camera frame so if
+# the network or receiver is slow frames are dropped, not buffered.
+#
+# Message layout (little endian)
+#   receiver -> sender  ROI_MSG      magic, x, y, w, h     w=0 means full frames only
+#   sender -> receiver  FRAME_HEADER then payload_len bytes of jpg or raw image
+
+import logging
+import random
+import select
+import socket
+import struct
+import time
+from threading import Thread, Event, Lock
+import cv2
+import numpy as np
+from strmframe import RingReader
+from strmusbipcam import (STATE_CONNECTING, STATE_STREAMING,
+                          STATE_RECONNECTING, STATE_STOPPED)
+
+NET_MAGIC = 0x4e435053   # 'SPCN'
+# magic, kind, channels, encoding, seq, timestamp, full_w, full_h, x, y, w, h, payload_len
+FRAME_HEADER = struct.Struct('<IBBBxQdHHHHHHI')
+ROI_MSG = struct.Struct('<IHHHH')
+KIND_FULL = 0
+KIND_ROI = 1
+ENC_RAW = 0
+ENC_JPG = 1
+
+
+def recv_exact(sock, view):
+    '''Fill memoryview view from sock. Raises ConnectionError if closed'''
+    got = 0
+    while got < len(view):
+        count = sock.recv_into(view[got:])
+        if count == 0:
+            raise ConnectionError("connection closed")
+        got += count
+
+
+def parse_src(src, port=8765):
+    '''Return (host, port) from a "host:port" string'''
+    host, _, port_str = src.rpartition(':')
+    if not host:
+        return port_str, port
+    return host, int(port_str)
+
+
+class NetCamSender:
+    '''
+    Send frames from a local CamStream to one NetCam receiver at a time.
+    jpg_quality=0 sends raw pixels (more bandwidth, less cpu).
+    '''
+
+    def __init__(self, vs, port=8765, full_frame_sec=5.0, jpg_quality=80):
+        self.vs = vs
+        self.port = port
+        self.full_frame_sec = full_frame_sec
+        self.jpg_quality = jpg_quality
+        self.roi = None          # (x, y, w, h) requested by the receiver
+        self.stopped = False
+        self.sent = 0
+        self.sent_full = 0
+        self.sent_bytes = 0
+
+    def serve(self):
+        '''Accept receivers and send frames until stopped'''
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server.bind(('', self.port))
+        server.listen(1)
+        server.settimeout(1.0)
+        logging.info("NetCam Sender Listening on Port %i", self.port)
+        while not self.stopped:
+            try:
+                conn, addr = server.accept()
+            except socket.timeout:
+                continue
+            logging.info("NetCam Receiver Connected from %s:%i", addr[0], addr[1])
+            try:
+                self.send_frames(conn)
+            except (OSError, ConnectionError) as err_msg:
+                logging.warning("NetCam Receiver %s Disconnected %s", addr[0], err_msg)
+            conn.close()
+            logging.info("NetCam sent=%i full=%i MB=%.1f camera missed=%i",
+                         self.sent, self.sent_full, self.sent_bytes / 1048576.0,
+                         self.vs.stats()['missed'])
+        server.close()
+
+    def send_frames(self, conn):
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        conn.settimeout(5.0)   # drop a stuck receiver rather than wait forever
+        self.roi = None
+        last_full = None
+        roi_buf = bytearray(ROI_MSG.size)
+        while not self.stopped:
+            if select.select([conn], [], [], 0)[0]:
+                recv_exact(conn, memoryview(roi_buf))
+                magic, x, y, w, h = ROI_MSG.unpack(roi_buf)
+                if magic != NET_MAGIC:
+                    raise ConnectionError("bad roi message")
+                self.roi = (x, y, w, h) if w and h else None
+                logging.info("NetCam Receiver ROI %s", self.roi)
+            # newest frame not yet sent. Frames captured while the last
+            # send was blocked are skipped by the stream ring
+            frame = self.vs.read_next(timeout=1.0)
+            if frame is None:
+                continue
+            image = frame.image
+            full_h, full_w = image.shape[:2]
+            kind = KIND_FULL
+            x, y = 0, 0
+            if (self.roi is not None and last_full is not None and
+                    frame.timestamp - last_full < self.full_frame_sec):
+                x, y, w, h = self.roi
+                image = image[y:y + h, x:x + w]
+                kind = KIND_ROI
+            else:
+                last_full = frame.timestamp
+            if self.jpg_quality > 0:
+                encoding = ENC_JPG
+                payload = cv2.imencode('.jpg', image,
+                                       [cv2.IMWRITE_JPEG_QUALITY, self.jpg_quality])[1].data
+            else:
+                encoding = ENC_RAW
+                image = np.ascontiguousarray(image)
+                payload = image.data
+            height, width = image.shape[:2]
+            channels = 1 if image.ndim == 2 else image.shape[2]
+            header = FRAME_HEADER.pack(NET_MAGIC, kind, channels, encoding,
+                                       frame.seq, frame.timestamp, full_w, full_h,
+                                       x, y, width, height, payload.nbytes)
+            conn.sendall(header)
+            conn.sendall(payload)
+            self.sent += 1
+            self.sent_bytes += FRAME_HEADER.size + payload.nbytes
+            if kind == KIND_FULL:
+                self.sent_full += 1
+
+    def stop(self):
+        self.stopped = True
+
+
+class CamStream(RingReader):
+    '''
+    Receive frames from a NetCamSender and put rebuilt full size
+    frames in the ring. Reconnects with backoff like strmusbipcam.
+    '''
+
+    def __init__(self,
+                 src="localhost:8765",
+                 size=(320, 240),
+                 ring_size=4,
+                 pool_size=8,
+                 stall_sec=3.0,
+                 backoff_min_sec=0.5,
+                 backoff_max_sec=30.0,
+                 name="NetCamStream"):
+        self.src = src
+        self.size = size
+        self.name = name
+        self.host, self.port = parse_src(src)
+        self.init_reader(ring_size, pool_size)
+        self.state = STATE_CONNECTING
+        self.sock = None
+        self.sock_lock = Lock()    # set_roi() sends from the caller thread
+        self.roi = None
+        self.canvas = None         # last full frame with the newest ROI pasted in
+        self.clock_offset = 0.0    # add to sender timestamps for local monotonic time
+        self.framerate = 30.0
+
+        # reconnect settings and metrics
+        self.stall_sec = stall_sec
+        self.backoff_min_sec = backoff_min_sec
+        self.backoff_max_sec = backoff_max_sec
+        self.reconnects = 0
+        self.reconnect_attempts = 0
+        self.down_sec = 0.0
+        self.net_full = 0
+        self.net_roi = 0
+        self.net_missed = 0        # sender frames never received
+        self.net_bytes = 0
+
+        self.thread = None
+        self.stopped = False
+        self.stop_event = Event()
+
+    def start(self, ready_timeout=5.0):
+        # start the thread to receive frames and return
+        # once the first full frame has arrived
+        self.thread = Thread(target=self.update, name=self.name, args=())
+        self.thread.daemon = True
+        self.thread.start()
+        if ready_timeout:
+            self.wait_ready(ready_timeout)
+        return self
+
+    def connect(self):
+        # returns True if connected to the sender
+        try:
+            sock = socket.create_connection((self.host, self.port), timeout=self.stall_sec)
+        except OSError as err_msg:
+            logging.warning("%s Could Not Connect to %s %s", self.name, self.src, err_msg)
+            return False
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        # the sender always has a frame to send so silence means a stall
+        sock.settimeout(self.stall_sec)
+        with self.sock_lock:
+            self.sock = sock
+            self.send_roi()
+        self.canvas = None
+        self.clock_offset = None
+        logging.info("%s Connected to %s", self.name, self.src)
+        return True
+
+    def close(self):
+        with self.sock_lock:
+            if self.sock is not None:
+                self.sock.close()
+                self.sock = None
+
+    def set_roi(self, x_left, x_right, y_upper, y_lower):
+        '''
+        Ask the sender for only this area of each frame between full
+        frames. Call with the speed-cam motion crop settings.
+        '''
+        self.roi = (x_left, y_upper, x_right - x_left, y_lower - y_upper)
+        with self.sock_lock:
+            self.send_roi()
+
+    def send_roi(self):
+        # caller holds sock_lock
+        if self.sock is None:
+            return
+        x, y, w, h = self.roi if self.roi else (0, 0, 0, 0)
+        try:
+            self.sock.sendall(ROI_MSG.pack(NET_MAGIC, x, y, w, h))
+        except OSError:
+            pass  # receive loop will notice and reconnect
+
+    def update(self):
+        header_buf = bytearray(FRAME_HEADER.size)
+        payload_buf = bytearray(1024 * 64)
+        last_seq = 0
+        while not self.stopped:
+            if self.sock is None and not self.connect():
+                self.reconnect()
+                continue
+            try:
+                recv_exact(self.sock, memoryview(header_buf))
+                (magic, kind, channels, encoding, seq, timestamp,
+                 full_w, full_h, x, y, w, h, payload_len) = FRAME_HEADER.unpack(header_buf)
+                if magic != NET_MAGIC:
+                    raise ConnectionError("bad frame header")
+                if payload_len > len(payload_buf):
+                    payload_buf = bytearray(payload_len)
+                payload = memoryview(payload_buf)[:payload_len]
+                recv_exact(self.sock, payload)
+            except (OSError, ConnectionError) as err_msg:
+                if self.stopped:
+                    break
+                logging.warning("%s Stream Lost %s", self.name, err_msg)
+                self.close()
+                self.reconnect()
+                continue
+            self.net_bytes += FRAME_HEADER.size + payload_len
+            if self.clock_offset is None:
+                # new connection. Keep sender frame intervals
+                # but on the local monotonic clock
+                self.clock_offset = time.monotonic() - timestamp
+                last_seq = 0
+            if last_seq and seq > last_seq + 1:
+                self.net_missed += seq - last_seq - 1
+            last_seq = seq
+            cap_time = timestamp + self.clock_offset
+            if kind == KIND_ROI and self.canvas is None:
+                continue  # wait for the first full frame
+            due = self.decode_due(cap_time)
+            if not due and kind == KIND_ROI:
+                continue  # the next ROI frame replaces the same area
+            if encoding == ENC_JPG:
+                image = cv2.imdecode(np.frombuffer(payload, np.uint8), cv2.IMREAD_UNCHANGED)
+            elif channels == 1:
+                image = np.frombuffer(payload, np.uint8).reshape(h, w)
+            else:
+                image = np.frombuffer(payload, np.uint8).reshape(h, w, channels)
+            if image is None:
+                continue
+            if kind == KIND_FULL:
+                self.net_full += 1
+                if self.canvas is None or self.canvas.shape != image.shape:
+                    self.canvas = image.copy()
+                else:
+                    self.canvas[...] = image
+            else:
+                self.net_roi += 1
+                self.canvas[y:y + h, x:x + w] = image
+            if not due:
+                # idle or stride. Full frame only keeps the area outside the ROI current
+                continue
+            buf = self.get_buffer(self.canvas.shape)
+            if buf is None:
+                out = self.canvas.copy()
+            else:
+                np.copyto(buf, self.canvas)
+                out = buf
+            self.put_buffer(buf, out, cap_time)
+            self.state = STATE_STREAMING
+        self.close()
+        self.state = STATE_STOPPED
+
+    def reconnect(self):
+        # wait with exponential backoff and jitter until connected or stopped
+        self.state = STATE_RECONNECTING
+        down_start = time.monotonic()
+        backoff = self.backoff_min_sec
+        attempts = 0
+        while not self.stopped:
+            if self.stop_event.wait(random.uniform(backoff / 2.0, backoff)):
+                break
+            self.reconnect_attempts += 1
+            attempts += 1
+            if self.connect():
+                self.reconnects += 1
+                logging.info("%s Reconnected after %.1f sec and %i attempts",
+                             self.name, time.monotonic() - down_start, attempts)
+                break
+            backoff = min(backoff * 2.0, self.backoff_max_sec)
+        self.down_sec += time.monotonic() - down_start
+
+    def health(self):
+        # return current stream state per strmusbipcam STATE_ values
+        return self.state
+
+    def stats(self):
+        # frame counters plus reconnect and network metrics
+        stats = RingReader.stats(self)
+        stats.update({'state': self.state,
+                      'reconnects': self.reconnects,
+                      'reconnect_attempts': self.reconnect_attempts,
+                      'down_sec': self.down_sec,
+                      'net_full': self.net_full,
+                      'net_roi': self.net_roi,
+                      'net_missed': self.net_missed,
+                      'net_bytes': self.net_bytes})
+        return stats
+
+    def stop(self, timeout=3.0):
+        # indicate that the thread should be stopped and unblock recv
+        self.stopped = True
+        self.stop_event.set()
+        with self.sock_lock:
+            if self.sock is not None:
+                try:
+                    self.sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+        self.join_thread(timeout)
+
+
+if __name__ == "__main__":
+    # Run on the capture node. Camera settings are per this node's config.py
+    import config
+    from strmcam import strmcam
+    NETCAM_PORT = getattr(config, 'NETCAM_PORT', 8765)
+    NETCAM_FULL_FRAME_SEC = getattr(config, 'NETCAM_FULL_FRAME_SEC', 5.0)
+    NETCAM_JPG_QUALITY = getattr(config, 'NETCAM_JPG_QUALITY', 80)
+    vs = strmcam()
+    sender = NetCamSender(vs, port=NETCAM_PORT,
+                          full_frame_sec=NETCAM_FULL_FRAME_SEC,
+                          jpg_quality=NETCAM_JPG_QUALITY)
+    try:
+        sender.serve()
+    except KeyboardInterrupt:
+        print("")
+        logging.info("User Pressed Keyboard ctrl-c")
+    vs.stop(getattr(config, 'CAM_STOP_TIMEOUT_SEC', 3.0))
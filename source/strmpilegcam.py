@@ -3,18 +3,58 @@
 # Import required libraries
 import sys
 import time
-from picamera.array import PiRGBArray
+import io
+import numpy as np
+from picamera.array import PiRGBArray, raw_resolution
 from picamera import PiCamera
 from threading import Thread
+from strmframe import RingReader
 
 # ------------------------------------------------------------------------------
-class CamStream:
+class PoolRGBArray(PiRGBArray):
+    """
+    PiRGBArray that copies each captured frame into a recycled
+    FramePool buffer of cam_stream instead of allocating a new array.
+    Frames that cam_stream.decode_due() skips while idle or striding
+    are not copied. due and cap_time are for the last frame
+    """
+    def __init__(self, camera, size, cam_stream):
+        super(PoolRGBArray, self).__init__(camera, size=size)
+        self.cam_stream = cam_stream
+        self.due = False
+        self.cap_time = 0.0
+
+    def flush(self):
+        io.BytesIO.flush(self)
+        self.cap_time = time.monotonic()
+        self.due = self.cam_stream.decode_due(self.cap_time)
+        if not self.due:
+            self.array = None
+            return
+        width, height = self.size
+        fwidth, fheight = raw_resolution(self.size)
+        buf = self.cam_stream.get_buffer((height, width, 3))
+        view = self.getbuffer()
+        try:
+            # raw frame rows and columns are padded. Copy the image area only
+            raw = np.frombuffer(view, dtype=np.uint8, count=fwidth * fheight * 3)
+            np.copyto(buf, raw.reshape((fheight, fwidth, 3))[:height, :width])
+            del raw
+        finally:
+            view.release()  # BytesIO can not be truncated while viewed
+        self.array = buf
+
+
+# ------------------------------------------------------------------------------
+class CamStream(RingReader):
     def __init__(self,
                  size=(320, 257),
                  framerate=30,
                  rotation=0,
                  hflip=False,
                  vflip=False,
+                 ring_size=4,
+                 pool_size=8,
                  **kwargs
                 ):
         """initialize the camera and stream"""
@@ -35,7 +75,11 @@ class CamStream:
         for (arg, value) in kwargs.items():
             setattr(self.camera, arg, value)
 
-        self.rawCapture = PiRGBArray(self.camera, size=self.size)
+        self.init_reader(ring_size, pool_size)  # recent frames from update thread
+        if self.pool is not None:
+            self.rawCapture = PoolRGBArray(self.camera, self.size, self)
+        else:
+            self.rawCapture = PiRGBArray(self.camera, size=self.size)
         self.stream = self.camera.capture_continuous(self.rawCapture,
                                                      format="bgr",
                                                      use_video_port=True)
@@ -45,35 +89,46 @@ class CamStream:
         if the thread should be stopped
         """
         self.thread = None
-        self.frame = None
         self.stopped = False
 
-    def start(self):
-        """start the thread to read frames from the video stream"""
+    def start(self, ready_timeout=5.0):
+        """
+        start the thread to read frames from the video stream and return
+        once a frame with settled exposure is available
+        """
         self.thread = Thread(target=self.update, args=())
         self.thread.daemon = True
         self.thread.start()
+        if ready_timeout:
+            self.wait_ready(ready_timeout)
         return self
 
     def update(self):
         """keep looping infinitely until the thread is stopped"""
-        while True:
-            for f in self.stream:
-                self.frame = f.array # grab the frame from the stream
-                # clear the stream in preparation for next frame
-                self.rawCapture.truncate(0)
+        for f in self.stream:
+            # grab the frame from the stream. While idle only
+            # keep frames at the idle rate.
+            if self.pool is not None:
+                # PoolRGBArray already checked decode_due() before copying
+                cap_time = self.rawCapture.cap_time
+                due = self.rawCapture.due
+            else:
+                cap_time = time.monotonic()
+                due = self.decode_due(cap_time)
+            if due:
+                self.ring.put(f.array, cap_time)
+            # clear the stream in preparation for next frame
+            self.rawCapture.truncate(0)
             if self.stopped:
-                self.stream.close()
-                self.rawCapture.close()
-                self.camera.close()
-                if self.thread is not None:
-                    self.thread.join()
-                return
-
-    def read(self):
-        """return the frame most recently read"""
-        return self.frame
+                break
+        self.stream.close()
+        self.rawCapture.close()
+        self.camera.close()
 
-    def stop(self):
-        """indicate that the thread should be stopped"""
+    def stop(self, timeout=3.0):
+        """
+        indicate that the thread should be stopped and wait for it
+        to close the camera
+        """
         self.stopped = True
+        self.join_thread(timeout)
@@ -1,16 +1,20 @@
 # Written by Claude Pageau Feb-2025
 # Import required libraries
-from picamera2 import Picamera2
+from picamera2 import Picamera2, MappedArray
 from libcamera import Transform
 import time
 import sys
+import logging
+import numpy as np
 from threading import Thread
+from strmframe import RingReader
 
-class CamStream:
+class CamStream(RingReader):
     '''
     Create a picamera2 libcamera in memory image stream that
     runs in a Thread (Bullseye or later)
     returns image array when read() called
+    or a Frame (image, seq, timestamp) when read_frame() called
 
     sample implementation for your python script.
     Note pilibcamstream.py must be in same folder as your script.
@@ -23,11 +27,12 @@ class CamStream:
         # add code to process stream image arrays.
     '''
 
-    def __init__(self, size=(320, 248), vflip=False, hflip=False):
+    def __init__(self, size=(320, 248), vflip=False, hflip=False, ring_size=4, pool_size=8):
         self.size = size
         self.vflip = vflip
         self.hflip = hflip
         self.retries = 4
+        open_time = time.monotonic()
         while self.retries > 0:
             self.retries -= 1
             if self.retries < 1:
@@ -74,7 +79,7 @@ Wait ...
             break
 
         self.picam2.start()
-        time.sleep(2) # Allow camera time to warm up
+        logging.info("%s Opened in %.2f sec", __name__, time.monotonic() - open_time)
         try:
             self.picam2.set_controls({"AfMode": 0, "LensPosition": 1})   # turns off autofocus
         except RuntimeError:
@@ -82,32 +87,59 @@ Wait ...
 
         # initialize variables
         self.thread = None  # Initialize Thread variable
-        self.frame = None   # Initialize frame array var as None
+        self.init_reader(ring_size, pool_size)  # recent frames from update thread
         self.stopped = False  # Indicate if Thread is to be stopped
 
-    def start(self):
-        '''start the thread to read frames from the video stream'''
+    def start(self, ready_timeout=5.0):
+        '''
+        start the thread to read frames from the video stream and return
+        once a frame with settled exposure is available (replaces warm up sleep)
+        '''
         self.thread = Thread(target=self.update, args=())
         self.thread.daemon = True
         self.thread.start()
+        if ready_timeout:
+            self.wait_ready(ready_timeout)
         return self
 
     def update(self):
-        '''keep looping infinitely until the thread is stopped'''
-        while True:
-            # if the thread indicator variable is set,
-            # release camera resources and stop the thread
-            if self.stopped:
-                return
-            time.sleep(0.001) # Slow down loop a little
+        '''capture frames into the ring until the thread is stopped'''
+        while not self.stopped:
+            try:
+                request = self.picam2.capture_request()
+            except RuntimeError:
+                time.sleep(0.01)  # camera closing or busy
+                continue
+            cap_time = time.monotonic()
+            try:
+                # only copy the buffer to an array if not idling
+                if self.decode_due(cap_time):
+                    self.copy_request(request, cap_time)
+            finally:
+                request.release()
 
-    def read(self):
-        '''return the frame array data'''
-        self.frame = self.picam2.capture_array("main")
-        return self.frame
+    def copy_request(self, request, cap_time):
+        '''
+        Copy the request image into a recycled pool buffer
+        or a new array if the pool is disabled or the size changed
+        '''
+        buf = self.get_buffer(self.frame_shape)
+        if buf is None:
+            image = request.make_array("main")
+        else:
+            with MappedArray(request, "main") as mapped:
+                if mapped.array.shape == buf.shape:
+                    np.copyto(buf, mapped.array)
+                    image = buf
+                else:
+                    image = mapped.array.copy()
+        self.frame_shape = image.shape
+        self.put_buffer(buf, image, cap_time)
 
-    def stop(self):
+    def stop(self, timeout=3.0):
         '''Stop lib camera and thread'''
-        self.picam2.close()  # Close Camera
-        time.sleep(4)  # allow camera time to released
         self.stopped = True
+        self.join_thread(timeout)
+        release_time = time.monotonic()
+        self.picam2.close()  # Close Camera. Returns when camera is released
+        logging.info("%s Released in %.2f sec", __name__, time.monotonic() - release_time)
@@ -0,0 +1,240 @@
+# Shared memory frame bus for camera stream frames
+# Lets other local processes eg speed-web.py or alignment tools read the
+# live camera frames without opening the camera or re-encoding JPEGs.
+# Requires python 3.8 or later for multiprocessing.shared_memory
+#
+# Layout of the shared memory block
+#   bus header   magic, slots, slot_bytes, latest seq
+#   slot header  seq, timestamp, height, width, channels  (one per slot)
+#   slot data    slot_bytes of uint8 image data           (one per slot)
+#
+# The writer sets a slot seq to 0 while it copies image data then writes
+# the real seq. Readers check the slot seq before and after using the data
+# so a frame overwritten while it was being read is detected and dropped.
+#
+# sample implementation for a reader in another python script
+# -----------------------------------------------------------
+#    from strmshm import FrameBusReader
+#    bus = FrameBusReader("speed-cam")
+#    frame = bus.read_next(timeout=2.0)  # Frame(image, seq, timestamp) or None
+#    if frame is not None:
+#        cv2.imwrite("snapshot.jpg", frame.image)
+#    bus.close()
+
+import logging
+import struct
+import sys
+import time
+from threading import Thread
+import numpy as np
+from multiprocessing import shared_memory
+from strmframe import Frame
+
+BUS_MAGIC = 0x53504344    # 'SPCD'
+BUS_HEADER = struct.Struct('<IIQQ')      # magic, slots, slot_bytes, latest_seq
+SLOT_HEADER = struct.Struct('<QdIII4x')  # seq, timestamp, height, width, channels
+
+
+class FrameBusWriter:
+    '''
+    Create a named shared memory ring with room for slots images
+    of up to slot_bytes each. publish() copies a frame into the next slot.
+    '''
+
+    def __init__(self, name, slot_bytes, slots=4):
+        self.name = name
+        self.slots = slots
+        self.slot_bytes = int(slot_bytes)
+        size = (BUS_HEADER.size + slots * SLOT_HEADER.size +
+                slots * self.slot_bytes)
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # left over from a process that did not exit cleanly
+            old = shared_memory.SharedMemory(name=name)
+            old.close()
+            old.unlink()
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        self.buf = self.shm.buf
+        self.data_offset = BUS_HEADER.size + slots * SLOT_HEADER.size
+        BUS_HEADER.pack_into(self.buf, 0, BUS_MAGIC, slots, self.slot_bytes, 0)
+
+    def publish(self, frame):
+        '''Copy Frame image into the bus. Returns False if it does not fit'''
+        image = frame.image
+        if image.nbytes > self.slot_bytes:
+            return False
+        if image.ndim == 2:
+            height, width = image.shape
+            channels = 1
+        else:
+            height, width, channels = image.shape
+        slot = frame.seq % self.slots
+        hdr_offset = BUS_HEADER.size + slot * SLOT_HEADER.size
+        data_offset = self.data_offset + slot * self.slot_bytes
+        # mark slot as being written, copy data, then publish the seq
+        SLOT_HEADER.pack_into(self.buf, hdr_offset, 0, 0.0, 0, 0, 0)
+        dst = np.ndarray(image.shape, dtype=np.uint8,
+                         buffer=self.buf, offset=data_offset)
+        dst[...] = image
+        SLOT_HEADER.pack_into(self.buf, hdr_offset, frame.seq, frame.timestamp,
+                              height, width, channels)
+        struct.pack_into('<Q', self.buf, 16, frame.seq)
+        return True
+
+    def close(self):
+        '''Release and remove the shared memory block'''
+        self.buf = None
+        self.shm.close()
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class FrameBusReader:
+    '''
+    Attach to a FrameBusWriter shared memory ring by name.
+    read_frame(copy=False) returns a zero copy view. Use frame_valid()
+    after processing a view to confirm it was not overwritten meanwhile.
+    '''
+
+    def __init__(self, name):
+        self.shm = attach_shm(name)
+        self.buf = self.shm.buf
+        magic, self.slots, self.slot_bytes, _ = BUS_HEADER.unpack_from(self.buf, 0)
+        if magic != BUS_MAGIC:
+            self.shm.close()
+            raise ValueError("%s is not a speed camera frame bus" % name)
+        self.data_offset = BUS_HEADER.size + self.slots * SLOT_HEADER.size
+        self.last_seq = 0
+
+    def latest_seq(self):
+        return struct.unpack_from('<Q', self.buf, 16)[0]
+
+    def slot_seq(self, seq):
+        hdr_offset = BUS_HEADER.size + (seq % self.slots) * SLOT_HEADER.size
+        return struct.unpack_from('<Q', self.buf, hdr_offset)[0]
+
+    def read_frame(self, copy=True):
+        '''Return the newest Frame or None if not available'''
+        seq = self.latest_seq()
+        if seq == 0:
+            return None
+        slot = seq % self.slots
+        hdr_offset = BUS_HEADER.size + slot * SLOT_HEADER.size
+        slot_seq, timestamp, height, width, channels = SLOT_HEADER.unpack_from(
+            self.buf, hdr_offset)
+        if slot_seq != seq:
+            return None  # being overwritten
+        if channels == 1:
+            shape = (height, width)
+        else:
+            shape = (height, width, channels)
+        image = np.ndarray(shape, dtype=np.uint8, buffer=self.buf,
+                           offset=self.data_offset + slot * self.slot_bytes)
+        if copy:
+            image = image.copy()
+            if self.slot_seq(seq) != seq:
+                return None  # overwritten during the copy
+        self.last_seq = seq
+        return Frame(image, seq, timestamp)
+
+    def read_next(self, timeout=1.0, copy=True, poll_sec=0.005):
+        '''Poll until a frame newer than the last one read is available'''
+        end_time = time.monotonic() + timeout
+        while True:
+            if self.latest_seq() > self.last_seq:
+                frame = self.read_frame(copy)
+                if frame is not None:
+                    return frame
+            if time.monotonic() > end_time:
+                return None
+            time.sleep(poll_sec)
+
+    def frame_valid(self, frame):
+        '''True if a zero copy frame has not been overwritten'''
+        return self.slot_seq(frame.seq) == frame.seq
+
+    def close(self):
+        self.buf = None
+        self.shm.close()
+
+
+class FrameBusPublisher:
+    '''
+    Thread that copies each new frame from a CamStream ring
+    into a FrameBusWriter. Waits on the ring directly so the
+    CamStream reader sequence is not affected.
+    '''
+
+    def __init__(self, vs, name="speed-cam", slots=4):
+        self.vs = vs
+        self.name = name
+        self.slots = slots
+        self.writer = None
+        self.published = 0
+        self.stopped = False
+        self.thread = None
+
+    def start(self):
+        self.thread = Thread(target=self.update, name="FrameBusPublisher", args=())
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def update(self):
+        seq = 0
+        while not self.stopped:
+            # hold the frame so a pool buffer is not recycled during the copy
+            frame = self.vs.ring.wait_newer(seq, timeout=1.0, hold=True)
+            if frame is None:
+                continue
+            seq = frame.seq
+            if self.writer is None:
+                # size slots from the first frame. Allow for a larger
+                # frame in case an IP camera changes resolution.
+                self.writer = FrameBusWriter(self.name, frame.image.nbytes * 2, self.slots)
+                logging.info("Publishing frames to shared memory %s %i slots",
+                             self.name, self.slots)
+            if self.writer.publish(frame):
+                self.published += 1
+            if self.vs.ring.pool is not None:
+                self.vs.ring.pool.release(frame.image)
+        if self.writer is not None:
+            self.writer.close()
+
+    def stop(self):
+        self.stopped = True
+        if self.thread is not None:
+            self.thread.join()
+
+
+def attach_shm(name):
+    '''
+    Attach to an existing shared memory block without letting
+    this process's resource tracker unlink it on exit.
+    '''
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, "shared_memory")
+    except Exception:
+        pass
+    return shm
+
+
+if __name__ == "__main__":
+    # Save a snapshot of the current frame from a running speed-cam.py
+    import cv2
+    bus_name = sys.argv[1] if len(sys.argv) > 1 else "speed-cam"
+    bus = FrameBusReader(bus_name)
+    frame = bus.read_next(timeout=5.0)
+    if frame is None:
+        print("No frames published on %s" % bus_name)
+        sys.exit(1)
+    cv2.imwrite("shm_snapshot.jpg", frame.image)
+    print("Saved shm_snapshot.jpg seq=%i shape=%s" % (frame.seq, str(frame.image.shape)))
+    bus.close()
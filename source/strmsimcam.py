@@ -0,0 +1,416 @@
+# Synthetic camera stream for testing and benchmarks without a camera.
+# Renders textured vehicle sprites crossing the motion crop area at known
+# speeds with optional sensor noise and lighting drift. Each vehicle is
+# recorded as ground truth and speed-cam.py reports its measured speed back
+# with check_speed() so accuracy is checked automatically.
+#
+# Speeds are in speed-cam units (kph or mph per MO_SPEED_MPH_ON) and are
+# converted to pixels per second with the same CAL_OBJ_PX / CAL_OBJ_MM
+# calibration speed-cam.py uses, so a perfect tracker reports exactly the
+# simulated speed.
+#
+# lanes=2 runs two lanes through the crop area at the same time, L2R in the
+# upper lane and R2L in the lower one, for testing MO_MULTI_TRACK_ON.
+#
+# realtime=False (default) delivers every frame in lockstep with the reader
+# and frame timestamps are exact multiples of 1/framerate, so runs are
+# repeatable. realtime=True paces frames like a live camera.
+#
+# Ground truth and measured speeds are saved to truth_path. The start
+# position and size of each vehicle give speed_bench.py its box in any
+# frame. Show a summary
+#    python3 strmsimcam.py compare
+# Show frame render rate
+#    python3 strmsimcam.py
+
+import csv
+import logging
+import math
+import os
+import time
+from threading import Thread, Event
+import cv2
+import numpy as np
+from strmframe import RingReader
+from speed_calc import speed_conv
+
+TRUTH_FIELDS = ['id', 'direction', 'speed', 'px_per_sec', 'enter_time', 'exit_time', 'measured', 'tracks',
+                'center_y', 'start_time', 'start_x', 'y', 'width', 'height']
+
+
+def speed_to_px_sec(speed, cal_obj_px, cal_obj_mm, mph=False):
+    '''Invert the speed-cam.py px/sec to speed conversion'''
+    return speed / speed_conv(cal_obj_px, cal_obj_mm, mph)
+
+
+class CamStream(RingReader):
+    '''
+    Generate frames of synthetic vehicles. One vehicle per lane crosses at
+    a time, cycling through speeds and alternating direction (or lane
+    direction if lanes > 1) if directions="both".
+    ground_truth is a list of dicts per TRUTH_FIELDS for finished vehicles.
+    measured is the speed reported by check_speed() or None if missed.
+    '''
+
+    def __init__(self,
+                 size=(320, 240),
+                 framerate=30,
+                 speeds=(30, 45, 60),
+                 directions="both",
+                 obj_size=(60, 30),
+                 gap_sec=2.0,
+                 lanes=1,
+                 noise=4,
+                 light_change=0.2,
+                 light_period_sec=30.0,
+                 crop=None,
+                 cal=(80, 4700, 85, 4700),
+                 mph=False,
+                 realtime=False,
+                 truth_path=None,
+                 seed=1,
+                 ring_size=4,
+                 pool_size=8,
+                 name="SimCamStream"):
+        self.size = size
+        self.framerate = float(framerate)
+        self.speeds = list(speeds)
+        self.directions = directions
+        self.gap_sec = gap_sec
+        self.light_change = light_change
+        self.light_period_sec = light_period_sec
+        self.realtime = realtime
+        self.truth_path = truth_path
+        self.cal = cal  # CAL_OBJ_PX_L2R, CAL_OBJ_MM_L2R, CAL_OBJ_PX_R2L, CAL_OBJ_MM_R2L
+        self.mph = mph
+        self.name = name
+        width, height = size
+        # crop = (x_left, x_right, y_upper, y_lower). Vehicles run through
+        # the middle of it. None centers vehicles in the frame
+        if crop is None:
+            crop = (0, width, 0, height)
+        self.crop = crop
+        obj_w = min(obj_size[0], width // 2)
+        crop_h = crop[3] - crop[2]
+        # leave a gap between lanes wider than the motion blur
+        obj_h = min(obj_size[1], max(4, int(crop_h * (0.8 if lanes == 1 else 0.3))))
+        self.lanes = lanes
+        self.lane_y = self.lane_positions(crop, obj_h)
+
+        rng = np.random.default_rng(seed)
+        self.background = self.make_background(rng, width, height)
+        self.sprite = self.make_sprite(rng, obj_w, obj_h)
+        # bank of noise frames split in positive and negative parts
+        # for saturating cv2.add / cv2.subtract
+        self.noise_pos = []
+        self.noise_neg = []
+        if noise > 0:
+            for _ in range(8):
+                bank = rng.normal(0, noise, (height, width, 3))
+                self.noise_pos.append(np.clip(bank, 0, 255).astype(np.uint8))
+                self.noise_neg.append(np.clip(-bank, 0, 255).astype(np.uint8))
+        # brightness lookup tables for 64 gain steps
+        self.light_steps = 64
+        levels = np.arange(256, dtype=np.float32)
+        self.light_luts = []
+        for step in range(self.light_steps):
+            gain = 1.0 + light_change * (2.0 * step / (self.light_steps - 1) - 1.0)
+            self.light_luts.append(np.clip(levels * gain, 0, 255).astype(np.uint8))
+
+        self.init_reader(ring_size, pool_size)
+        self.ground_truth = []
+        self.vehicles = [None] * lanes  # dict for the vehicle on screen per lane
+        self.vehicle_count = 0
+        # sim seconds when the next vehicle enters each lane. Lanes are staggered
+        self.next_start = [0.5 + lane * gap_sec / 2.0 for lane in range(lanes)]
+        self.frame_index = 0
+        self.written = 0         # ground_truth rows saved to truth_path
+        self.wrong_direction = 0
+        self.render_sec = 0.0    # total seconds spent rendering
+        self.consumed = Event()  # set when the reader has taken the newest frame
+        self.consumed.set()
+        self.eof = False
+        self.thread = None
+        self.stopped = False
+        if self.truth_path:
+            truth_dir = os.path.dirname(self.truth_path)
+            if truth_dir and not os.path.isdir(truth_dir):
+                os.makedirs(truth_dir)
+            with open(self.truth_path, "w") as truth_file:
+                csv.writer(truth_file).writerow(TRUTH_FIELDS)
+
+    def lane_positions(self, crop, obj_h):
+        # top y of each lane spread evenly over the crop area
+        crop_h = crop[3] - crop[2]
+        max_y = self.size[1] - obj_h
+        return [min(max_y, max(0, crop[2] + crop_h * (2 * lane + 1) // (2 * self.lanes) - obj_h // 2))
+                for lane in range(self.lanes)]
+
+    def set_roi(self, x_left, x_right, y_upper, y_lower):
+        '''
+        Run vehicles through this motion crop area. Call with the
+        speed-cam motion crop settings. Vehicles already on screen finish
+        in their lane. The vehicle size is kept.
+        '''
+        crop = (x_left, x_right, y_upper, y_lower)
+        if crop == self.crop:
+            return
+        logging.info("%s Motion Area %s", self.name, crop)
+        self.lane_y = self.lane_positions(crop, self.sprite.shape[0])
+        self.crop = crop
+
+    def make_background(self, rng, width, height):
+        # smooth random texture so the scene is not a flat colour
+        texture = rng.integers(60, 140, (height // 8 + 1, width // 8 + 1, 3), dtype=np.uint8)
+        background = cv2.resize(texture, (width, height), interpolation=cv2.INTER_LINEAR)
+        return cv2.GaussianBlur(background, (5, 5), 0)
+
+    def make_sprite(self, rng, obj_w, obj_h):
+        # vehicle body with darker window bands and a little texture
+        colour = rng.integers(150, 255, 3)
+        sprite = np.empty((obj_h, obj_w, 3), np.uint8)
+        sprite[...] = colour
+        sprite[obj_h // 5:obj_h // 2, obj_w // 5:obj_w * 2 // 5] //= 3
+        sprite[obj_h // 5:obj_h // 2, obj_w * 3 // 5:obj_w * 4 // 5] //= 3
+        sprite[-max(1, obj_h // 8):, :] //= 4   # shadow line
+        speckle = rng.integers(0, 20, sprite.shape, dtype=np.uint8)
+        return cv2.subtract(sprite, speckle)
+
+    def start(self, ready_timeout=5.0):
+        # start the thread to render frames
+        self.start_time = time.monotonic()
+        self.thread = Thread(target=self.update, name=self.name, args=())
+        self.thread.daemon = True
+        self.thread.start()
+        if ready_timeout:
+            if self.ring.wait_newer(0, ready_timeout) is None:
+                logging.warning("%s No Frames Rendered", self.name)
+        return self
+
+    def new_vehicle(self, sim_time, lane=0):
+        speed = self.speeds[self.vehicle_count % len(self.speeds)]
+        if self.directions == "both" and self.lanes > 1:
+            direction = "L2R" if lane % 2 == 0 else "R2L"
+        elif self.directions == "both":
+            direction = "L2R" if self.vehicle_count % 2 == 0 else "R2L"
+        else:
+            direction = self.directions
+        if direction == "L2R":
+            px_per_sec = speed_to_px_sec(speed, self.cal[0], self.cal[1], self.mph)
+        else:
+            px_per_sec = speed_to_px_sec(speed, self.cal[2], self.cal[3], self.mph)
+        self.vehicle_count += 1
+        # previous vehicle can no longer be measured so save it
+        self.save_truth()
+        obj_w = self.sprite.shape[1]
+        # start just outside the frame edge
+        if direction == "L2R":
+            start_x = -obj_w
+        else:
+            start_x = self.size[0]
+        return {'id': self.vehicle_count, 'direction': direction, 'speed': speed,
+                'px_per_sec': px_per_sec, 'start_time': sim_time, 'start_x': start_x,
+                'lane': lane, 'y': self.lane_y[lane],
+                'center_y': self.lane_y[lane] + self.sprite.shape[0] // 2,
+                'width': obj_w, 'height': self.sprite.shape[0],
+                'enter_time': None, 'exit_time': None, 'measured': None, 'tracks': 0}
+
+    def vehicle_x(self, vehicle, sim_time):
+        travel = (sim_time - vehicle['start_time']) * vehicle['px_per_sec']
+        if vehicle['direction'] == "L2R":
+            return vehicle['start_x'] + travel
+        return vehicle['start_x'] - travel
+
+    def render(self, out, sim_time):
+        np.copyto(out, self.background)
+        obj_h, obj_w = self.sprite.shape[:2]
+        for vehicle in self.vehicles:
+            if vehicle is None:
+                continue
+            x = int(round(self.vehicle_x(vehicle, sim_time)))
+            x1 = max(x, 0)
+            x2 = min(x + obj_w, self.size[0])
+            if x2 > x1:
+                y = vehicle['y']
+                out[y:y + obj_h, x1:x2] = self.sprite[:, x1 - x:x2 - x]
+        if self.light_change > 0:
+            phase = math.sin(2.0 * math.pi * sim_time / self.light_period_sec)
+            step = int(round((phase + 1.0) / 2.0 * (self.light_steps - 1)))
+            cv2.LUT(out, self.light_luts[step], dst=out)
+        if self.noise_pos:
+            bank = self.frame_index % len(self.noise_pos)
+            cv2.add(out, self.noise_pos[bank], dst=out)
+            cv2.subtract(out, self.noise_neg[bank], dst=out)
+
+    def track_vehicle(self, sim_time):
+        # start, update crop enter/exit times and finish vehicles
+        obj_w = self.sprite.shape[1]
+        for lane, vehicle in enumerate(self.vehicles):
+            if vehicle is None:
+                if sim_time >= self.next_start[lane]:
+                    self.vehicles[lane] = self.new_vehicle(sim_time, lane)
+                continue
+            x = self.vehicle_x(vehicle, sim_time)
+            in_crop = x + obj_w > self.crop[0] and x < self.crop[1]
+            if in_crop and vehicle['enter_time'] is None:
+                vehicle['enter_time'] = sim_time
+            elif not in_crop and vehicle['enter_time'] is not None and vehicle['exit_time'] is None:
+                vehicle['exit_time'] = sim_time
+            if x < -obj_w - 1 or x > self.size[0] + 1:
+                self.finish_vehicle(vehicle, sim_time)
+
+    def finish_vehicle(self, vehicle, sim_time):
+        if vehicle['exit_time'] is None:
+            vehicle['exit_time'] = sim_time
+        self.ground_truth.append(vehicle)
+        logging.info("%s Vehicle %i %s %.1f Finished", self.name, vehicle['id'],
+                     vehicle['direction'], vehicle['speed'])
+        self.vehicles[vehicle['lane']] = None
+        self.next_start[vehicle['lane']] = sim_time + self.gap_sec
+
+    def save_truth(self):
+        # append finished vehicles to the truth csv file
+        if self.truth_path and self.written < len(self.ground_truth):
+            with open(self.truth_path, "a") as truth_file:
+                writer = csv.writer(truth_file)
+                for vehicle in self.ground_truth[self.written:]:
+                    writer.writerow([vehicle[key] for key in TRUTH_FIELDS])
+        self.written = len(self.ground_truth)
+
+    def check_speed(self, cap_time, direction, speed, y=None):
+        '''
+        Record a speed measured by speed-cam.py from the frame captured at
+        cap_time. y is the frame y of the tracked object centre if known.
+        Returns the true speed or None if no vehicle was there.
+        '''
+        sim_time = cap_time - self.start_time
+        candidates = [v for v in self.vehicles
+                      if v is not None and v['start_time'] <= sim_time]
+        # the track can end on the frame where the vehicle finished
+        candidates.extend(v for v in self.ground_truth[-self.lanes:]
+                          if v['exit_time'] >= sim_time - 2.0 / self.framerate)
+        if not candidates:
+            return None
+        same_direction = [v for v in candidates if v['direction'] == direction]
+        if same_direction:
+            candidates = same_direction
+        if y is not None:
+            vehicle = min(candidates, key=lambda v: abs(v['center_y'] - y))
+        else:
+            vehicle = candidates[0]
+        vehicle['tracks'] += 1
+        if direction != vehicle['direction']:
+            self.wrong_direction += 1
+            logging.warning("%s Vehicle %i is %s Not %s", self.name, vehicle['id'],
+                            vehicle['direction'], direction)
+            return vehicle['speed']
+        if vehicle['measured'] is None:
+            vehicle['measured'] = round(float(speed), 2)
+        error = 100.0 * (speed - vehicle['speed']) / vehicle['speed']
+        logging.info("%s Vehicle %i %s Truth %.1f Measured %.1f Error %+.1f%%", self.name,
+                     vehicle['id'], direction, vehicle['speed'], speed, error)
+        return vehicle['speed']
+
+    def speed_errors(self):
+        '''Return a list of percent errors for finished vehicles that were measured'''
+        return [100.0 * (v['measured'] - v['speed']) / v['speed']
+                for v in self.ground_truth if v['measured'] is not None]
+
+    def update(self):
+        # render frames until stopped
+        shape = (self.size[1], self.size[0], 3)
+        while not self.stopped:
+            if not self.realtime:
+                # wait for the reader so no frame is dropped
+                if not self.consumed.wait(0.5):
+                    continue
+                self.consumed.clear()
+            sim_time = self.frame_index / self.framerate
+            cap_time = self.start_time + sim_time
+            if self.realtime:
+                delay = cap_time - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            self.track_vehicle(sim_time)
+            if not self.decode_due(cap_time):
+                self.frame_index += 1
+                self.consumed.set()
+                continue
+            render_start = time.monotonic()
+            buf = self.get_buffer(shape)
+            out = buf if buf is not None else np.empty(shape, np.uint8)
+            self.render(out, sim_time)
+            self.render_sec += time.monotonic() - render_start
+            self.put_buffer(buf, out, cap_time)
+            self.frame_index += 1
+
+    def read_frame(self, wait_new=False, timeout=1.0):
+        # return the newest Frame and let the render thread continue
+        frame = RingReader.read_frame(self, wait_new, timeout)
+        if frame is not None and frame.seq >= self.ring.seq:
+            self.consumed.set()
+        return frame
+
+    def stats(self):
+        # frame counters plus render time and vehicles finished
+        stats = RingReader.stats(self)
+        rendered = max(1, self.ring.seq)
+        errors = self.speed_errors()
+        stats.update({'vehicles': len(self.ground_truth),
+                      'measured': len(errors),
+                      'wrong_direction': self.wrong_direction,
+                      'speed_err_pct': sum(abs(e) for e in errors) / max(1, len(errors)),
+                      'render_ms': 1000.0 * self.render_sec / rendered})
+        return stats
+
+    def stop(self, timeout=3.0):
+        # indicates that the thread should be stopped
+        self.stopped = True
+        self.consumed.set()
+        self.join_thread(timeout)
+        self.save_truth()
+
+
+def read_truth(truth_path):
+    '''Return a list of (truth row dict, measured speed or None) from truth_path'''
+    results = []
+    with open(truth_path) as truth_file:
+        for row in csv.DictReader(truth_file):
+            measured = float(row['measured']) if row['measured'] else None
+            results.append((row, measured))
+    return results
+
+
+if __name__ == "__main__":
+    import sys
+    logging.basicConfig(level=logging.INFO,
+                        format="%(asctime)s %(levelname)-8s %(funcName)-10s %(message)s",
+                        datefmt="%Y-%m-%d %H:%M:%S")
+    import config
+    if len(sys.argv) > 1 and sys.argv[1] == "compare":
+        truth_path = getattr(config, 'SIMCAM_TRUTH_PATH', 'media/simcam-truth.csv')
+        results = read_truth(truth_path)
+        errors = []
+        for truth, speed in results:
+            if speed is None:
+                print("Vehicle %s %s %s  Not Detected" % (truth['id'], truth['direction'], truth['speed']))
+                continue
+            error = 100.0 * (speed - float(truth['speed'])) / float(truth['speed'])
+            errors.append(abs(error))
+            print("Vehicle %s %s %s  Measured %.2f  Error %+.1f%%"
+                  % (truth['id'], truth['direction'], truth['speed'], speed, error))
+        if errors:
+            print("Measured %i of %i  Mean Abs Error %.2f%%  Max Abs Error %.2f%%"
+                  % (len(errors), len(results), sum(errors) / len(errors), max(errors)))
+        sys.exit(0)
+    # render rate benchmark
+    size = getattr(config, 'IM_SIZE', (320, 240))
+    vs = CamStream(size=size).start()
+    start_time = time.monotonic()
+    frames = 0
+    while time.monotonic() - start_time < 5.0:
+        if vs.read_next(timeout=1.0) is not None:
+            frames += 1
+    vs.stop()
+    print("%ix%i Rendered %.1f fps  %.2f ms per frame render"
+          % (size[0], size[1], frames / (time.monotonic() - start_time), vs.stats()['render_ms']))
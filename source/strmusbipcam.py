@@ -1,53 +1,209 @@
 # Written by Claude Pageau 18 Nov 2022
 # Import required libraries
-from threading import Thread
+from threading import Thread, Event
+import logging
+import random
 import cv2
 import time
+from strmframe import RingReader
 
-class CamStream:
+# Stream health states reported by CamStream.health()
+STATE_CONNECTING = 'connecting'
+STATE_STREAMING = 'streaming'
+STATE_RECONNECTING = 'reconnecting'
+STATE_STOPPED = 'stopped'
+
+class CamStream(RingReader):
     def __init__(self,
                  src=0,
                  size=(320, 240),
+                 ring_size=4,
+                 pool_size=8,
+                 stall_sec=3.0,
+                 backoff_min_sec=0.5,
+                 backoff_max_sec=30.0,
+                 framerate=30,
+                 fourcc="",
+                 buffer_size=0,
                  name="WebcamVideoStream"):
         # initialize the video camera stream and read the first frame
         # from the stream
-        self.stream = cv2.VideoCapture(src)
-        self.stream.set(3, size[0])
-        self.stream.set(4, size[1])
-        self.framerate = 30.0  # set ip csm to CBR (constant bitrate)
+        self.src = src
+        self.size = size
+        self.name = name
+        # capture profile. fourcc eg "MJPG" or "YUYV" and buffer_size=1
+        # request low latency from the driver. ""/0 leave driver defaults.
+        # framerate is only requested with a fourcc since drivers list
+        # frame rates per pixel format
+        self.framerate = float(framerate) if framerate else 30.0
+        self.fourcc = fourcc
+        self.buffer_size = buffer_size
+        self.state = STATE_CONNECTING
+        open_time = time.monotonic()
+        self.stream = self.open_stream()
+        logging.info("%s Opened %s in %.2f sec", name, src, time.monotonic() - open_time)
         self.cam_delay = float(1.0 / self.framerate)
+        # bounded ring of recent frames filled by the update thread
+        # decoded into recycled pool buffers if pool_size > 0
+        self.init_reader(ring_size, pool_size)
         (self.grabbed, self.frame) = self.stream.read()
+        if self.grabbed:
+            self.frame_shape = self.frame.shape
+            self.ring.put(self.frame)
+            self.state = STATE_STREAMING
 
-        # initialize the thread name
-        self.name = name
+        # reconnect settings and metrics
+        self.stall_sec = stall_sec  # no good frame for this long means stream is down
+        self.backoff_min_sec = backoff_min_sec
+        self.backoff_max_sec = backoff_max_sec
+        self.reconnects = 0          # successful reconnects
+        self.reconnect_attempts = 0  # all reconnect attempts
+        self.down_sec = 0.0          # total seconds spent reconnecting
+        self.last_frame_time = time.monotonic()
+
+        self.thread = None
 
         # initialize the variable used to indicate if the thread should
         # be stopped
         self.stopped = False
+        self.stop_event = Event()  # interrupts reconnect backoff waits
+
+    def open_stream(self):
+        # open the camera source. For network streams limit how long
+        # open and read may block so a dead stream is detected promptly
+        params = []
+        if isinstance(self.src, str) and hasattr(cv2, 'CAP_PROP_OPEN_TIMEOUT_MSEC'):
+            params = [cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, 5000,
+                      cv2.CAP_PROP_READ_TIMEOUT_MSEC, 5000]
+        if params:
+            stream = cv2.VideoCapture(self.src, cv2.CAP_ANY, params)
+        else:
+            stream = cv2.VideoCapture(self.src)
+        # V4L2 needs the pixel format set before the frame size
+        if self.fourcc:
+            stream.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*self.fourcc))
+        stream.set(3, self.size[0])
+        stream.set(4, self.size[1])
+        if self.buffer_size > 0:
+            # stale frames queued in the driver add latency and skew timing
+            stream.set(cv2.CAP_PROP_BUFFERSIZE, self.buffer_size)
+        if self.fourcc and not isinstance(self.src, str):
+            stream.set(cv2.CAP_PROP_FPS, self.framerate)
+        self.check_profile(stream)
+        return stream
+
+    def check_profile(self, stream):
+        # read back what the driver actually delivers and warn on mismatch
+        width = int(stream.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(stream.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        fps = stream.get(cv2.CAP_PROP_FPS)
+        code = int(stream.get(cv2.CAP_PROP_FOURCC))
+        fourcc = "".join([chr((code >> (8 * i)) & 0xFF) for i in range(4)]).strip("\x00")
+        buffer_size = int(stream.get(cv2.CAP_PROP_BUFFERSIZE))
+        logging.info("%s Capture %ix%i %.1f fps fourcc=%s buffersize=%i",
+                     self.name, width, height, fps, fourcc or "none", buffer_size)
+        if isinstance(self.src, str):
+            return  # network stream settings are set by the camera itself
+        if (width, height) != (self.size[0], self.size[1]):
+            logging.warning("%s Requested size %ix%i but Got %ix%i",
+                            self.name, self.size[0], self.size[1], width, height)
+        if self.fourcc and fps > 0 and abs(fps - self.framerate) > 0.5:
+            logging.warning("%s Requested %.1f fps but Got %.1f fps",
+                            self.name, self.framerate, fps)
+        if self.fourcc and fourcc and fourcc != self.fourcc:
+            logging.warning("%s Requested fourcc %s but Got %s",
+                            self.name, self.fourcc, fourcc)
+        if self.buffer_size > 0 and buffer_size not in (0, self.buffer_size):
+            logging.warning("%s Requested buffersize %i but Got %i",
+                            self.name, self.buffer_size, buffer_size)
 
-    def start(self):
+    def start(self, ready_timeout=5.0):
         # start the thread to read frames from the video stream
-        t = Thread(target=self.update, name=self.name, args=())
-        t.daemon = True
-        t.start()
+        # and return once a frame with sane exposure is available
+        self.thread = Thread(target=self.update, name=self.name, args=())
+        self.thread.daemon = True
+        self.thread.start()
+        if ready_timeout:
+            self.wait_ready(ready_timeout)
         return self
 
     def update(self):
-        # keep looping infinitely until the thread is stopped
-        while True:
-            # if the thread indicator variable is set, stop the thread
-            if self.stopped:
-                return
-            time.sleep(self.cam_delay)
-
-    def read(self):
-        # return the frame most recently read
-        (self.grabbed, self.frame) = self.stream.read()
-        return self.frame
+        # keep grabbing and decoding frames into the ring
+        # until the thread is stopped
+        while not self.stopped:
+            # grab first so the capture timestamp is not skewed by decode time
+            self.grabbed = self.stream.grab()
+            cap_time = time.monotonic()
+            if self.grabbed and not self.decode_due(cap_time):
+                # idle mode. Frame is dropped without paying for decode
+                self.last_frame_time = cap_time
+                continue
+            if self.grabbed:
+                self.grabbed = self.retrieve_frame(self.stream, cap_time)
+            if self.grabbed:
+                self.last_frame_time = cap_time
+                self.state = STATE_STREAMING
+            elif cap_time - self.last_frame_time > self.stall_sec:
+                self.reconnect()
+            else:
+                time.sleep(self.cam_delay)  # stream problem so avoid a tight loop
+        self.state = STATE_STOPPED
 
-    def stop(self):
-        # release cameera and stop thread
-        self.stream.release()
-        time.sleep(2)  # allow time for cam to shut down
-        # indicates that the thread should be stopped
+    def reconnect(self):
+        # release and reopen the stream with exponential backoff and jitter
+        # until a frame is received or the thread is stopped
+        self.state = STATE_RECONNECTING
+        down_start = time.monotonic()
+        backoff = self.backoff_min_sec
+        attempts = 0
+        logging.warning("%s No frames for %.1f sec. Reconnecting %s",
+                        self.name, self.stall_sec, self.src)
+        while not self.stopped:
+            self.stream.release()
+            # full jitter spreads out retries from several cameras
+            if self.stop_event.wait(random.uniform(backoff / 2.0, backoff)):
+                break
+            self.reconnect_attempts += 1
+            attempts += 1
+            self.stream = self.open_stream()
+            # the stream can come back at another size so let the first
+            # frame set it. Grab intervals restart after the outage
+            self.frame_shape = None
+            self.last_grab_time = 0.0
+            grabbed = self.stream.grab()
+            cap_time = time.monotonic()
+            if grabbed and self.decode_due(cap_time):
+                grabbed = self.retrieve_frame(self.stream, cap_time)
+            if grabbed:
+                self.last_frame_time = cap_time
+                self.reconnects += 1
+                self.state = STATE_STREAMING
+                logging.info("%s Reconnected after %.1f sec and %i attempts",
+                             self.name, cap_time - down_start, attempts)
+                break
+            backoff = min(backoff * 2.0, self.backoff_max_sec)
+        self.down_sec += time.monotonic() - down_start
+
+    def health(self):
+        # return current stream state per STATE_ values above
+        return self.state
+
+    def stats(self):
+        # frame counters plus reconnect metrics
+        stats = RingReader.stats(self)
+        stats.update({'state': self.state,
+                      'reconnects': self.reconnects,
+                      'reconnect_attempts': self.reconnect_attempts,
+                      'down_sec': self.down_sec})
+        return stats
+
+    def stop(self, timeout=3.0):
+        # indicate that the thread should be stopped
         self.stopped = True
+        self.stop_event.set()
+        if not self.join_thread(timeout):
+            return  # grab still blocked. Releasing now could crash opencv
+        # release camera after the grab thread has exited
+        release_time = time.monotonic()
+        self.stream.release()
+        logging.info("%s Released in %.2f sec", self.name, time.monotonic() - release_time)
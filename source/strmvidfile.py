@@ -0,0 +1,118 @@
+# Written by Claude Pageau 18 Nov 2022
+# Import required libraries
+from threading import Thread, Event
+import logging
+import cv2
+import time
+from strmframe import RingReader
+
+class CamStream(RingReader):
+    '''
+    Replay a recorded video file as a camera stream.
+    Frame timestamps come from the file position (CAP_PROP_POS_MSEC)
+    so speed results are the same on every run.
+
+    realtime=True  paces frames per the file timestamps like a live camera.
+                   Frames are dropped if the reader falls behind.
+    realtime=False replays as fast as the reader consumes frames.
+                   Every frame is delivered exactly once.
+
+    eof is set True after the last frame has been read.
+    '''
+    def __init__(self,
+                 filepath="",
+                 realtime=False,
+                 ring_size=4,
+                 pool_size=8,
+                 name="VidFileStream"):
+        # initialize the video File stream
+        self.filepath = filepath
+        self.realtime = realtime
+        self.stream = cv2.VideoCapture(filepath)
+        if not self.stream.isOpened():
+            logging.error("%s Could Not Open Video File %s", name, filepath)
+        self.framerate = self.stream.get(cv2.CAP_PROP_FPS)
+        if not self.framerate or self.framerate <= 0:
+            self.framerate = 30.0
+        self.frame_count = int(self.stream.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.frame_index = 0
+        self.init_reader(ring_size, pool_size)
+        self.consumed = Event()  # set when the reader has taken the newest frame
+        self.consumed.set()
+        self.eof = False
+
+        # initialize the thread name
+        self.name = name
+        self.thread = None
+
+        # initialize the variable used to indicate if the thread should
+        # be stopped
+        self.stopped = False
+
+    def start(self, ready_timeout=5.0):
+        # start the thread to read frames from the video file
+        self.thread = Thread(target=self.update, name=self.name, args=())
+        self.thread.daemon = True
+        self.thread.start()
+        if ready_timeout:
+            # file frames need no exposure settling. Just wait for the first
+            if self.ring.wait_newer(0, ready_timeout) is None:
+                logging.warning("%s No Frames in %s", self.name, self.filepath)
+        return self
+
+    def file_timestamp(self):
+        # seconds into the file of the frame just grabbed
+        pos_msec = self.stream.get(cv2.CAP_PROP_POS_MSEC)
+        if pos_msec <= 0 and self.frame_index > 1:
+            # some containers do not report position so use frame rate
+            pos_msec = (self.frame_index - 1) * 1000.0 / self.framerate
+        return pos_msec / 1000.0
+
+    def update(self):
+        # read frames from the file until end of file or stopped
+        wall_start = None
+        file_start = 0.0
+        while not self.stopped:
+            if not self.realtime:
+                # wait for the reader so no frame is dropped
+                if not self.consumed.wait(0.5):
+                    continue
+                self.consumed.clear()
+            if not self.stream.grab():
+                break
+            self.frame_index += 1
+            cap_time = self.file_timestamp()
+            if self.realtime:
+                if wall_start is None:
+                    wall_start = time.monotonic()
+                    file_start = cap_time
+                delay = (wall_start + cap_time - file_start) - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            if not self.decode_due(cap_time):
+                self.consumed.set()  # nothing new for the reader
+                continue
+            if not self.retrieve_frame(self.stream, cap_time):
+                break
+        self.eof = True
+        logging.info("%s End of File %s after %i of %i frames",
+                     self.name, self.filepath, self.frame_index, self.frame_count)
+        # wake any reader waiting for a frame that will never come
+        with self.ring.cond:
+            self.ring.cond.notify_all()
+
+    def read_frame(self, wait_new=False, timeout=1.0):
+        # return the newest Frame and let the replay thread continue
+        if wait_new and self.eof and self.ring.seq <= self.last_seq:
+            return None
+        frame = RingReader.read_frame(self, wait_new, timeout)
+        if frame is not None and frame.seq >= self.ring.seq:
+            self.consumed.set()
+        return frame
+
+    def stop(self, timeout=3.0):
+        # indicates that the thread should be stopped then release the file
+        self.stopped = True
+        self.consumed.set()
+        if self.join_thread(timeout):
+            self.stream.release()
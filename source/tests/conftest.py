@@ -0,0 +1,6 @@
+# speed-camera modules are run from the source folder, not installed.
+# Make them importable for the tests
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,59 @@
+import csv
+
+import speed_bench
+import speed_calc
+import strmsimcam
+
+
+def truth_row(vehicle_id, direction, enter_time, exit_time, center_y=120):
+    return {'id': str(vehicle_id), 'direction': direction, 'speed': '45',
+            'enter_time': enter_time, 'exit_time': exit_time, 'center_y': str(center_y)}
+
+
+def test_match_truth_skips_rows_without_enter_time():
+    truth = [truth_row(1, "L2R", "", "30.0"),
+             truth_row(2, "L2R", "1.0", "2.0")]
+    row = speed_bench.match_truth(truth, 1.5, "L2R", 120, 1 / 30.0)
+    assert row['id'] == "2"
+    assert speed_bench.match_truth(truth, 29.0, "L2R", 120, 1 / 30.0) is None
+
+
+def test_record_clip_truth_has_enter_times(tmp_path):
+    clip_path = str(tmp_path / "sim2.avi")
+    # 28 frames ends with the second lane vehicle in view but not yet in
+    # the crop area. It must not be in the truth csv
+    vehicles = speed_bench.record_clip(clip_path, 28, lanes=2, gap_sec=0.3)
+    with open(speed_bench.truth_path(clip_path)) as truth_file:
+        rows = list(csv.DictReader(truth_file))
+    assert len(rows) == vehicles
+    assert all(row['enter_time'] for row in rows)
+    result = speed_bench.bench_clip(clip_path, "diff", "multi")
+    assert result['vehicles'] == vehicles
+
+
+def test_speed_conv_matches_simcam():
+    conv = speed_calc.speed_conv(80, 4700, mph=True)
+    px_per_sec = strmsimcam.speed_to_px_sec(50.0, 80, 4700, mph=True)
+    assert abs(px_per_sec * conv - 50.0) < 1e-9
+
+
+def test_auto_crop_area():
+    assert speed_calc.auto_crop_area(320, 240) == (91, 229, 80, 160)
+    assert speed_calc.auto_crop_area(1280, 720) == (457, 823, 288, 432)
+
+
+def test_bench_clip_scores_detection(tmp_path):
+    clip_path = str(tmp_path / "sim.avi")
+    speed_bench.record_clip(clip_path, 120)
+    result = speed_bench.bench_clip(clip_path, "diff", "single")
+    # frame difference finds every vehicle speed-cam.py measures
+    assert result['measured'] == result['vehicles']
+    assert result['hit_pct'] > 50.0
+    rain = speed_bench.bench_clip(clip_path, "diff", "single", drops=100)
+    assert rain['raw'] > result['raw']
+
+
+def test_box_iou():
+    assert speed_bench.box_iou((0, 0, 10, 10), (0, 0, 10, 10)) == 1.0
+    assert speed_bench.box_iou((0, 0, 10, 10), (5, 0, 10, 10)) == 50 / 150.0
+    assert speed_bench.box_iou((0, 0, 10, 10), (20, 0, 10, 10)) == 0.0
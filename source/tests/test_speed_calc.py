@@ -0,0 +1,33 @@
+import datetime
+
+import speed_calc
+
+
+def test_event_time_follows_capture_time():
+    clock = speed_calc.EventClock(realtime=False)
+    first = clock.event_time(100.0)
+    # replay 60 sec of frames much faster than real time
+    assert clock.event_time(160.0) - first == datetime.timedelta(seconds=60)
+
+
+def test_event_time_resyncs_live_wall_clock_step():
+    clock = speed_calc.EventClock(realtime=True)
+    clock.event_time(100.0)
+    clock.wall_start -= datetime.timedelta(hours=1)  # eg ntp set the clock after boot
+    now = datetime.datetime.now()
+    assert abs((clock.event_time(101.0) - now).total_seconds()) < 1.0
+
+
+def test_event_names_unique_in_same_tenth():
+    clock = speed_calc.EventClock(realtime=False)
+    # two tracks finish on one frame then a third 0.05 sec later
+    event_time = clock.event_time(10.0)
+    event_time = event_time.replace(microsecond=300000)
+    names = [clock.event_name(event_time),
+             clock.event_name(event_time),
+             clock.event_name(event_time + datetime.timedelta(seconds=0.05))]
+    assert len(set(names)) == 3
+    assert names[1] == names[0] + "-1"
+    assert names[2] == names[0] + "-2"
+    # next tenth starts a new name
+    assert clock.event_name(event_time + datetime.timedelta(seconds=0.1)) != names[0]
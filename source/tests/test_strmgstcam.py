@@ -0,0 +1,19 @@
+import strmgstcam
+
+
+def test_build_pipeline_quotes_file_path(tmp_path):
+    clip_path = tmp_path / "front yard!.mp4"
+    clip_path.write_bytes(b"")
+    pipeline = strmgstcam.build_pipeline(str(clip_path))
+    assert pipeline.startswith('filesrc location="%s" ! decodebin' % clip_path)
+
+
+def test_build_pipeline_quotes_rtsp_credentials():
+    pipeline = strmgstcam.build_pipeline('rtsp://user:pa ss!"w@10.0.0.5:554/live')
+    assert pipeline.startswith('rtspsrc location="rtsp://user:pa ss!\\"w@10.0.0.5:554/live" latency=200')
+
+
+def test_build_pipeline_keeps_gst_sources():
+    assert strmgstcam.build_pipeline("test").startswith("videotestsrc is-live=true")
+    pipeline = "videotestsrc ! videoconvert ! appsink"
+    assert strmgstcam.build_pipeline(pipeline) == pipeline